@@ -8,6 +8,8 @@ from models.detallepedido import DetallePedido
 from models.inventario import Inventario
 from utils.email_utils import enviar_confirmacion_compra, enviar_alerta_stock
 from utils.pdf_utils import generate_invoice_pdf
+from utils.ventas_diarias import registrar_venta_diaria
+from utils.compras_cliente import registrar_compra
 from datetime import datetime
 import os
 
@@ -77,6 +79,17 @@ def realizar_compra(compra: CompraRequest):
             )
             # Lo agregamos a la sesión para que se guarde.
             db.add(nuevo_detalle)
+            # Sumamos la línea al acumulado diario de ventas; se confirma en el mismo
+            # commit que la línea y el descuento de inventario.
+            registrar_venta_diaria(
+                db,
+                nuevo_pedido.fecha_pedido.date(),
+                detalle.producto_id,
+                detalle.cantidad,
+                detalle.subtotal,
+            )
+            # Y al registro de productos comprados por el cliente (habilita las reseñas).
+            registrar_compra(db, compra.cliente_id, detalle.producto_id, nuevo_pedido.fecha_pedido)
 
             # Buscamos el registro del inventario para el producto actual.
             inventario = db.query(Inventario).filter_by(producto_id=detalle.producto_id).first()
@@ -6,6 +6,150 @@ import secrets
 BUSINESS_WHATSAPP = os.environ.get("BUSINESS_WHATSAPP", "573150556285")
 # API key para integrar con OpenAI (opcional). Si no está definida, la funcionalidad de IA se omite.
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
+# OpenAI client used by the bot (utils/openai_utils.py): model, optional base URL of an
+# OpenAI-compatible server, per-call timeouts, max concurrent upstream calls (and how long
+# a request waits for a free slot) and the reply cache for questions without history.
+OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-3.5-turbo")
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "")
+OPENAI_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_TIMEOUT_SECONDS", "15"))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_CONNECT_TIMEOUT_SECONDS", "3"))
+OPENAI_MAX_CONCURRENCY = int(os.environ.get("OPENAI_MAX_CONCURRENCY", "8"))
+OPENAI_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("OPENAI_QUEUE_TIMEOUT_SECONDS", "2"))
+OPENAI_CACHE_TTL_SECONDS = float(os.environ.get("OPENAI_CACHE_TTL_SECONDS", "3600"))
+OPENAI_CACHE_MAX = int(os.environ.get("OPENAI_CACHE_MAX", "1000"))
 
 # Clave para cifrar datos sensibles (32 bytes aleatorios en base64)
 ENCRYPTION_KEY = os.environ.get("ENCRYPTION_KEY", secrets.token_urlsafe(32))
+
+# Archivo de pedidos (utils/archivo_pedidos.py): edad mínima en días, estados cerrados
+# que se pueden archivar, tamaño de cada lote y pausa entre lotes (segundos).
+ARCHIVO_EDAD_DIAS = int(os.environ.get("ARCHIVO_EDAD_DIAS", "365"))
+ARCHIVO_ESTADOS_CERRADOS = [
+    e.strip() for e in os.environ.get("ARCHIVO_ESTADOS_CERRADOS", "Entregado,Cancelado").split(",") if e.strip()
+]
+ARCHIVO_TAMANO_LOTE = int(os.environ.get("ARCHIVO_TAMANO_LOTE", "500"))
+ARCHIVO_PAUSA_SEGUNDOS = float(os.environ.get("ARCHIVO_PAUSA_SEGUNDOS", "0.5"))
+
+# Caché de reportes de ventas (utils/cache_reportes.py): directorio donde se guardan
+# los reportes de periodos cerrados, TTL en segundos para el periodo en curso y máximo
+# de entradas en memoria por worker (LRU).
+REPORTES_CACHE_DIR = os.environ.get(
+    "REPORTES_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "reportes")
+)
+REPORTES_CACHE_TTL_SEGUNDOS = float(os.environ.get("REPORTES_CACHE_TTL_SEGUNDOS", "60"))
+REPORTES_CACHE_MAX_ENTRADAS = int(os.environ.get("REPORTES_CACHE_MAX_ENTRADAS", "2000"))
+
+# "Comprados juntos" (utils/relacionados.py): vecinos guardados por producto, cada
+# cuántos segundos se incorporan las líneas de pedido nuevas, pedidos por lote en
+# la construcción completa y ruta de la instantánea en disco.
+RELACIONADOS_TOP_K = int(os.environ.get("RELACIONADOS_TOP_K", "20"))
+RELACIONADOS_REFRESCO_SEGUNDOS = float(os.environ.get("RELACIONADOS_REFRESCO_SEGUNDOS", "60"))
+RELACIONADOS_TAMANO_LOTE = int(os.environ.get("RELACIONADOS_TAMANO_LOTE", "2000"))
+# Ids de detalle por debajo de la marca de agua que cada refresco vuelve a leer, para
+# no perder líneas que se confirmaron tarde con un id menor que otro ya visto.
+RELACIONADOS_VENTANA_DETALLES = int(os.environ.get("RELACIONADOS_VENTANA_DETALLES", "1000"))
+RELACIONADOS_ARCHIVO = os.environ.get(
+    "RELACIONADOS_ARCHIVO", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "relacionados.npz")
+)
+
+# Máximo de pares (cliente, producto) comprados que se recuerdan en memoria
+# (utils/compras_cliente.py).
+COMPRAS_CACHE_MAX = int(os.environ.get("COMPRAS_CACHE_MAX", "100000"))
+
+# Cada cuántos segundos, como máximo, se revisa si cambió la lista de palabras
+# prohibidas de las reseñas (utils/moderacion.py).
+MODERACION_RECARGA_SEGUNDOS = float(os.environ.get("MODERACION_RECARGA_SEGUNDOS", "30"))
+
+# Seconds after which a worker rebuilds its in-memory bot intent index from
+# `bot_responses` (utils/bot_index.py); writes through /bot/responses rebuild it at once.
+BOT_INDEX_RELOAD_SECONDS = float(os.environ.get("BOT_INDEX_RELOAD_SECONDS", "60"))
+# Fuzzy scorer for /bot/respond: "vector" (hashed n-gram cosine over all responses
+# with NumPy) or "sequence" (difflib ratio on the prefiltered candidates).
+BOT_SCORER = os.environ.get("BOT_SCORER", "vector").lower()
+
+# Server-side bot conversation history (utils/bot_history.py): turns kept per user,
+# token budget of the history sent to OpenAI, users kept in memory (LRU) and seconds
+# of inactivity after which a conversation is dropped. With BOT_HISTORY_FROM_CHAT a
+# user not in memory is reloaded from the `chat` table.
+BOT_HISTORY_MAX_TURNS = int(os.environ.get("BOT_HISTORY_MAX_TURNS", "20"))
+BOT_HISTORY_TOKEN_BUDGET = int(os.environ.get("BOT_HISTORY_TOKEN_BUDGET", "800"))
+BOT_HISTORY_MAX_USERS = int(os.environ.get("BOT_HISTORY_MAX_USERS", "5000"))
+BOT_HISTORY_IDLE_SECONDS = float(os.environ.get("BOT_HISTORY_IDLE_SECONDS", "1800"))
+BOT_HISTORY_FROM_CHAT = os.environ.get("BOT_HISTORY_FROM_CHAT", "true").lower() in ("1", "true", "yes")
+
+# Buffered writer of the bot chat log (utils/chat_log.py): rows per multi-row INSERT,
+# maximum milliseconds a row waits before being written, queue bound and what to do
+# when the queue is full ("drop_oldest", "drop_newest" or "block" for CHAT_LOG_BLOCK_MS).
+CHAT_LOG_BATCH_SIZE = int(os.environ.get("CHAT_LOG_BATCH_SIZE", "50"))
+CHAT_LOG_FLUSH_MS = float(os.environ.get("CHAT_LOG_FLUSH_MS", "200"))
+CHAT_LOG_QUEUE_MAX = int(os.environ.get("CHAT_LOG_QUEUE_MAX", "10000"))
+CHAT_LOG_OVERFLOW = os.environ.get("CHAT_LOG_OVERFLOW", "drop_oldest").lower()
+CHAT_LOG_BLOCK_MS = float(os.environ.get("CHAT_LOG_BLOCK_MS", "50"))
+
+# Mining of AI-answered bot questions (utils/bot_mining.py): days of `chat` scanned,
+# minimum times a question (or its near-duplicates) must have been asked to be proposed
+# as a BotResponse, and estimated Jaccard similarity for two phrasings to be grouped.
+BOT_MINING_DAYS = int(os.environ.get("BOT_MINING_DAYS", "30"))
+BOT_MINING_MIN_COUNT = int(os.environ.get("BOT_MINING_MIN_COUNT", "3"))
+BOT_MINING_SIMILARITY = float(os.environ.get("BOT_MINING_SIMILARITY", "0.6"))
+
+# Hash de contraseñas con bcrypt (utils/passwords.py): procesos dedicados, operaciones
+# pendientes como máximo antes de responder 503, costo (log2 de las rondas) de los
+# hashes nuevos y contraseñas por tarea en las cargas masivas.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_MAX = int(os.environ.get("PASSWORD_HASH_QUEUE_MAX", "64"))
+PASSWORD_HASH_ROUNDS = int(os.environ.get("PASSWORD_HASH_ROUNDS", "12"))
+PASSWORD_HASH_CHUNK = int(os.environ.get("PASSWORD_HASH_CHUNK", "8"))
+
+# Contadores de los limitadores de login y rate limit (utils/counter_store.py):
+# "sqlite" (archivo compartido por los workers de la máquina) o "memory" (por proceso),
+# ruta del archivo, llaves máximas en memoria y cada cuántos segundos se borra lo expirado.
+COUNTER_STORE = os.environ.get("COUNTER_STORE", "sqlite").lower()
+COUNTER_STORE_PATH = os.environ.get(
+    "COUNTER_STORE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "contadores.sqlite3")
+)
+COUNTER_STORE_MAX_KEYS = int(os.environ.get("COUNTER_STORE_MAX_KEYS", "100000"))
+COUNTER_STORE_SWEEP_SECONDS = float(os.environ.get("COUNTER_STORE_SWEEP_SECONDS", "60"))
+
+# Middleware de rate limiting (utils/rate_limiting.py, GCRA): solicitudes por minuto y
+# ráfaga máxima de cada política. login y catalog se cuentan por IP; compra y bot por
+# usuario del token (o por IP si no hay token).
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_LOGIN_PER_MINUTE = float(os.environ.get("RATE_LIMIT_LOGIN_PER_MINUTE", "10"))
+RATE_LIMIT_LOGIN_BURST = int(os.environ.get("RATE_LIMIT_LOGIN_BURST", "5"))
+RATE_LIMIT_COMPRA_PER_MINUTE = float(os.environ.get("RATE_LIMIT_COMPRA_PER_MINUTE", "20"))
+RATE_LIMIT_COMPRA_BURST = int(os.environ.get("RATE_LIMIT_COMPRA_BURST", "5"))
+RATE_LIMIT_BOT_PER_MINUTE = float(os.environ.get("RATE_LIMIT_BOT_PER_MINUTE", "30"))
+RATE_LIMIT_BOT_BURST = int(os.environ.get("RATE_LIMIT_BOT_BURST", "10"))
+RATE_LIMIT_CATALOG_PER_MINUTE = float(os.environ.get("RATE_LIMIT_CATALOG_PER_MINUTE", "600"))
+RATE_LIMIT_CATALOG_BURST = int(os.environ.get("RATE_LIMIT_CATALOG_BURST", "60"))
+
+# Tokens JWT (utils/jwt_utils.py): tokens ya verificados que se recuerdan (LRU, cada uno
+# hasta su `exp`), tokens revocados que admite el filtro de Bloom antes de reconstruirse
+# y cada cuántos segundos un worker lee las revocaciones hechas por los demás.
+JWT_CACHE_MAX = int(os.environ.get("JWT_CACHE_MAX", "10000"))
+JWT_REVOCATION_CAPACITY = int(os.environ.get("JWT_REVOCATION_CAPACITY", "100000"))
+JWT_REVOCATION_RELOAD_SECONDS = float(os.environ.get("JWT_REVOCATION_RELOAD_SECONDS", "5"))
+
+# Cada cuántos segundos, como máximo, un worker recarga el registro de roles
+# (utils/roles.py); las escrituras en /roles lo recargan al momento en ese worker.
+ROLES_RECARGA_SEGUNDOS = float(os.environ.get("ROLES_RECARGA_SEGUNDOS", "300"))
+
+# Índice en memoria de nombres de usuario para /usuarios/reportes
+# (utils/busqueda_usuarios.py): cada cuántos segundos, como máximo, un worker lo
+# reconstruye para ver los cambios hechos por los demás.
+USUARIOS_BUSQUEDA_RECARGA_SEGUNDOS = float(os.environ.get("USUARIOS_BUSQUEDA_RECARGA_SEGUNDOS", "600"))
+
+# Proxies de confianza (IPs o redes CIDR separadas por comas, p. ej. "127.0.0.1,10.0.0.0/8").
+# Los limitadores por IP solo leen X-Forwarded-For cuando la conexión llega de uno de
+# ellos; vacío = siempre la IP de la conexión (la que fija uvicorn, que ya aplica
+# --proxy-headers/--forwarded-allow-ips si se usan).
+TRUSTED_PROXIES = [p.strip() for p in os.environ.get("TRUSTED_PROXIES", "").split(",") if p.strip()]
+
+# Rango máximo (en días entre `desde` y `hasta`) que acepta /ventas/serie según el
+# intervalo: acota las columnas de la matriz grupos × intervalos (utils/series_ventas.py).
+SERIE_VENTAS_MAX_DIAS = {
+    "day": int(os.environ.get("SERIE_VENTAS_MAX_DIAS_DAY", "366")),
+    "week": int(os.environ.get("SERIE_VENTAS_MAX_DIAS_WEEK", "731")),
+    "month": int(os.environ.get("SERIE_VENTAS_MAX_DIAS_MONTH", "1830")),
+}
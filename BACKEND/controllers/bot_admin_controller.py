@@ -1,8 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
+import json
+
+from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.orm import Session
 
+from config import BOT_MINING_DAYS, BOT_MINING_MIN_COUNT
 from db.session import SessionLocal
 from models.bot_response import BotResponse
+from models.bot_response_proposal import BotResponseProposal
+from utils.bot_index import bot_index
+from utils.bot_mining import mine_proposals
 
 router = APIRouter(prefix="/bot/responses", tags=["bot_responses"])
 
@@ -31,9 +37,85 @@ def create_response(payload: dict, db: Session = Depends(get_db)):
     db.add(br)
     db.commit()
     db.refresh(br)
+    # Swap in a fresh intent index so /bot/respond sees the change immediately
+    bot_index.rebuild(db)
     return br
 
 
+def _proposal_out(p: BotResponseProposal) -> dict:
+    return {
+        "id": p.id,
+        "clave": p.clave,
+        "respuesta": p.respuesta,
+        "examples": json.loads(p.examples) if p.examples else [],
+        "frequency": p.frequency,
+        "status": p.status,
+        "created_at": p.created_at,
+        "bot_response_id": p.bot_response_id,
+    }
+
+
+@router.get("/proposals")
+def list_proposals(status: str = Query("pending", pattern="^(pending|accepted|rejected)$"), db: Session = Depends(get_db)):
+    """Frequent AI-answered questions proposed as responses (see utils/bot_mining.py), most asked first."""
+    rows = (
+        db.query(BotResponseProposal)
+        .filter(BotResponseProposal.status == status)
+        .order_by(BotResponseProposal.frequency.desc(), BotResponseProposal.id)
+        .all()
+    )
+    return [_proposal_out(p) for p in rows]
+
+
+@router.post("/proposals/mine")
+def mine(
+    days: int = Query(BOT_MINING_DAYS, ge=0),
+    min_count: int = Query(BOT_MINING_MIN_COUNT, ge=1),
+    db: Session = Depends(get_db),
+):
+    """Re-run the mining over the last `days` of chat (0 = all) and replace the pending proposals."""
+    return [_proposal_out(p) for p in mine_proposals(db, days=days or None, min_count=min_count)]
+
+
+def _pending_proposal(db: Session, proposal_id: int) -> BotResponseProposal:
+    proposal = db.get(BotResponseProposal, proposal_id)
+    if not proposal:
+        raise HTTPException(status_code=404, detail="Propuesta no encontrada")
+    if proposal.status != "pending":
+        raise HTTPException(status_code=400, detail="La propuesta ya fue revisada")
+    return proposal
+
+
+@router.post("/proposals/{proposal_id}/accept")
+def accept_proposal(proposal_id: int, payload: dict = None, db: Session = Depends(get_db)):
+    # payload optional: { clave?, respuesta?, prioridad? } to edit the proposal before saving it
+    proposal = _pending_proposal(db, proposal_id)
+    payload = payload or {}
+    br = BotResponse(
+        clave=payload.get("clave") or proposal.clave,
+        respuesta=payload.get("respuesta") or proposal.respuesta,
+        prioridad=payload.get("prioridad", 0),
+        enabled=True,
+    )
+    db.add(br)
+    db.flush()
+    proposal.status = "accepted"
+    proposal.bot_response_id = br.id
+    db.commit()
+    db.refresh(br)
+    bot_index.rebuild(db)
+    return br
+
+
+@router.post("/proposals/{proposal_id}/reject")
+def reject_proposal(proposal_id: int, db: Session = Depends(get_db)):
+    proposal = _pending_proposal(db, proposal_id)
+    # Kept with its signature so the same question is not proposed again
+    proposal.status = "rejected"
+    db.commit()
+    return {"ok": True}
+
+
 @router.put("/{resp_id}")
 def update_response(resp_id: int, payload: dict, db: Session = Depends(get_db)):
     br = db.get(BotResponse, resp_id)
@@ -44,6 +126,7 @@ def update_response(resp_id: int, payload: dict, db: Session = Depends(get_db)):
             setattr(br, k, payload[k])
     db.commit()
     db.refresh(br)
+    bot_index.rebuild(db)
     return br
 
 
@@ -54,4 +137,5 @@ def delete_response(resp_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Respuesta no encontrada")
     db.delete(br)
     db.commit()
+    bot_index.rebuild(db)
     return {"ok": True}
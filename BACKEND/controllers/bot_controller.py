@@ -1,15 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from urllib.parse import quote
-from difflib import SequenceMatcher
 
 from db.session import SessionLocal
 from dtos.bot_dto import BotRequest, BotResponseOut
-from models.bot_response import BotResponse
-from models.chatbox import Chat
 
 from config import BUSINESS_WHATSAPP, OPENAI_API_KEY
-from utils.openai_utils import ask_openai
+from utils.openai_utils import ask_openai, openai_metrics, stream_openai
+from utils.bot_index import bot_index
+from utils.bot_history import conversations, is_follow_up, trim_to_budget
+from utils.jwt_utils import get_current_user
+from utils.roles import registro_roles
+from utils.chat_log import chat_log
+import json
 import logging
 
 logger = logging.getLogger("bot_controller")
@@ -30,6 +35,12 @@ def get_whatsapp_link():
     return {"whatsapp_url": wa, "phone": phone}
 
 
+@router.get('/metrics')
+def get_ai_metrics():
+    """OpenAI reply cache hit rate and upstream latency, plus the chat log queue, of this worker process."""
+    return {**openai_metrics.snapshot(), "chat_log": chat_log.stats()}
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -38,157 +49,73 @@ def get_db():
         db.close()
 
 
-@router.post("/respond", response_model=BotResponseOut)
-def respond(payload: BotRequest, db: Session = Depends(get_db)):
-    """
-    Improved responder:
-    1) Try exact substring match (existing behavior).
-    2) If no exact match, compute a simple fuzzy/token overlap score for each `clave` and pick the best.
-    3) If best score meets threshold, return that response; otherwise return fallback with WhatsApp link.
+def _whatsapp_url(mensaje: str):
+    phone = BUSINESS_WHATSAPP
+    if phone:
+        text = quote(f"Hola, necesito ayuda con: {mensaje}")
+        return f"https://wa.me/{phone}?text={text}"
+    return None
 
-    This keeps the implementation dependency-free and performs better on longer user messages.
-    """
-    # Require an authenticated user: frontend should send `usuario_origen` (user id)
-    if not payload.usuario_origen:
-        # Do not answer bot requests for anonymous users
-        raise HTTPException(status_code=401, detail="Debes iniciar sesión para usar el chatbot")
 
+def _plan_reply(payload: BotRequest, index):
+    """
+    Decide the answer for a message without calling OpenAI.
+
+    Returns (local_reply, ask_ai): when `ask_ai` is true the caller should try OpenAI
+    first and use `local_reply` only if the AI gives no answer.
+
+    1) Messages that mention no known `clave` token are general questions: prefer OpenAI
+       (so topics outside e-commerce like 'sapos' get AI answers).
+    2) Explicit WhatsApp requests, greetings and farewells get their quick replies.
+    3) Exact substring match of a `clave` (high confidence).
+    4) Otherwise score every `clave` with the in-memory intent index (utils/bot_index.py):
+       max(similarity, token overlap) + keyword boost, where the similarity scorer is chosen
+       with BOT_SCORER (hashed trigram cosine by default), and combine up to 2 answers.
+       Low-confidence matches prefer OpenAI and add the WhatsApp link.
+    5) No match: OpenAI if configured, otherwise the WhatsApp fallback.
+    """
     mensaje = (payload.mensaje or "").lower()
-    respuestas = db.query(BotResponse).filter(BotResponse.enabled == True).order_by(BotResponse.prioridad.desc()).all()
-
-    # If the message doesn't contain any known 'clave' tokens, treat it as a general question
-    # and prefer OpenAI (so topics outside e-commerce like 'sapos' get AI answers).
-    try:
-        any_clave = False
-        for r in respuestas:
-            if r.clave:
-                for tok in r.clave.lower().split():
-                    if tok and tok in mensaje:
-                        any_clave = True
-                        break
-            if any_clave:
-                break
-        if not any_clave and OPENAI_API_KEY:
-            logger.info("Message '%s' appears general (no DB clave match) - calling OpenAI", mensaje[:80])
-            ai_reply = ask_openai(payload.mensaje or "", history=payload.history if getattr(payload, 'history', None) else None)
-            if ai_reply:
-                try:
-                    if payload.usuario_origen:
-                        db_chat_bot = Chat(usuario_origen=None, usuario_destino=payload.usuario_origen, mensaje=ai_reply)
-                        db.add(db_chat_bot)
-                        db.commit()
-                except Exception:
-                    db.rollback()
-                return BotResponseOut(texto=ai_reply, fallback=False, ai_generated=True)
-    except Exception:
-        # defensive: if anything fails here, continue with normal flow
-        pass
+    fallback = BotResponseOut(
+        texto="No encontré una respuesta para eso. ¿Quieres hablar con atención al cliente?",
+        fallback=True,
+        whatsapp_url=_whatsapp_url(payload.mensaje),
+    )
 
     # quick keyword sets
     whatsapp_keywords = ['whatsapp', 'whassap', 'whassapp', 'whass', 'wa.me', 'whats', 'contacto por whatsapp', 'hablar por whatsapp']
     greeting_keywords = ['hola', 'buenos', 'buenas', 'buen día', 'buen dia', 'buenas tardes', 'buenas noches', 'buenas dias', 'buenas']
     farewell_keywords = ['gracias', 'adios', 'hasta luego', 'chao', 'nos vemos', 'hasta pronto']
 
-    # 0) If user explicitly requests WhatsApp, return fallback with wa link immediately
+    general = not index.mentions_any_clave(mensaje)
+    if general and OPENAI_API_KEY:
+        logger.info("Message '%s' appears general (no DB clave match) - calling OpenAI", mensaje[:80])
+
+    def local(reply: BotResponseOut):
+        return reply, general and bool(OPENAI_API_KEY)
+
+    # If user explicitly requests WhatsApp, return fallback with wa link immediately
     for kw in whatsapp_keywords:
         if kw in mensaje:
-            phone = BUSINESS_WHATSAPP
-            if phone:
-                text = quote(f"Hola, necesito ayuda con: {payload.mensaje}")
-                wa = f"https://wa.me/{phone}?text={text}"
-            else:
-                wa = None
-            # register user message only if the user is logged in
-            try:
-                if payload.usuario_origen:
-                    db_chat = Chat(usuario_origen=payload.usuario_origen, usuario_destino=None, mensaje=payload.mensaje)
-                    db.add(db_chat)
-                    db.commit()
-            except Exception:
-                db.rollback()
-            return BotResponseOut(texto="Puedo conectarte por WhatsApp. Pulsa el botón para iniciar la conversación.", fallback=True, whatsapp_url=wa)
-
-    # 0b) greetings and short chit-chat: prefer quick friendly reply
+            return local(BotResponseOut(texto="Puedo conectarte por WhatsApp. Pulsa el botón para iniciar la conversación.", fallback=True, whatsapp_url=_whatsapp_url(payload.mensaje)))
+
+    # greetings and short chit-chat: prefer quick friendly reply
     if len(mensaje) < 60:
         for g in greeting_keywords:
             if g in mensaje:
-                try:
-                    if payload.usuario_origen:
-                        db_chat = Chat(usuario_origen=payload.usuario_origen, usuario_destino=None, mensaje=payload.mensaje)
-                        db.add(db_chat)
-                        db.commit()
-                except Exception:
-                    db.rollback()
-                return BotResponseOut(texto="¡Hola! ¿En qué puedo ayudarte hoy? Puedes preguntarme por pedidos, envíos, devoluciones, o decir 'hablar con soporte' para WhatsApp.", fallback=False)
+                return local(BotResponseOut(texto="¡Hola! ¿En qué puedo ayudarte hoy? Puedes preguntarme por pedidos, envíos, devoluciones, o decir 'hablar con soporte' para WhatsApp.", fallback=False))
         for f in farewell_keywords:
             if f in mensaje:
-                try:
-                    if payload.usuario_origen:
-                        db_chat = Chat(usuario_origen=payload.usuario_origen, usuario_destino=None, mensaje=payload.mensaje)
-                        db.add(db_chat)
-                        db.commit()
-                except Exception:
-                    db.rollback()
-                return BotResponseOut(texto="Gracias por contactarnos. Si necesitas algo más, aquí estoy. ¡Que tengas un buen día!", fallback=False)
-
-    # 1) Exact substring match (high confidence)
-    for r in respuestas:
-        try:
-            if r.clave and r.clave.lower() in mensaje:
-                # register chat (user -> bot) and bot reply in chat table
-                try:
-                    if payload.usuario_origen:
-                        db_chat = Chat(usuario_origen=payload.usuario_origen, usuario_destino=None, mensaje=payload.mensaje)
-                        db.add(db_chat)
-                        db.commit()
-                except Exception:
-                    db.rollback()
-                return BotResponseOut(texto=r.respuesta, fallback=False)
-        except Exception:
-            # defensive: skip malformed entries
-            continue
-
-    # 2) Fuzzy/token matching
-    def token_overlap(a: str, b: str) -> float:
-        sa = set(a.split())
-        sb = set(b.split())
-        if not sb:
-            return 0.0
-        return len(sa & sb) / float(len(sb))
-
-    # multi-intent: compute score for all responses and pick top candidates
-    scored = []
-    keywords_map = {
-        'horario': ['horario', 'abren', 'cierra', 'hora'],
-        'envio': ['envio', 'envios', 'llegar', 'tiempo', 'demora', 'entrega', 'enviar'],
-        'devolucion': ['devoluci', 'devolver', 'reembolso', 'reembols'],
-        'pedido': ['pedido', 'compr', 'orden', 'estado', 'entregado', 'cancelar'],
-        'contraseña': ['contrase', 'clave', 'password', 'recuperar', 'restablecer'],
-        'nombre': ['nombre', 'usuario', 'apodo', 'editar nombre', 'cambiar nombre'],
-        'ventas': ['venta', 'mayor', 'precio', 'oferta', 'promocion', 'promo'],
-        'stock': ['agotado', 'agotada', 'stock', 'disponible']
-    }
-
-    for r in respuestas:
-        clave = (r.clave or "").lower()
-        ratio = SequenceMatcher(None, mensaje, clave).ratio() if clave else 0.0
-        overlap = token_overlap(mensaje, clave) if clave else 0.0
-        score = max(ratio, overlap)
-
-        # boost score if certain keywords appear for common intents
-        keywords_boost = 0.0
-        for k, kws in keywords_map.items():
-            for kw in kws:
-                if kw in mensaje and (k in clave or kw in clave):
-                    keywords_boost += 0.15
-                    break
-
-        score = min(1.0, score + keywords_boost)
-        adjusted_score = score + (r.prioridad or 0) * 0.01
-        scored.append((adjusted_score, r))
+                return local(BotResponseOut(texto="Gracias por contactarnos. Si necesitas algo más, aquí estoy. ¡Que tengas un buen día!", fallback=False))
+
+    # Exact substring match (high confidence)
+    r = index.exact_match(mensaje)
+    if r is not None:
+        return local(BotResponseOut(texto=r.respuesta, fallback=False))
+
+    # Fuzzy/token matching (top 2 by the configured BOT_SCORER)
+    scored = index.best_matches(mensaje)
 
     # pick top candidates above a lower threshold and combine up to 2 answers
-    scored.sort(key=lambda x: x[0], reverse=True)
     COMBINE_THRESHOLD = 0.35
     combined = []
     for s, r in scored:
@@ -196,16 +123,8 @@ def respond(payload: BotRequest, db: Session = Depends(get_db)):
             combined.append((s, r))
 
     if combined:
-        # if best candidate is confident enough return combined text, otherwise provide fallback option
         texts = [r.respuesta for (_s, r) in combined]
         reply = "\n\n".join(texts)
-        try:
-            if payload.usuario_origen:
-                db_chat = Chat(usuario_origen=payload.usuario_origen, usuario_destino=None, mensaje=payload.mensaje)
-                db.add(db_chat)
-                db.commit()
-        except Exception:
-            db.rollback()
 
         # make combined/fuzzy replies slightly more polite and offer further help
         polite_suffix = "\n\nSi necesitas más ayuda o detalles, dímelo y con gusto te ayudo."
@@ -215,7 +134,6 @@ def respond(payload: BotRequest, db: Session = Depends(get_db)):
             reply = reply + '.'
         reply = reply + polite_suffix
 
-        # if top score is low, also include whatsapp link so frontend shows the button
         top_score = combined[0][0]
         # If the best candidate has low confidence, prefer asking the AI for a general/coherent answer
         if top_score < 0.7:
@@ -223,68 +141,136 @@ def respond(payload: BotRequest, db: Session = Depends(get_db)):
                 logger.info("Top DB match low (%.2f): calling OpenAI for user=%s", top_score, str(payload.usuario_origen))
             else:
                 logger.info("Top DB match low (%.2f) and OpenAI not configured", top_score)
-        if top_score < 0.7 and OPENAI_API_KEY:
-            try:
-                ai_reply = ask_openai(payload.mensaje or "", history=payload.history if getattr(payload, 'history', None) else None)
-                if ai_reply:
-                    try:
-                        if payload.usuario_origen:
-                            db_chat_bot = Chat(usuario_origen=None, usuario_destino=payload.usuario_origen, mensaje=ai_reply)
-                            db.add(db_chat_bot)
-                            db.commit()
-                    except Exception:
-                        db.rollback()
-                    return BotResponseOut(texto=ai_reply, fallback=False, ai_generated=True)
-            except Exception:
-                # ignore AI errors and fall back to DB reply below
-                pass
+        ask_ai = (general or top_score < 0.7) and bool(OPENAI_API_KEY)
 
+        # if top score is low, also include whatsapp link so frontend shows the button
         if top_score < 0.5:
-            phone = BUSINESS_WHATSAPP
-            if phone:
-                text = quote(f"Hola, necesito ayuda con: {payload.mensaje}")
-                wa = f"https://wa.me/{phone}?text={text}"
-            else:
-                wa = None
-            return BotResponseOut(texto=reply + "\n\nSi deseas hablar con un agente, puedes usar el botón de WhatsApp.", fallback=True, whatsapp_url=wa)
-
-        return BotResponseOut(texto=reply, fallback=False)
+            return BotResponseOut(texto=reply + "\n\nSi deseas hablar con un agente, puedes usar el botón de WhatsApp.", fallback=True, whatsapp_url=_whatsapp_url(payload.mensaje)), ask_ai
+        return BotResponseOut(texto=reply, fallback=False), ask_ai
 
-    # 3) No good match -> try AI fallback (if configured), otherwise WhatsApp fallback
-    # register user message only if logged in
-    try:
-        if payload.usuario_origen:
-            db_chat = Chat(usuario_origen=payload.usuario_origen, usuario_destino=None, mensaje=payload.mensaje)
-            db.add(db_chat)
-            db.commit()
-    except Exception:
-        db.rollback()
-
-    # If OpenAI key exists, try to get a light AI response
+    # No good match -> try AI fallback (if configured), otherwise WhatsApp fallback
     if OPENAI_API_KEY:
         logger.info("No good DB match: calling OpenAI for user=%s", str(payload.usuario_origen))
+    return fallback, bool(OPENAI_API_KEY)
+
+
+async def _history(payload: BotRequest, db: Session):
+    """Earlier turns for the AI prompt, trimmed to BOT_HISTORY_TOKEN_BUDGET.
+
+    Kept server-side per user (utils/bot_history.py); a `history` sent by older clients is
+    still honoured, minus the current message they append to it. Standalone questions
+    (see `is_follow_up`) get no history, so their replies come from the reply cache.
+    """
+    if not is_follow_up(payload.mensaje):
+        return None
+    if payload.history:
+        turns = list(payload.history)
+        last = turns[-1] if turns else None
+        if isinstance(last, dict) and last.get("from") == "user" and last.get("text") == payload.mensaje:
+            turns.pop()
+        return trim_to_budget(turns) or None
+    await run_in_threadpool(conversations.warm_from_chat, db, payload.usuario_origen)
+    return conversations.recent(payload.usuario_origen) or None
+
+
+def _remember(payload: BotRequest, reply: BotResponseOut):
+    conversations.append(payload.usuario_origen, "user", payload.mensaje)
+    conversations.append(payload.usuario_origen, "bot", reply.texto)
+
+
+@router.delete("/history/{usuario_id}")
+def clear_history(usuario_id: int, usuario: dict = Depends(get_current_user)):
+    """Forget the server-side conversation of a user (e.g. when they reset the chat).
+    Only the user themselves or a seller may do it."""
+    if usuario.get("id") != usuario_id:
+        info = registro_roles.rol(usuario.get("rol_id"))
+        if info is None or not info.activo or (info.nombre or "").strip().lower() != "vendedor":
+            raise HTTPException(status_code=403, detail="No tienes permisos para esta acción")
+    conversations.clear(usuario_id)
+    return {"ok": True}
+
+
+@router.post("/respond", response_model=BotResponseOut)
+async def respond(payload: BotRequest, db: Session = Depends(get_db)):
+    """
+    Answer a chatbot message (see `_plan_reply` for the matching steps).
+
+    The handler is async: OpenAI calls are awaited, so a slow upstream does not hold a worker
+    thread, and chat rows are queued for the batched writer (utils/chat_log.py) instead of
+    being committed inside the request.
+    """
+    # Require an authenticated user: frontend should send `usuario_origen` (user id)
+    if not payload.usuario_origen:
+        # Do not answer bot requests for anonymous users
+        raise HTTPException(status_code=401, detail="Debes iniciar sesión para usar el chatbot")
+
+    # Precompiled index over the enabled responses (see utils/bot_index.py)
+    index = await run_in_threadpool(bot_index.get, db)
+    reply, ask_ai = _plan_reply(payload, index)
+    history = await _history(payload, db) if ask_ai else None
+
+    # register user message (only logged-in users reach this point)
+    await chat_log.enqueue_async(payload.usuario_origen, None, payload.mensaje)
+
+    if ask_ai:
         try:
-            ai_reply = ask_openai(payload.mensaje or "", history=payload.history if getattr(payload, 'history', None) else None)
+            ai_reply = await ask_openai(payload.mensaje or "", history=history)
             if ai_reply:
                 # save AI reply into chat table as a bot message (usuario_origen=None -> system/bot)
-                try:
-                    if payload.usuario_origen:
-                        db_chat_bot = Chat(usuario_origen=None, usuario_destino=payload.usuario_origen, mensaje=ai_reply)
-                        db.add(db_chat_bot)
-                        db.commit()
-                except Exception:
-                    db.rollback()
-                # return AI answer as the bot response (not marking as fallback)
-                return BotResponseOut(texto=ai_reply, fallback=False, ai_generated=True)
+                await chat_log.enqueue_async(None, payload.usuario_origen, ai_reply)
+                reply = BotResponseOut(texto=ai_reply, fallback=False, ai_generated=True)
         except Exception:
-            # on any error, fall back to whatsapp behavior below
+            # on any error, fall back to the DB / WhatsApp reply
             pass
+    _remember(payload, reply)
+    return reply
 
-    phone = BUSINESS_WHATSAPP
-    if phone:
-        text = quote(f"Hola, necesito ayuda con: {payload.mensaje}")
-        wa = f"https://wa.me/{phone}?text={text}"
-    else:
-        wa = None
 
-    return BotResponseOut(texto="No encontré una respuesta para eso. ¿Quieres hablar con atención al cliente?", fallback=True, whatsapp_url=wa)
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/respond/stream")
+async def respond_stream(payload: BotRequest, db: Session = Depends(get_db)):
+    """
+    Same answer as `/bot/respond`, as Server-Sent Events.
+
+    - `event: delta`, `data: {"texto": "..."}`: a piece of the reply. DB answers arrive as a
+      single delta right away; AI answers are streamed as the tokens arrive.
+    - `event: done`, `data: <BotResponseOut>`: the final reply. It is the authoritative text:
+      if the AI fails mid-stream it carries the DB / WhatsApp fallback instead.
+
+    The AI reply is stored in `chat` once the stream completes.
+    """
+    if not payload.usuario_origen:
+        raise HTTPException(status_code=401, detail="Debes iniciar sesión para usar el chatbot")
+
+    index = await run_in_threadpool(bot_index.get, db)
+    reply, ask_ai = _plan_reply(payload, index)
+    history = await _history(payload, db) if ask_ai else None
+    await chat_log.enqueue_async(payload.usuario_origen, None, payload.mensaje)
+
+    async def events():
+        final = reply
+        if ask_ai:
+            parts = []
+            status = {}
+            async for piece in stream_openai(payload.mensaje or "", history=history, status=status):
+                parts.append(piece)
+                yield _sse("delta", {"texto": piece})
+            ai_reply = "".join(parts).strip()
+            # A stream cut short keeps the fallback: the partial text is neither stored nor remembered.
+            if ai_reply and status.get("complete"):
+                final = BotResponseOut(texto=ai_reply, fallback=False, ai_generated=True)
+                await chat_log.enqueue_async(None, payload.usuario_origen, ai_reply)
+        else:
+            yield _sse("delta", {"texto": reply.texto})
+        _remember(payload, final)
+        yield _sse("done", final.model_dump())
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # no proxy buffering, otherwise the tokens arrive all at once
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -5,6 +5,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 # Session: para definir el tipo de la variable de sesión de la base de datos.
 from sqlalchemy.orm import Session
+from sqlalchemy import func, select, union_all
 from typing import Optional, List
 
 # Importamos la función que crea la sesión de la base de datos.
@@ -17,6 +18,10 @@ from dtos.detalle_pedido_dto import (
 )
 # Importamos el modelo de SQLAlchemy que se mapea a la tabla de la base de datos.
 from models.detallepedido import DetallePedido
+from models.detallepedido_archivo import DetallePedidoArchivo
+from models.pedido import Pedido
+# Acumulados por línea de pedido (ventas_diarias, compras por cliente), en la misma transacción.
+from utils.acumulados_pedidos import restar_linea, sumar_linea
 
 # Creamos el enrutador de FastAPI.
 # El `prefix` establece la URL base para todas las rutas en este archivo (ej., /detalles_pedido/).
@@ -53,6 +58,7 @@ def crear_detalle_pedido(detalle: DetallePedidoCreate, db: Session = Depends(get
     db_detalle = DetallePedido(**detalle.dict())
     # Agregamos el nuevo objeto a la sesión.
     db.add(db_detalle)
+    sumar_linea(db, db.get(Pedido, db_detalle.pedido_id), db_detalle.producto_id, db_detalle.cantidad, db_detalle.subtotal)
     # Guardamos los cambios en la base de datos.
     db.commit()
     # Recargamos el objeto para obtener el ID que la base de datos acaba de generar.
@@ -69,6 +75,74 @@ def listar_detalles_pedido(db: Session = Depends(get_db)):
     return db.query(DetallePedido).all()
 
 
+# --- Endpoint de Reportes Parametrizados para Detalle de Pedidos ---
+# Se declara antes de `/{detalle_id}` para que FastAPI no interprete "reportes" como un ID.
+
+# Aplica los filtros del reporte. Las combinaciones están cubiertas por los índices
+# (pedido_id, cantidad), (producto_id, cantidad) y (cantidad), ver migración 4f2a9c1d7e3b.
+# `modelo` permite aplicar los mismos filtros a `detalle_pedido_archivo`.
+def filtrar_reporte_detalle_pedido(query, pedido_id, producto_id, cantidad_min, cantidad_max, modelo=DetallePedido):
+    if pedido_id:
+        query = query.filter(modelo.pedido_id == pedido_id)
+    if producto_id:
+        query = query.filter(modelo.producto_id == producto_id)
+    if cantidad_min is not None:
+        query = query.filter(modelo.cantidad >= cantidad_min)
+    if cantidad_max is not None:
+        query = query.filter(modelo.cantidad <= cantidad_max)
+    return query
+
+
+# El reporte incluye las líneas archivadas (ver utils/archivo_pedidos.py): cada tabla se
+# filtra por separado con sus índices y se unen con UNION ALL (los ids no se repiten,
+# el archivo conserva el id_detalle original).
+def _lineas_reporte(pedido_id, producto_id, cantidad_min, cantidad_max):
+    partes = []
+    for modelo in (DetallePedido, DetallePedidoArchivo):
+        consulta = select(
+            modelo.id_detalle, modelo.pedido_id, modelo.producto_id, modelo.cantidad, modelo.subtotal
+        )
+        partes.append(filtrar_reporte_detalle_pedido(
+            consulta, pedido_id, producto_id, cantidad_min, cantidad_max, modelo
+        ))
+    return union_all(*partes).subquery()
+
+
+@router.get("/reportes", response_model=List[DetallePedidoOut])
+def reportes_parametrizados_detalle_pedido(
+    pedido_id: Optional[int] = Query(None),
+    producto_id: Optional[int] = Query(None),
+    cantidad_min: Optional[int] = Query(None),
+    cantidad_max: Optional[int] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    lineas = _lineas_reporte(pedido_id, producto_id, cantidad_min, cantidad_max)
+    return db.execute(
+        select(lineas).order_by(lineas.c.id_detalle).offset(skip).limit(limit)
+    ).all()
+
+
+# Total de filas del reporte contado solo sobre el índice, para paginar en el frontend.
+@router.get("/reportes/total")
+def total_reportes_detalle_pedido(
+    pedido_id: Optional[int] = Query(None),
+    producto_id: Optional[int] = Query(None),
+    cantidad_min: Optional[int] = Query(None),
+    cantidad_max: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    total = 0
+    for modelo in (DetallePedido, DetallePedidoArchivo):
+        query = filtrar_reporte_detalle_pedido(
+            db.query(func.count(modelo.id_detalle)), pedido_id, producto_id, cantidad_min, cantidad_max, modelo
+        )
+        total += query.scalar() or 0
+    return {"total": total}
+# Comentario: Endpoint de reportes parametrizados para detalle de pedidos.
+
+
 # --- 3. Obtener un detalle de pedido específico por ID (GET) ---
 # El `{detalle_id}` en la ruta indica que este es un parámetro de la URL.
 @router.get("/{detalle_id}", response_model=DetallePedidoOut)
@@ -93,6 +167,8 @@ def actualizar_detalle_pedido(
     # Si no existe, lanzamos un error 404.
     if not detalle:
         raise HTTPException(status_code=404, detail="Detalle de pedido no encontrado")
+    # La línea anterior sale de los acumulados y entra la nueva.
+    restar_linea(db, db.get(Pedido, detalle.pedido_id), detalle.producto_id, detalle.cantidad, detalle.subtotal)
     
     # Iteramos sobre los datos recibidos en la petición.
     # `datos.dict(exclude_unset=True)` asegura que solo actualicemos los campos
@@ -100,6 +176,7 @@ def actualizar_detalle_pedido(
     for key, value in datos.dict(exclude_unset=True).items():
         # Usamos `setattr` para actualizar dinámicamente cada atributo del objeto.
         setattr(detalle, key, value)
+    sumar_linea(db, db.get(Pedido, detalle.pedido_id), detalle.producto_id, detalle.cantidad, detalle.subtotal)
         
     # Guardamos los cambios en la base de datos.
     db.commit()
@@ -119,6 +196,7 @@ def eliminar_detalle_pedido(detalle_id: int, db: Session = Depends(get_db)):
     if not detalle:
         raise HTTPException(status_code=404, detail="Detalle de pedido no encontrado")
     
+    restar_linea(db, db.get(Pedido, detalle.pedido_id), detalle.producto_id, detalle.cantidad, detalle.subtotal)
     # Eliminamos el objeto de la sesión.
     db.delete(detalle)
     # Confirmamos la eliminación en la base de datos.
@@ -137,27 +215,6 @@ def listar_detalles_por_pedido(pedido_id: int, db: Session = Depends(get_db)):
     return db.query(DetallePedido).filter(DetallePedido.pedido_id == pedido_id).all()
 
 
-# --- Endpoint de Reportes Parametrizados para Detalle de Pedidos ---
-@router.get("/reportes", response_model=List[DetallePedidoOut])
-def reportes_parametrizados_detalle_pedido(
-    pedido_id: Optional[int] = Query(None),
-    producto_id: Optional[int] = Query(None),
-    cantidad_min: Optional[int] = Query(None),
-    cantidad_max: Optional[int] = Query(None),
-    db: Session = Depends(get_db)
-):
-    query = db.query(DetallePedido)
-    if pedido_id:
-        query = query.filter(DetallePedido.pedido_id == pedido_id)
-    if producto_id:
-        query = query.filter(DetallePedido.producto_id == producto_id)
-    if cantidad_min is not None:
-        query = query.filter(DetallePedido.cantidad >= cantidad_min)
-    if cantidad_max is not None:
-        query = query.filter(DetallePedido.cantidad <= cantidad_max)
-    return query.all()
-# Comentario: Endpoint de reportes parametrizados para detalle de pedidos.
-
 # --- Endpoint de Carga Masiva de Detalle de Pedidos ---
 @router.post("/bulk", response_model=List[DetallePedidoOut])
 def carga_masiva_detalle_pedido(
@@ -166,6 +223,8 @@ def carga_masiva_detalle_pedido(
 ):
     nuevos_detalles = [DetallePedido(**d.dict()) for d in detalles]
     db.add_all(nuevos_detalles)
+    for d in nuevos_detalles:
+        sumar_linea(db, db.get(Pedido, d.pedido_id), d.producto_id, d.cantidad, d.subtotal)
     db.commit()
     for d in nuevos_detalles:
         db.refresh(d)
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 # Session: para el tipado de la variable de sesión de la base de datos.
 from sqlalchemy.orm import Session
 from typing import Optional, List
-from sqlalchemy import text
+from sqlalchemy import func, text
 
 # Importamos las clases y funciones que necesitamos de otros archivos.
 from db.session import SessionLocal
@@ -88,21 +88,43 @@ def listar_inventarios(db: Session = Depends(get_db)):
 
 
 # --- Endpoint de Reportes Parametrizados para Inventario ---
+
+# Aplica los filtros del reporte. Cada combinación está cubierta por un índice
+# (producto_id, cantidad) o (cantidad), ver migración 4f2a9c1d7e3b.
+def filtrar_reporte_inventario(query, producto_id, cantidad_min, cantidad_max):
+    if producto_id:
+        query = query.filter(Inventario.producto_id == producto_id)
+    if cantidad_min is not None:
+        query = query.filter(Inventario.cantidad >= cantidad_min)
+    if cantidad_max is not None:
+        query = query.filter(Inventario.cantidad <= cantidad_max)
+    return query
+
+
 @router.get("/reportes", response_model=List[InventarioOut])
 def reportes_parametrizados_inventario(
     producto_id: Optional[int] = Query(None),
     cantidad_min: Optional[int] = Query(None),
     cantidad_max: Optional[int] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Inventario)
-    if producto_id:
-        query = query.filter(Inventario.producto_id == producto_id)
-    if cantidad_min is not None:
-        query = query.filter(Inventario.cantidad >= cantidad_min)
-    if cantidad_max is not None:
-        query = query.filter(Inventario.cantidad <= cantidad_max)
-    return query.all()
+    query = filtrar_reporte_inventario(db.query(Inventario), producto_id, cantidad_min, cantidad_max)
+    return query.order_by(Inventario.id).offset(skip).limit(limit).all()
+
+
+# Total de filas del reporte. Solo cuenta sobre el índice (no lee las filas),
+# para que el frontend pueda paginar sin traer todo el resultado.
+@router.get("/reportes/total")
+def total_reportes_inventario(
+    producto_id: Optional[int] = Query(None),
+    cantidad_min: Optional[int] = Query(None),
+    cantidad_max: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    query = filtrar_reporte_inventario(db.query(func.count(Inventario.id)), producto_id, cantidad_min, cantidad_max)
+    return {"total": query.scalar() or 0}
 
 
 
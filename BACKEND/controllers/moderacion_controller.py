@@ -0,0 +1,49 @@
+from fastapi import APIRouter, HTTPException, Depends
+from sqlalchemy.orm import Session
+
+from db.session import SessionLocal
+from models.palabra_prohibida import PalabraProhibida
+from utils.moderacion import moderador, normalizar
+
+router = APIRouter(prefix="/moderacion/palabras", tags=["moderacion"])
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/")
+def listar_palabras(db: Session = Depends(get_db)):
+    return db.query(PalabraProhibida).order_by(PalabraProhibida.palabra).all()
+
+
+@router.post("/")
+def agregar_palabras(payload: dict, db: Session = Depends(get_db)):
+    # payload esperado: { palabra } o { palabras: [...] } para cargar varias de una vez
+    palabras = payload.get("palabras") or [payload.get("palabra")]
+    nuevas = {normalizar(p).strip() for p in palabras if p and p.strip()}
+    if not nuevas:
+        raise HTTPException(status_code=400, detail="Falta el campo palabra/palabras")
+    existentes = {
+        p for (p,) in db.query(PalabraProhibida.palabra).filter(PalabraProhibida.palabra.in_(nuevas))
+    }
+    db.add_all([PalabraProhibida(palabra=p) for p in sorted(nuevas - existentes)])
+    db.commit()
+    # Recompila el autómata en este proceso; los demás lo detectan por la huella.
+    total = moderador.recargar(db)
+    return {"agregadas": len(nuevas - existentes), "total": total}
+
+
+@router.delete("/{palabra_id}")
+def eliminar_palabra(palabra_id: int, db: Session = Depends(get_db)):
+    palabra = db.get(PalabraProhibida, palabra_id)
+    if not palabra:
+        raise HTTPException(status_code=404, detail="Palabra no encontrada")
+    db.delete(palabra)
+    db.commit()
+    moderador.recargar(db)
+    return {"ok": True}
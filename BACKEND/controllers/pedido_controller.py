@@ -2,20 +2,26 @@
 # APIRouter: Para crear rutas modulares.
 # Depends: Para manejar las dependencias, como la sesión de la base de datos.
 # HTTPException: Para lanzar errores HTTP (ej., 404 Not Found).
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 # Session: Tipo para la variable de sesión de la base de datos.
 from sqlalchemy.orm import Session
+from sqlalchemy import or_
 # datetime: Para trabajar con fechas y horas.
 from datetime import datetime
+from typing import Optional
+import threading
 
 # Importamos la función para crear la sesión de la base de datos.
 from db.session import SessionLocal
 # Importamos los modelos de Pydantic que definen la estructura de los datos.
-from dtos.pedido_dto import PedidoCreate, PedidoOut, PedidoUpdate
+from dtos.pedido_dto import PedidoCreate, PedidoOut, PedidoUpdate, PedidoEstadoMasivo, HistorialPedidosOut
 # Importamos el modelo de SQLAlchemy que se mapea a la tabla de 'pedidos'.
 from models.pedido import Pedido
-from utils.email_utils import enviar_cambio_estado_pedido
+from utils.email_utils import enviar_cambio_estado_pedido, enviar_cambios_estado_pedidos
 from models.usuarios import Usuario
+from utils.archivo_pedidos import historial_cliente, pedidos_cliente
+from utils.cache_reportes import cache_reportes
+from utils.acumulados_pedidos import datos_pedido, restar_linea, sumar_linea
 
 # Creamos un enrutador de FastAPI.
 # `prefix="/pedidos"`: Todas las rutas de este archivo comenzarán con "/pedidos".
@@ -98,10 +104,73 @@ def listar_pedidos_por_usuario(usuario_id: int, db: Session = Depends(get_db)):
 # --- 4. Listar pedidos por cliente (GET) ---
 # Endpoint para obtener todos los pedidos de un cliente específico.
 @router.get("/cliente/{cliente_id}", response_model=list[PedidoOut])
-def listar_pedidos_por_cliente(cliente_id: int, db: Session = Depends(get_db)):
+def listar_pedidos_por_cliente(
+    cliente_id: int,
+    desde: Optional[datetime] = Query(None),
+    hasta: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db),
+):
     """Listar pedidos de un cliente (rol cliente)."""
-    # Filtramos la consulta por el `cliente_id`.
-    return db.query(Pedido).filter(Pedido.cliente_id == cliente_id).all()
+    # Filtramos por `cliente_id` (y fechas si se envían). Si el rango llega a fechas
+    # archivadas se incluyen también los pedidos de `pedidos_archivo`.
+    return pedidos_cliente(db, cliente_id, desde, hasta)
+
+
+# --- 4b. Historial de pedidos del cliente (GET) ---
+# Devuelve los pedidos con sus líneas, nombre e imagen de cada producto en una sola
+# petición. `selectinload` carga detalles, productos y sus imágenes con un número fijo
+# de consultas (una por nivel) sin importar cuántos pedidos haya en la página.
+# Paginación por keyset: el cliente envía `antes_fecha`/`antes_id` del último pedido
+# recibido (devueltos como `siguiente_fecha`/`siguiente_id`).
+@router.get("/cliente/{cliente_id}/historial", response_model=HistorialPedidosOut)
+def historial_pedidos_cliente(
+    cliente_id: int,
+    antes_fecha: Optional[datetime] = Query(None),
+    antes_id: Optional[int] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    # Usa el índice (cliente_id, fecha_pedido, id_pedido); los pedidos sin fecha
+    # no se pueden ordenar en el keyset y se omiten. Si la página llega a fechas
+    # archivadas, también se leen `pedidos_archivo` / `detalle_pedido_archivo`.
+    # Pedimos uno de más para saber si existe una página siguiente.
+    pedidos = historial_cliente(db, cliente_id, antes_fecha, antes_id, limit + 1)
+    hay_mas = len(pedidos) > limit
+    pedidos = pedidos[:limit]
+
+    resultado = []
+    for p in pedidos:
+        detalles = []
+        for d in p.detalles:
+            producto = d.producto
+            imagen = None
+            if producto is not None:
+                for v in producto.videos:
+                    if v.tipo != 'perfil' and v.url:
+                        imagen = v.url
+                        break
+            detalles.append({
+                "id_detalle": d.id_detalle,
+                "producto_id": d.producto_id,
+                "producto_nombre": producto.nombre if producto else None,
+                "imagen": imagen,
+                "cantidad": d.cantidad,
+                "subtotal": d.subtotal,
+            })
+        resultado.append({
+            "id_pedido": p.id_pedido,
+            "fecha_pedido": p.fecha_pedido,
+            "estado": p.estado,
+            "total": p.total,
+            "detalles": detalles,
+        })
+
+    ultimo = pedidos[-1] if (hay_mas and pedidos) else None
+    return {
+        "pedidos": resultado,
+        "siguiente_fecha": ultimo.fecha_pedido if ultimo else None,
+        "siguiente_id": ultimo.id_pedido if ultimo else None,
+    }
 
 
 # --- 5. Obtener un pedido por ID (GET) ---
@@ -117,6 +186,44 @@ def obtener_pedido(pedido_id: int, db: Session = Depends(get_db)):
     return pedido
 
 
+# --- 6a. Actualizar el estado de varios pedidos (PUT) ---
+# Se declara antes de `/{pedido_id}` para que "estado" no se interprete como un ID.
+# Hace un único UPDATE ... WHERE id_pedido IN (...), obtiene los correos de los clientes
+# afectados en una sola consulta y envía los avisos en un hilo aparte.
+@router.put("/estado")
+def actualizar_estado_pedidos(datos: PedidoEstadoMasivo, db: Session = Depends(get_db)):
+    ids = list(set(datos.ids))
+
+    # Solo se notifica a los pedidos cuyo estado realmente cambia (igual que en `actualizar_pedido`).
+    cambios = (
+        db.query(Pedido.id_pedido, Pedido.fecha_pedido, Usuario.correo)
+        .outerjoin(Usuario, Usuario.id_usuario == Pedido.cliente_id)
+        .filter(
+            Pedido.id_pedido.in_(ids),
+            or_(Pedido.estado.is_(None), Pedido.estado != datos.estado),
+        )
+        .all()
+    )
+
+    actualizados = (
+        db.query(Pedido)
+        .filter(Pedido.id_pedido.in_(ids))
+        .update({Pedido.estado: datos.estado}, synchronize_session=False)
+    )
+    db.commit()
+
+    # El UPDATE masivo no pasa por la sesión: invalidar a mano los reportes de ventas.
+    for fecha in {fecha for _, fecha, _ in cambios}:
+        cache_reportes.invalidar_fecha(fecha)
+
+    notificaciones = [(correo, pedido_id, datos.estado) for pedido_id, _, correo in cambios if correo]
+    if notificaciones:
+        # No bloquear la respuesta esperando el envío de correos.
+        threading.Thread(target=enviar_cambios_estado_pedidos, args=(notificaciones,), daemon=True).start()
+
+    return {"actualizados": actualizados, "notificados": len(notificaciones)}
+
+
 # --- 6. Actualizar un pedido (PUT) ---
 # Este endpoint permite actualizar un recurso existente usando su ID.
 @router.put("/{pedido_id}", response_model=PedidoOut)
@@ -130,13 +237,21 @@ def actualizar_pedido(
         raise HTTPException(status_code=404, detail="Pedido no encontrado")
     # Guardar estado anterior para detectar cambios
     estado_anterior = pedido.estado
+    anterior = datos_pedido(pedido)
 
     # Iteramos sobre los datos recibidos en la petición.
     # `datos.dict(exclude_unset=True)` solo incluye los campos que el cliente envió.
-    for key, value in datos.dict(exclude_unset=True).items():
+    cambios = datos.dict(exclude_unset=True)
+    for key, value in cambios.items():
         # Usamos `setattr` para actualizar dinámicamente cada atributo del objeto.
         setattr(pedido, key, value)
 
+    # Si cambió la fecha, las líneas pasan del día anterior al nuevo en los acumulados.
+    if "fecha_pedido" in cambios:
+        for d in pedido.detalles:
+            restar_linea(db, anterior, d.producto_id, d.cantidad, d.subtotal)
+            sumar_linea(db, pedido, d.producto_id, d.cantidad, d.subtotal)
+
     # Guardamos los cambios en la base de datos.
     db.commit()
     # Recargamos el objeto para asegurarnos de que el cliente obtenga la versión más reciente.
@@ -168,6 +283,9 @@ def eliminar_pedido(pedido_id: int, db: Session = Depends(get_db)):
     if not pedido:
         raise HTTPException(status_code=404, detail="Pedido no encontrado")
     
+    # Sus líneas quedan sin pedido: salen de los acumulados.
+    for d in pedido.detalles:
+        restar_linea(db, pedido, d.producto_id, d.cantidad, d.subtotal)
     # Eliminamos el objeto de la sesión.
     db.delete(pedido)
     # Confirmamos la eliminación en la base de datos.
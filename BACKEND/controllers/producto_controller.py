@@ -1,15 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 from db.session import SessionLocal
-from dtos.producto_dto import ProductoCreate, ProductoOut, ProductoUpdate
-from models.detallepedido import DetallePedido
+from dtos.producto_dto import ProductoCreate, ProductoDetalleOut, ProductoOut, ProductoUpdate
 from models.producto import Producto
 from models.item import Item
 from models.inventario import Inventario
 from models.videos import Video
 from models.categoria import Categoria
 from sqlalchemy import func
+from utils.compras_cliente import productos_comprados as productos_comprados_cliente
+from utils.relacionados import motor_relacionados
 import os
 import uuid
 import datetime
@@ -43,7 +44,13 @@ def listar_productos(db: Session = Depends(get_db)):
 @router.get("/rich")
 def listar_productos_rich(db: Session = Depends(get_db)):
     """Return the latest products with thumbnail and price for frontend cards, ordered by creation date descending."""
-    productos = db.query(Producto).order_by(Producto.id.desc()).all()
+    # El acumulado de calificaciones viene en la misma consulta (LEFT JOIN).
+    productos = (
+        db.query(Producto)
+        .options(joinedload(Producto.calificacion))
+        .order_by(Producto.id.desc())
+        .all()
+    )
     out = []
     for p in productos:
         img = None
@@ -63,7 +70,9 @@ def listar_productos_rich(db: Session = Depends(get_db)):
             "descripcion": p.descripcion or "",
             "precio": price,
             "image": img,
-            "categoria": p.categoria_id
+            "categoria": p.categoria_id,
+            "calificacion": p.calificacion.promedio if p.calificacion else None,
+            "total_resenas": p.calificacion.total if p.calificacion else 0,
         })
     return out
 
@@ -76,6 +85,7 @@ def listar_productos_por_categoria_rich(categoria_name: str, db: Session = Depen
         db.query(Producto)
         .join(Categoria)
         .filter(func.lower(Categoria.nombre) == categoria_name.lower())
+        .options(joinedload(Producto.calificacion))
         .all()
     )
     out = []
@@ -97,16 +107,48 @@ def listar_productos_por_categoria_rich(categoria_name: str, db: Session = Depen
             "descripcion": p.descripcion or "",
             "precio": price,
             "image": img,
+            "calificacion": p.calificacion.promedio if p.calificacion else None,
+            "total_resenas": p.calificacion.total if p.calificacion else 0,
         })
     return out
 
 
-@router.get("/{producto_id}", response_model=ProductoOut)
+@router.get("/{producto_id}", response_model=ProductoDetalleOut)
 def obtener_producto(producto_id: int, db: Session = Depends(get_db)):
-    producto = db.get(Producto, producto_id)
+    producto = db.get(Producto, producto_id, options=[joinedload(Producto.calificacion)])
     if not producto:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    return producto
+    calificacion = producto.calificacion
+    return {
+        "id": producto.id,
+        "nombre": producto.nombre,
+        "descripcion": producto.descripcion,
+        "categoria_id": producto.categoria_id,
+        "calificacion": calificacion.promedio if calificacion else None,
+        "total_resenas": calificacion.total if calificacion else 0,
+        "histograma": calificacion.histograma if calificacion else [0, 0, 0, 0, 0],
+    }
+
+
+@router.get("/{producto_id}/relacionados")
+def productos_relacionados(producto_id: int, limit: int = 10, db: Session = Depends(get_db)):
+    """Productos comprados junto con este con más frecuencia.
+    Los vecinos salen del motor en memoria (utils/relacionados.py); solo se consulta
+    la base para los nombres."""
+    motor_relacionados.asegurar_vigente(db)
+    vecinos = motor_relacionados.vecinos(producto_id, limit=max(1, min(limit, 50)))
+    if not vecinos:
+        return []
+    nombres = dict(
+        db.query(Producto.id, Producto.nombre)
+        .filter(Producto.id.in_([pid for pid, _ in vecinos]))
+        .all()
+    )
+    return [
+        {"id": pid, "nombre": nombres[pid], "veces": veces}
+        for pid, veces in vecinos
+        if pid in nombres
+    ]
 
 
 @router.put("/{producto_id}", response_model=ProductoOut)
@@ -135,15 +177,7 @@ def eliminar_producto(producto_id: int, db: Session = Depends(get_db)):
 
 @router.get("/comprados/{cliente_id}")
 def productos_comprados(cliente_id: int, db: Session = Depends(get_db)):
-    productos_ids = (
-        db.query(DetallePedido.producto_id)
-        .filter_by(cliente_id=cliente_id)
-        .distinct()
-        .all()
-    )
-    productos = db.query(Producto).filter(
-        Producto.id.in_([p.producto_id for p in productos_ids])
-    ).all()
+    productos = productos_comprados_cliente(db, cliente_id)
     return [{"id": p.id, "nombre": p.nombre} for p in productos]
 
 
@@ -1,16 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 from db.session import SessionLocal
 from dtos.resena_dto import ResenaCreate, ResenaOut
 from models.resenas import Reseña
-from models.detallepedido import DetallePedido
 from models.producto import Producto
 from controllers.notificacion_controller import crear_notificacion
 from datetime import datetime
+from typing import Optional
 from pydantic import BaseModel
 from utils.email_utils import enviar_alerta_resena
 from utils.email_utils import enviar_respuesta_resena
 from models.usuarios import Usuario
+from utils.calificaciones import CALIFICACIONES, ajustar_calificacion
+from utils.compras_cliente import ha_comprado, productos_comprados as productos_comprados_cliente
+from utils.moderacion import moderador
 
 router = APIRouter(prefix="/resenas", tags=["reseñas"])
 
@@ -28,14 +32,12 @@ def get_db():
         db.close()
 
 def usuario_ha_comprado_producto(db, cliente_id, producto_id):
-    from models.detallepedido import DetallePedido
-    from models.pedido import Pedido
-    return db.query(DetallePedido).join(Pedido, DetallePedido.pedido_id == Pedido.id_pedido)\
-        .filter(Pedido.cliente_id == cliente_id, DetallePedido.producto_id == producto_id).count() > 0
+    # Búsqueda por llave primaria en cliente_producto_comprado (con caché en memoria)
+    return ha_comprado(db, cliente_id, producto_id)
 
-def es_comentario_apropiado(comentario: str) -> bool:
-    palabras_prohibidas = ["sapo", "hijodeputa", "Malparido"]
-    return not any(p in comentario.lower() for p in palabras_prohibidas)
+def es_comentario_apropiado(db, comentario: str) -> bool:
+    # Una sola pasada sobre el texto con la lista de `palabras_prohibidas` (utils/moderacion.py)
+    return moderador.es_apropiado(db, comentario)
 
 @router.post("/", response_model=ResenaOut)
 def crear_resena(resena: ResenaCreate, db: Session = Depends(get_db)):
@@ -45,11 +47,10 @@ def crear_resena(resena: ResenaCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail="Ya has reseñado este producto.")
     if len(resena.comentario) < 10:
         raise HTTPException(status_code=400, detail="El comentario debe tener al menos 10 caracteres.")
-    palabras_ofensivas = ["tonto", "idiota", "estúpido"]
-    if any(palabra in resena.comentario.lower() for palabra in palabras_ofensivas):
+    if resena.calificación not in CALIFICACIONES:
+        raise HTTPException(status_code=400, detail="La calificación debe estar entre 1 y 5.")
+    if not es_comentario_apropiado(db, resena.comentario):
         raise HTTPException(status_code=400, detail="El comentario contiene palabras inapropiadas.")
-    if not es_comentario_apropiado(resena.comentario):
-        raise HTTPException(status_code=400, detail="Comentario inapropiado.")
 
     nueva_resena = Reseña(
         cliente_id=resena.cliente_id,
@@ -59,6 +60,8 @@ def crear_resena(resena: ResenaCreate, db: Session = Depends(get_db)):
         fecha=datetime.now()
     )
     db.add(nueva_resena)
+    # El acumulado del producto se actualiza en la misma transacción que la reseña.
+    ajustar_calificacion(db, resena.producto_id, None, resena.calificación)
     db.commit()
     db.refresh(nueva_resena)
 
@@ -148,40 +151,19 @@ def obtener_resenas(producto_id: int = Query(...), db: Session = Depends(get_db)
 
 @router.get("/puede-resenar")
 def puede_resenar(producto_id: int, cliente_id: int, db: Session = Depends(get_db)):
-    from models.pedido import Pedido
-    from models.detallepedido import DetallePedido
-    from models.resenas import Reseña
-
     # ¿El cliente compró este producto?
-    compra = (
-        db.query(DetallePedido)
-        .join(Pedido, Pedido.id_pedido == DetallePedido.pedido_id)
-        .filter(Pedido.cliente_id == cliente_id, DetallePedido.producto_id == producto_id)
-        .first()
-    )
-    if not compra:
+    if not usuario_ha_comprado_producto(db, cliente_id, producto_id):
         return {"puede": False}
     # ¿Ya dejó reseña?
     ya_reseno = db.query(Reseña).filter_by(cliente_id=cliente_id, producto_id=producto_id).first()
     return {"puede": not bool(ya_reseno)}
 
-from models.detallepedido import DetallePedido
-from models.pedido import Pedido
-from models.producto import Producto
-
 @router.get("/comprados/{cliente_id}")
 def productos_comprados(cliente_id: int, db: Session = Depends(get_db)):
     """
     Devuelve los productos que el cliente ha comprado.
     """
-    productos = (
-        db.query(Producto.id, Producto.nombre)
-        .join(DetallePedido, DetallePedido.producto_id == Producto.id)
-        .join(Pedido, Pedido.id_pedido == DetallePedido.pedido_id)
-        .filter(Pedido.cliente_id == cliente_id)
-        .distinct()
-        .all()
-    )
+    productos = productos_comprados_cliente(db, cliente_id)
     return [{"id": p[0], "nombre": p[1]} for p in productos]
 
 @router.put("/{resena_id}")
@@ -190,74 +172,119 @@ def editar_resena(resena_id: int, calificacion: int = Body(...), comentario: str
     if not resena:
         raise HTTPException(status_code=404, detail="Reseña no encontrada")
     # Filtro de palabras ofensivas al editar
-    palabras_ofensivas = ["tonto", "idiota", "estúpido"]
-    if any(palabra in comentario.lower() for palabra in palabras_ofensivas):
+    if not es_comentario_apropiado(db, comentario):
         raise HTTPException(status_code=400, detail="El comentario contiene palabras inapropiadas.")
-    if not es_comentario_apropiado(comentario):
-        raise HTTPException(status_code=400, detail="Comentario inapropiado.")
-    resena.calificacion = calificacion
+    if calificacion not in CALIFICACIONES:
+        raise HTTPException(status_code=400, detail="La calificación debe estar entre 1 y 5.")
+    ajustar_calificacion(db, resena.producto_id, resena.calificación, calificacion)
+    resena.calificación = calificacion
     resena.comentario = comentario
     db.commit()
     db.refresh(resena)
     return resena
 
+# --- Listados de reseñas ---
+# Una sola consulta con JOIN a productos y usuarios trae los nombres del producto y
+# del cliente junto con cada reseña. Si se envía `limit`, la página se corta por
+# keyset (fecha desc, id desc) sobre los índices (producto_id|cliente_id, fecha,
+# id_reseña): la siguiente página se pide con `antes_fecha`/`antes_id` de la última
+# reseña recibida. Sin `limit` se devuelve la lista completa, como antes.
+
+def _consulta_resenas(db):
+    return (
+        db.query(Reseña, Producto.nombre, Usuario.nombre)
+        .outerjoin(Producto, Producto.id == Reseña.producto_id)
+        .outerjoin(Usuario, Usuario.id_usuario == Reseña.cliente_id)
+    )
+
+
+# Tamaño de página de los listados cuando el cliente no manda `limit`.
+RESENAS_LIMITE_DEFECTO = 50
+
+
+def _pagina_resenas(query, antes_fecha, antes_id, limit):
+    orden = (Reseña.fecha.desc(), Reseña.id_reseña.desc())
+    if limit is None:
+        return query.order_by(*orden).all()
+    # Las reseñas sin fecha no se pueden ordenar en el keyset y se omiten.
+    query = query.filter(Reseña.fecha.isnot(None))
+    if antes_fecha is not None:
+        if antes_id is not None:
+            query = query.filter(or_(
+                Reseña.fecha < antes_fecha,
+                and_(Reseña.fecha == antes_fecha, Reseña.id_reseña < antes_id),
+            ))
+        else:
+            query = query.filter(Reseña.fecha < antes_fecha)
+    return query.order_by(*orden).limit(limit).all()
+
+
+def _resena_listado(r, producto_nombre, cliente_nombre):
+    return {
+        "id": r.id_reseña,
+        "producto_id": r.producto_id,
+        "producto_nombre": producto_nombre,
+        "cliente_id": r.cliente_id,
+        "cliente_nombre": cliente_nombre,
+        "calificacion": r.calificación,
+        "comentario": r.comentario,
+        "respuesta_vendedor": r.respuesta_vendedor,
+        "fecha": r.fecha.isoformat() if r.fecha else ""
+    }
+
+
 @router.get("/vendedor/{vendedor_id}")
-def obtener_resenas_vendedor(vendedor_id: int, db: Session = Depends(get_db)):
-    productos = db.query(Producto).filter(Producto.vendedor_id == vendedor_id).all()
-    producto_ids = [p.id for p in productos]
-    resenas = db.query(Reseña).filter(Reseña.producto_id.in_(producto_ids)).all()
-    return [
-        {
-            "id": r.id_reseña,
-            "producto_id": r.producto_id,
-            "cliente_id": r.cliente_id,
-            "calificacion": getattr(r, "calificacion", getattr(r, "calificación", None)),
-            "comentario": r.comentario,
-            "respuesta_vendedor": r.respuesta_vendedor,
-            "fecha": r.fecha.isoformat() if r.fecha else ""
-        }
-        for r in resenas
-    ]
+def obtener_resenas_vendedor(
+    vendedor_id: int,
+    sin_responder: bool = Query(False, description="Solo reseñas sin respuesta del vendedor"),
+    max_calificacion: Optional[int] = Query(None, ge=1, le=5, description="Solo reseñas con calificación <= este valor"),
+    antes_fecha: Optional[datetime] = Query(None),
+    antes_id: Optional[int] = Query(None),
+    limit: int = Query(RESENAS_LIMITE_DEFECTO, ge=1, le=200),
+    sin_limite: bool = Query(False, description="Todas las reseñas sin paginar (clientes anteriores a la paginación)"),
+    db: Session = Depends(get_db)
+):
+    query = _consulta_resenas(db).filter(Producto.vendedor_id == vendedor_id)
+    if sin_responder:
+        query = query.filter(or_(Reseña.respuesta_vendedor.is_(None), Reseña.respuesta_vendedor == ""))
+    if max_calificacion is not None:
+        query = query.filter(Reseña.calificación <= max_calificacion)
+    filas = _pagina_resenas(query, antes_fecha, antes_id, None if sin_limite else limit)
+    return [_resena_listado(*fila) for fila in filas]
 
 @router.get("/cliente/{cliente_id}")
-def resenas_de_cliente(cliente_id: int, db: Session = Depends(get_db)):
+def resenas_de_cliente(
+    cliente_id: int,
+    antes_fecha: Optional[datetime] = Query(None),
+    antes_id: Optional[int] = Query(None),
+    limit: int = Query(RESENAS_LIMITE_DEFECTO, ge=1, le=200),
+    sin_limite: bool = Query(False, description="Todas las reseñas sin paginar (clientes anteriores a la paginación)"),
+    db: Session = Depends(get_db)
+):
     """
-    Devuelve todas las reseñas hechas por un cliente.
+    Devuelve las reseñas hechas por un cliente por páginas de `limit` (todas con `sin_limite`).
     """
-    resenas = db.query(Reseña).filter(Reseña.cliente_id == cliente_id).all()
-    return [
-        {
-            "id": r.id_reseña,
-            "producto_id": r.producto_id,
-            "calificacion": getattr(r, "calificacion", getattr(r, "calificación", None)),
-            "comentario": r.comentario,
-            "respuesta_vendedor": r.respuesta_vendedor,
-            "fecha": r.fecha
-        }
-        for r in resenas
-    ]
+    query = _consulta_resenas(db).filter(Reseña.cliente_id == cliente_id)
+    filas = _pagina_resenas(query, antes_fecha, antes_id, None if sin_limite else limit)
+    return [_resena_listado(*fila) for fila in filas]
 
 @router.delete("/{resena_id}")
 def eliminar_resena(resena_id: int, db: Session = Depends(get_db)):
     resena = db.query(Reseña).filter_by(id_reseña=resena_id).first()
     if not resena:
         raise HTTPException(status_code=404, detail="Reseña no encontrada")
+    ajustar_calificacion(db, resena.producto_id, resena.calificación, None)
     db.delete(resena)
     db.commit()
     return {"msg": "Reseña eliminada"}
 
 @router.get("/todas", response_model=list[ResenaOut])
-def obtener_todas_resenas(db: Session = Depends(get_db)):
-    resenas = db.query(Reseña).all()
-    return [
-        {
-            "id": r.id_reseña,
-            "producto_id": r.producto_id,
-            "cliente_id": r.cliente_id,
-            "calificacion": getattr(r, "calificacion", getattr(r, "calificación", None)),
-            "comentario": r.comentario,
-            "respuesta_vendedor": r.respuesta_vendedor,
-            "fecha": r.fecha.isoformat() if r.fecha else ""
-        }
-        for r in resenas
-    ]
+def obtener_todas_resenas(
+    antes_fecha: Optional[datetime] = Query(None),
+    antes_id: Optional[int] = Query(None),
+    limit: int = Query(RESENAS_LIMITE_DEFECTO, ge=1, le=200),
+    sin_limite: bool = Query(False, description="Todas las reseñas sin paginar (clientes anteriores a la paginación)"),
+    db: Session = Depends(get_db)
+):
+    filas = _pagina_resenas(_consulta_resenas(db), antes_fecha, antes_id, None if sin_limite else limit)
+    return [_resena_listado(*fila) for fila in filas]
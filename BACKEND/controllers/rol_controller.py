@@ -12,6 +12,8 @@ from db.session import SessionLocal
 from dtos.rol_dto import RolCreate, RolOut, RolUpdate
 # Importamos el modelo de SQLAlchemy que se mapea a la tabla 'roles' de la base de datos.
 from models.roles import Rol
+# Registro de roles en memoria usado por `require_role`; se recarga tras cada escritura.
+from utils.roles import registro_roles
 
 # Creamos un enrutador de FastAPI.
 # El `prefix` establece la URL base para todos los endpoints en este archivo (ej. /roles/).
@@ -52,6 +54,7 @@ def crear_rol(rol: RolCreate, db: Session = Depends(get_db)):
     db.commit()
     # Recargamos el objeto para obtener el ID que la base de datos ha asignado.
     db.refresh(db_rol)
+    registro_roles.recargar(db)
     # Devolvemos el rol creado.
     return db_rol
 
@@ -97,6 +100,7 @@ def actualizar_rol(rol_id: int, datos: RolUpdate, db: Session = Depends(get_db))
     db.commit()
     # Recargamos el objeto para obtener su estado actualizado desde la base de datos.
     db.refresh(rol)
+    registro_roles.recargar(db)
     # Devolvemos el objeto actualizado.
     return rol
 
@@ -115,6 +119,7 @@ def eliminar_rol(rol_id: int, db: Session = Depends(get_db)):
     db.delete(rol)
     # Confirmamos la eliminación en la base de datos.
     db.commit()
+    registro_roles.recargar(db)
     
     # Devolvemos una respuesta de éxito simple.
     return {"ok": True}
\ No newline at end of file
@@ -1,15 +1,15 @@
 # Importamos las herramientas principales de FastAPI y SQLAlchemy.
 from fastapi import APIRouter, Depends, HTTPException, Request, Body, Query, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 import random
 import string
 # removed direct MIMEText use; sending moved to utils.email_utils
-import bcrypt  # Librería para encriptar contraseñas.
 import threading # Para enviar correos de forma asíncrona.
-import time
 from typing import Optional, List
-from sqlalchemy import text
+from sqlalchemy import func, inspect, text
+from sqlalchemy.exc import IntegrityError
 import os
 import uuid
 import datetime
@@ -21,11 +21,20 @@ from db.session import SessionLocal
 # DTOs de Pydantic para la validación de datos de usuarios.
 from dtos.usuario_dto import UsuarioCreate, UsuarioOut, UsuarioUpdate, UsuarioLogin
 # Modelo de SQLAlchemy que se mapea a la tabla 'usuarios'.
+from models.roles import Rol
 from models.usuarios import Usuario
 from models.videos import Video
 # Funciones de utilidad para enviar correos y gestionar tokens.
 from utils.email_utils import send_registration_email, enviar_recuperacion_contrasena
-from utils.jwt_utils import create_access_token, create_refresh_token, get_current_user
+from utils.jwt_utils import create_access_token, create_refresh_token, get_current_user, oauth2_scheme, revoke_token
+# bcrypt en un pool de procesos propio (no bloquea el threadpool compartido).
+from utils.passwords import password_hasher
+# Bloqueo de intentos de login fallidos (MAX_LOGIN_ATTEMPTS, LOGIN_ATTEMPT_TIMEOUT), con
+# contadores compartidos entre workers.
+from utils.rate_limiting import BruteForceProtection
+# Roles en memoria: nombre del rol sin consultar `roles` y dependencia `require_role`.
+from utils.roles import registro_roles, require_role
+from utils.busqueda_usuarios import indice_nombres, normalizar_correo
 
 # Creamos un enrutador de FastAPI.
 router = APIRouter(prefix="/usuarios", tags=["usuarios"])
@@ -33,12 +42,6 @@ router = APIRouter(prefix="/usuarios", tags=["usuarios"])
 # Cargar variables de entorno
 load_dotenv()
 
-# --- Variables de seguridad para el bloqueo de intentos ---
-# Diccionario para almacenar intentos fallidos: {clave: [intentos, timestamp_bloqueo]}
-failed_attempts = {}
-MAX_ATTEMPTS = int(os.getenv("MAX_LOGIN_ATTEMPTS", "5"))
-BLOCK_TIME = int(os.getenv("LOGIN_ATTEMPT_TIMEOUT", "300"))
-
 # --- Dependencia de la base de datos ---
 # Función que gestiona la sesión de la base de datos.
 def get_db():
@@ -49,16 +52,23 @@ def get_db():
         db.close()
 
 
-# --- Funciones de seguridad y utilidad ---
+# El índice único de `usuarios.correo` rechaza correos repetidos aunque dos registros
+# pasen la verificación previa al mismo tiempo.
+def _commit_usuario(db: Session):
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Email ya registrado")
+
 
-# Esta función verifica si un usuario está bloqueado por demasiados intentos de login fallidos.
-def is_blocked(key):
-    if key in failed_attempts:
-        attempts, block_until = failed_attempts[key]
-        # Si hay un tiempo de bloqueo y el tiempo actual es menor al de bloqueo, está bloqueado.
-        if block_until and time.time() < block_until:
-            return True
-    return False
+# Los endpoints async (los que esperan al pool de hash) hacen sus consultas con
+# `run_in_threadpool`, como el bot, para no bloquear el event loop.
+def _usuario_por_correo(db: Session, correo: str):
+    return db.query(Usuario).filter(Usuario.correo == correo).first()
+
+
+# --- Funciones de seguridad y utilidad ---
 
 # Clase para la validación de la petición de recuperación de contraseña.
 class RecuperarRequest(BaseModel):
@@ -79,7 +89,7 @@ class RecuperarRequest(BaseModel):
 def crear_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
     db_usuario = Usuario(**usuario.dict())
     db.add(db_usuario)
-    db.commit()
+    _commit_usuario(db)
     db.refresh(db_usuario)
     return db_usuario
 
@@ -88,6 +98,75 @@ def crear_usuario(usuario: UsuarioCreate, db: Session = Depends(get_db)):
 def listar_usuarios(db: Session = Depends(get_db)):
     return db.query(Usuario).all()
 
+# Métricas del pool de hash de contraseñas (tiempo en cola y de hash).
+# Va antes de /{usuario_id} para que la ruta no se interprete como un id.
+@router.get("/metricas-hash")
+def metricas_hash(usuario: dict = Depends(require_role("vendedor"))):
+    return password_hasher.stats()
+
+### 10. Obtener perfil de usuario (GET, protegido)
+# Este endpoint requiere un token JWT válido para acceder.
+# /perfil y /reportes van antes de /{usuario_id} para que no se lean como un id.
+@router.get("/perfil")
+def perfil_usuario(current_user: dict = Depends(get_current_user)):
+    # `get_current_user` verifica el token y devuelve el payload del usuario.
+    # Si el token no es válido, `get_current_user` lanza una excepción HTTP 401.
+    return {"msg": f"Hola, {current_user['sub']}"}
+
+# --- Endpoint de Reportes Parametrizados para Usuarios ---
+# Sin ILIKE '%...%': el correo se busca por prefijo sobre `correo_busqueda` (indexada),
+# el rol con un join por `rol_id` y el nombre en el índice de trigramas en memoria
+# (ver utils/busqueda_usuarios.py).
+def filtrar_reporte_usuarios(query, correo, rol):
+    if correo:
+        prefijo = normalizar_correo(correo).replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.filter(Usuario.correo_busqueda.like(prefijo + "%", escape="\\"))
+    if rol:
+        query = query.join(Rol, Usuario.rol_id == Rol.id_rol).filter(Rol.nombre == rol)
+    return query
+
+
+# Ids (ordenados) que cumplen el filtro por nombre y los demás. Un nombre corto o común
+# coincide con muchos usuarios: se pagina esta lista en memoria y a la base solo va el
+# `IN` de la página.
+def ids_reporte_usuarios(db, nombre, correo, rol):
+    ids = indice_nombres.buscar(nombre, db)
+    if ids and (correo or rol):
+        permitidos = {i for (i,) in filtrar_reporte_usuarios(db.query(Usuario.id_usuario), correo, rol)}
+        ids = [i for i in ids if i in permitidos]
+    return ids
+
+
+@router.get("/reportes", response_model=List[UsuarioOut])
+def reportes_parametrizados_usuarios(
+    nombre: Optional[str] = Query(None),
+    correo: Optional[str] = Query(None),
+    rol: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db)
+):
+    if nombre:
+        pagina = ids_reporte_usuarios(db, nombre, correo, rol)[skip:skip + limit]
+        if not pagina:
+            return []
+        return db.query(Usuario).filter(Usuario.id_usuario.in_(pagina)).order_by(Usuario.id_usuario).all()
+    query = filtrar_reporte_usuarios(db.query(Usuario), correo, rol)
+    return query.order_by(Usuario.id_usuario).offset(skip).limit(limit).all()
+
+
+@router.get("/reportes/total")
+def total_reportes_usuarios(
+    nombre: Optional[str] = Query(None),
+    correo: Optional[str] = Query(None),
+    rol: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    if nombre:
+        return {"total": len(ids_reporte_usuarios(db, nombre, correo, rol))}
+    query = filtrar_reporte_usuarios(db.query(func.count(Usuario.id_usuario)), correo, rol)
+    return {"total": query.scalar() or 0}
+
 ### 3. Obtener un usuario por ID (GET)
 @router.get("/{usuario_id}", response_model=UsuarioOut)
 def obtener_usuario(usuario_id: int, db: Session = Depends(get_db)):
@@ -98,22 +177,25 @@ def obtener_usuario(usuario_id: int, db: Session = Depends(get_db)):
 
 ### 4. Actualizar un usuario (PUT)
 @router.put("/{usuario_id}", response_model=UsuarioOut)
-def actualizar_usuario(
+async def actualizar_usuario(
     usuario_id: int, datos: UsuarioUpdate, db: Session = Depends(get_db)
 ):
-    usuario = db.get(Usuario, usuario_id)
+    usuario = await run_in_threadpool(db.get, Usuario, usuario_id)
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     update_data = datos.dict(exclude_unset=True)
     # Si se envía una nueva contraseña, la encripta antes de guardar.
     if "contraseña" in update_data and update_data["contraseña"]:
-        hashed = bcrypt.hashpw(update_data["contraseña"].encode('utf-8'), bcrypt.gensalt())
-        update_data["contraseña"] = hashed.decode('utf-8')
-    for key, value in update_data.items():
-        setattr(usuario, key, value)
-    db.commit()
-    db.refresh(usuario)
-    return usuario
+        update_data["contraseña"] = await password_hasher.hash(update_data["contraseña"])
+
+    def guardar():
+        for key, value in update_data.items():
+            setattr(usuario, key, value)
+        _commit_usuario(db)
+        db.refresh(usuario)
+        return usuario
+
+    return await run_in_threadpool(guardar)
 
 ### 5. Eliminar un usuario (DELETE)
 @router.delete("/{usuario_id}")
@@ -131,35 +213,43 @@ def eliminar_usuario(usuario_id: int, db: Session = Depends(get_db)):
 
 ### 6. Registro de nuevo usuario (POST)
 @router.post("/register")
-def register(user: UsuarioCreate):
+async def register(user: UsuarioCreate):
     db = SessionLocal()
-    # Verifica si el correo ya existe.
-    db_user = db.query(Usuario).filter(Usuario.correo == user.correo).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Email ya registrado")
-    # Encriptar la contraseña antes de guardar con `bcrypt`.
-    hashed = bcrypt.hashpw(user.contraseña.encode('utf-8'), bcrypt.gensalt())
-    nuevo_usuario = Usuario(**user.dict())
-    nuevo_usuario.contraseña = hashed.decode('utf-8')
-    nuevo_usuario.estado = 1  # Activo por defecto
-    # Hashear la respuesta de seguridad con bcrypt (igual que la contraseña)
-    if getattr(user, 'seguridad_respuesta', None):
-        hashed_resp = bcrypt.hashpw(user.seguridad_respuesta.strip().encode('utf-8'), bcrypt.gensalt())
-        nuevo_usuario.seguridad_respuesta = hashed_resp.decode('utf-8')
-    db.add(nuevo_usuario)
-    db.commit()
-    db.refresh(nuevo_usuario)
+    try:
+        # Verifica si el correo ya existe.
+        db_user = await run_in_threadpool(_usuario_por_correo, db, user.correo)
+        if db_user:
+            raise HTTPException(status_code=400, detail="Email ya registrado")
+        nuevo_usuario = Usuario(**user.dict())
+        # Encriptar la contraseña antes de guardar con `bcrypt`.
+        nuevo_usuario.contraseña = await password_hasher.hash(user.contraseña)
+        nuevo_usuario.estado = 1  # Activo por defecto
+        # Hashear la respuesta de seguridad con bcrypt (igual que la contraseña)
+        if getattr(user, 'seguridad_respuesta', None):
+            nuevo_usuario.seguridad_respuesta = await password_hasher.hash(user.seguridad_respuesta.strip())
+
+        def guardar():
+            db.add(nuevo_usuario)
+            _commit_usuario(db)
+            return nuevo_usuario.id_usuario
+
+        id_usuario = await run_in_threadpool(guardar)
+    finally:
+        db.close()
     
     # Enviar correo de notificación en un hilo aparte para no bloquear la respuesta.
     threading.Thread(target=send_registration_email, args=(user.correo,)).start()
     
-    return {"msg": "Usuario creado", "usuario": nuevo_usuario.id_usuario}
+    return {"msg": "Usuario creado", "usuario": id_usuario}
 
 
 @router.post("/{usuario_id}/verificar-seguridad")
-def verificar_seguridad(usuario_id: int, payload: dict):
+async def verificar_seguridad(usuario_id: int, payload: dict):
     db = SessionLocal()
-    usuario = db.query(Usuario).filter(Usuario.id_usuario == usuario_id).first()
+    try:
+        usuario = await run_in_threadpool(db.get, Usuario, usuario_id)
+    finally:
+        db.close()
     if not usuario:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     respuesta = payload.get("respuesta", "").strip()
@@ -168,62 +258,76 @@ def verificar_seguridad(usuario_id: int, payload: dict):
     
     # Verificar con bcrypt (igual que en login)
     # La respuesta se envía en texto plano, el hash está en la BD
-    if not bcrypt.checkpw(respuesta.encode('utf-8'), usuario.seguridad_respuesta.encode('utf-8')):
+    if not await password_hasher.verify(respuesta, usuario.seguridad_respuesta):
         raise HTTPException(status_code=401, detail="Respuesta de seguridad incorrecta")
     
     return {"msg": "Verificación exitosa", "valid": True}
 
 ### 7. Login de usuario (POST)
 @router.post("/login")
-def login(user: UsuarioLogin, request: Request):
-    key = user.correo
-    if is_blocked(key):
+async def login(user: UsuarioLogin, request: Request):
+    key = f"login:{user.correo}"
+    if BruteForceProtection.is_blocked(key):
         raise HTTPException(status_code=429, detail="Demasiados intentos fallidos. Intenta de nuevo más tarde en 5 minutos.")
 
     db = SessionLocal()
-    db_user = db.query(Usuario).filter(Usuario.correo == user.correo).first()
-    if not db_user or not bcrypt.checkpw(user.contraseña.encode('utf-8'), db_user.contraseña.encode('utf-8')):
-        attempts, block_until = failed_attempts.get(key, (0, None))
-        attempts += 1
-        if attempts >= MAX_ATTEMPTS:
-            failed_attempts[key] = (attempts, time.time() + BLOCK_TIME)
-        else:
-            failed_attempts[key] = (attempts, None)
-        raise HTTPException(status_code=401, detail="Credenciales incorrectas")
-    failed_attempts.pop(key, None)
-    access_token = create_access_token({"sub": db_user.correo, "id": db_user.id_usuario})
-    refresh_token = create_refresh_token({"sub": db_user.correo, "id": db_user.id_usuario})
+    try:
+        db_user = await run_in_threadpool(_usuario_por_correo, db, user.correo)
+        if not db_user or not await password_hasher.verify(user.contraseña, db_user.contraseña):
+            BruteForceProtection.record_failure(key)
+            raise HTTPException(status_code=401, detail="Credenciales incorrectas")
+        BruteForceProtection.record_success(key)
+        # Si cambió PASSWORD_HASH_ROUNDS, se actualiza el hash ahora que tenemos la contraseña.
+        nuevo_hash = None
+        if password_hasher.needs_rehash(db_user.contraseña):
+            nuevo_hash = await password_hasher.hash(user.contraseña)
+
+        def completar():
+            if nuevo_hash is not None:
+                db_user.contraseña = nuevo_hash
+                db.commit()
+            return db_user.id_usuario, db_user.nombre, db_user.correo, db_user.rol_id, db_user.estado, \
+                registro_roles.nombre(db_user.rol_id, db)
+
+        id_usuario, nombre, correo, rol_id, estado, rol = await run_in_threadpool(completar)
+    finally:
+        db.close()
+    # El rol va en el token para que `require_role` no consulte la base de datos.
+    datos = {"sub": correo, "id": id_usuario, "rol_id": rol_id}
+    access_token = create_access_token(datos)
+    refresh_token = create_refresh_token(datos)
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
-        "id_usuario": db_user.id_usuario,
-        "nombre": db_user.nombre,
-        "correo": db_user.correo,
-        "rol": db_user.rol.nombre,
-        "rol_id": db_user.rol_id,
+        "id_usuario": id_usuario,
+        "nombre": nombre,
+        "correo": correo,
+        "rol": rol,
+        "rol_id": rol_id,
         # Coerce boolean/None to int/None to match DTO expectations (0/1/null)
-        "estado": int(db_user.estado) if db_user.estado is not None else None
+        "estado": int(estado) if estado is not None else None
     }
 
 ### 8. Recuperar contraseña (POST)
 @router.post("/recuperar-contrasena")
-def recuperar_contrasena(payload: RecuperarRequest):
+async def recuperar_contrasena(payload: RecuperarRequest):
     # Aceptar tanto {"email": "..."} como {"correo": "..."}
     email = payload.email or payload.correo or payload.dict().get('email') or payload.dict().get('correo')
     if not email:
         raise HTTPException(status_code=422, detail=[{"type": "missing", "loc": ["body", "email"], "msg": "Field required", "input": payload.dict()}])
 
     db = SessionLocal()
-    usuario = db.query(Usuario).filter(Usuario.correo == email).first()
+    try:
+        usuario = await run_in_threadpool(_usuario_por_correo, db, email)
 
-    # Genera una contraseña aleatoria de 8 caracteres y actualiza solo si el usuario existe.
-    nueva_contrasena = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
-    if usuario:
-        hashed = bcrypt.hashpw(nueva_contrasena.encode('utf-8'), bcrypt.gensalt())
-        usuario.contraseña = hashed.decode('utf-8')
-        db.commit()
-    db.close()
+        # Genera una contraseña aleatoria de 8 caracteres y actualiza solo si el usuario existe.
+        nueva_contrasena = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
+        if usuario:
+            usuario.contraseña = await password_hasher.hash(nueva_contrasena)
+            await run_in_threadpool(db.commit)
+    finally:
+        db.close()
 
     # Envía el correo con la nueva contraseña temporal (si el usuario existe).
     # No indicamos en la respuesta si el email existe para no permitir enumeración.
@@ -243,65 +347,63 @@ def recuperar_contrasena(payload: RecuperarRequest):
 @router.post("/refresh")
 def refresh_token(refresh_token: str = Body(...)):
     from utils.jwt_utils import create_access_token, verify_token
-    # Verifica si el refresh token es válido.
+    # Verifica si el refresh token es válido y que sea de tipo refresh (los tokens sin
+    # `type` son de acceso antiguos).
     payload = verify_token(refresh_token)
-    if not payload:
+    if not payload or payload.get("type") != "refresh":
         raise HTTPException(status_code=401, detail="Refresh token inválido o expirado")
     
-    # Crea un nuevo token de acceso a partir de los datos del payload.
-    access_token = create_access_token({"sub": payload["sub"], "id": payload["id"]})
-    return {"access_token": access_token, "token_type": "bearer"}
+    # El rol se lee de nuevo: un cambio de rol del usuario aplica en el siguiente refresh
+    # (una consulta por refresh, no por petición).
+    db = SessionLocal()
+    try:
+        usuario = db.query(Usuario.rol_id).filter(Usuario.id_usuario == payload.get("id")).first()
+    finally:
+        db.close()
+    if usuario is None:
+        raise HTTPException(status_code=401, detail="Refresh token inválido o expirado")
 
-### 10. Obtener perfil de usuario (GET, protegido)
-# Este endpoint requiere un token JWT válido para acceder.
-@router.get("/perfil")
-def perfil_usuario(current_user: dict = Depends(get_current_user)):
-    # `get_current_user` verifica el token y devuelve el payload del usuario.
-    # Si el token no es válido, `get_current_user` lanza una excepción HTTP 401.
-    return {"msg": f"Hola, {current_user['sub']}"}
+    # Rotación: el refresh token usado queda revocado y se entrega uno nuevo.
+    revoke_token(refresh_token)
+    datos = {"sub": payload["sub"], "id": payload["id"], "rol_id": usuario.rol_id}
+    return {
+        "access_token": create_access_token(datos),
+        "refresh_token": create_refresh_token(datos),
+        "token_type": "bearer",
+    }
 
-# --- Endpoint de Reportes Parametrizados para Usuarios ---
-@router.get("/reportes", response_model=List[UsuarioOut])
-def reportes_parametrizados_usuarios(
-    nombre: Optional[str] = Query(None),
-    correo: Optional[str] = Query(None),
-    rol: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
-):
-    query = db.query(Usuario)
-    if nombre:
-        query = query.filter(Usuario.nombre.ilike(f"%{nombre}%"))
-    if correo:
-        query = query.filter(Usuario.correo.ilike(f"%{correo}%"))
-    if rol:
-        query = query.filter(Usuario.rol.has(nombre=rol))
-    return query.all()
-# Comentario: Endpoint de reportes parametrizados para usuarios.
+### Cerrar sesión (POST)
+# Revoca el token de acceso (y el refresh token si se envía) para que dejen de servir.
+@router.post("/logout")
+def logout(token: str = Depends(oauth2_scheme), refresh_token: Optional[str] = Body(None, embed=True)):
+    revoke_token(token)
+    if refresh_token:
+        revoke_token(refresh_token)
+    return {"msg": "Sesión cerrada"}
 
 # --- Endpoint de Carga Masiva de Usuarios ---
 @router.post("/bulk", response_model=List[UsuarioOut])
-def carga_masiva_usuarios(
+async def carga_masiva_usuarios(
     usuarios: List[UsuarioCreate],
     db: Session = Depends(get_db)
 ):
+    # Los hashes se calculan en paralelo en el pool de procesos.
+    hashes = await password_hasher.hash_many([u.contraseña for u in usuarios])
     nuevos_usuarios = []
-    for u in usuarios:
-        hashed = bcrypt.hashpw(u.contraseña.encode('utf-8'), bcrypt.gensalt())
+    for u, hashed in zip(usuarios, hashes):
         usuario = Usuario(**u.dict())
-        usuario.contraseña = hashed.decode('utf-8')
+        usuario.contraseña = hashed
         nuevos_usuarios.append(usuario)
-    db.add_all(nuevos_usuarios)
-    db.commit()
-    for u in nuevos_usuarios:
-        db.refresh(u)
-    return nuevos_usuarios
-# Comentario: Endpoint para carga masiva de usuarios.
 
-blacklist = set()
+    def guardar():
+        db.add_all(nuevos_usuarios)
+        _commit_usuario(db)
+        # Una sola consulta recarga todos (en lugar de un refresh por usuario).
+        ids = [inspect(u).identity[0] for u in nuevos_usuarios]
+        return db.query(Usuario).filter(Usuario.id_usuario.in_(ids)).order_by(Usuario.id_usuario).all()
 
-def logout(token):
-    blacklist.add(token)
-    return {"msg": "Sesión cerrada"}
+    return await run_in_threadpool(guardar)
+# Comentario: Endpoint para carga masiva de usuarios.
 
 ### 11. Desactivar un usuario (PUT)
 @router.put("/{usuario_id}/desactivar")
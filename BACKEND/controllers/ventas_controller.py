@@ -1,14 +1,17 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from db.session import SessionLocal
 from fastapi.responses import JSONResponse
-from sqlalchemy import text, func
-from datetime import datetime
+from sqlalchemy import func, select, text
+from datetime import date as date_type, datetime
 
 # Models para consultas
-from models.detallepedido import DetallePedido
+from models.categoria import Categoria
 from models.producto import Producto
-from models.pedido import Pedido
+from models.venta_diaria import VentaDiaria
+from utils.cache_reportes import cache_reportes, periodo_cerrado
+from utils.series_ventas import SIN_CATEGORIA, armar_serie, validar_rango
 
 router = APIRouter(prefix="/ventas", tags=["ventas"])
 
@@ -23,20 +26,28 @@ def get_db():
 
 @router.get("/")
 def consultar_ventas(
-    anio: int = Query(...),
-    mes: int = Query(None),
-    dia: int = Query(None),
+    anio: int = Query(..., ge=1, le=9999),
+    mes: int = Query(None, ge=1, le=12),
+    dia: int = Query(None, ge=1, le=31),
     db: Session = Depends(get_db)
 ):
+    # Los periodos cerrados se sirven desde la caché (memoria/disco); el periodo
+    # en curso se cachea unos segundos para no repetir el SP en cada refresco.
+    params = {"anio": anio, "mes": mes, "dia": dia}
+    data = cache_reportes.obtener("ventas", params)
+    if data is not None:
+        return JSONResponse(content=data)
+
     # Llama al SP con los parámetros recibidos
     result = db.execute(
         text("CALL SP_ConsultarVentasVendedor(:anio, :mes, :dia)"),
-        {"anio": anio, "mes": mes, "dia": dia}
+        params
     )
     # Obtén los resultados como lista de dicts
     rows = result.fetchall()
     columns = result.keys()
-    data = [dict(zip(columns, row)) for row in rows]
+    data = jsonable_encoder([dict(zip(columns, row)) for row in rows])
+    cache_reportes.guardar("ventas", params, data, permanente=periodo_cerrado(anio, mes, dia))
     return JSONResponse(content=data)
 
 
@@ -45,26 +56,28 @@ def reporte_ventas_diario(date: str = Query(None, description="Fecha en formato
     """Retorna ventas del dia agrupadas por producto.
     Responde con: [{ producto_id, producto_nombre, total_cantidad, total_revenue }]
     Si `date` no se provee, usa la fecha actual.
+    Lee la tabla acumulada `ventas_diarias` (una fila por producto vendido ese día)
+    en lugar de re-agregar `detalle_pedido`.
     """
     if not date:
-        date = datetime.today().strftime("%Y-%m-%d")
+        fecha = datetime.today().date()
+    else:
+        try:
+            fecha = datetime.strptime(date, "%Y-%m-%d").date()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Fecha inválida, usa el formato YYYY-MM-DD")
 
-    # Agregación por producto usando SQLAlchemy
-    # JOIN detalle_pedido -> pedidos (para fecha) y productos (para nombre)
-    query = (
+    rows = (
         db.query(
-            DetallePedido.producto_id,
+            VentaDiaria.producto_id,
             Producto.nombre,
-            func.coalesce(func.sum(DetallePedido.cantidad), 0).label("total_cantidad"),
-            func.coalesce(func.sum(DetallePedido.subtotal), 0.0).label("total_revenue"),
+            VentaDiaria.total_cantidad,
+            VentaDiaria.total_revenue,
         )
-        .join(Pedido, DetallePedido.pedido_id == Pedido.id_pedido)
-        .join(Producto, DetallePedido.producto_id == Producto.id)
-        .filter(func.DATE(Pedido.fecha_pedido) == date)
-        .group_by(DetallePedido.producto_id, Producto.nombre)
+        .join(Producto, VentaDiaria.producto_id == Producto.id)
+        .filter(VentaDiaria.fecha == fecha)
+        .all()
     )
-
-    rows = query.all()
     result = []
     for r in rows:
         producto_id = int(r[0])
@@ -78,4 +91,56 @@ def reporte_ventas_diario(date: str = Query(None, description="Fecha en formato
             "total_revenue": total_revenue,
         })
 
-    return JSONResponse(content=result)
\ No newline at end of file
+    return JSONResponse(content=result)
+
+
+@router.get("/serie")
+def serie_ventas(
+    desde: date_type = Query(..., description="Fecha inicial YYYY-MM-DD"),
+    hasta: date_type = Query(..., description="Fecha final YYYY-MM-DD (inclusive)"),
+    bucket: str = Query("day", pattern="^(day|week|month)$"),
+    group: str = Query("producto", pattern="^(producto|categoria)$"),
+    db: Session = Depends(get_db)
+):
+    """Serie de ventas entre `desde` y `hasta` agrupada por producto o categoría,
+    en intervalos de día, semana o mes.
+    Responde con: { buckets: [fecha_inicio...], series: [{ id, nombre, cantidad[], revenue[] }], totales }
+    Una sola consulta por rango sobre `ventas_diarias` (llave primaria por fecha);
+    los intervalos sin ventas se devuelven en 0. El rango máximo depende del intervalo
+    (`SERIE_VENTAS_MAX_DIAS`); por encima responde 400.
+    """
+    error = validar_rango(desde, hasta, bucket)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    rango = (VentaDiaria.fecha >= desde, VentaDiaria.fecha <= hasta)
+    if group == "producto":
+        stmt = (
+            select(
+                VentaDiaria.fecha,
+                VentaDiaria.producto_id,
+                Producto.nombre,
+                VentaDiaria.total_cantidad,
+                VentaDiaria.total_revenue,
+            )
+            .join(Producto, VentaDiaria.producto_id == Producto.id)
+            .where(*rango)
+        )
+    else:
+        stmt = (
+            select(
+                VentaDiaria.fecha,
+                func.coalesce(Categoria.id, 0),
+                func.coalesce(Categoria.nombre, SIN_CATEGORIA),
+                func.sum(VentaDiaria.total_cantidad),
+                func.sum(VentaDiaria.total_revenue),
+            )
+            .join(Producto, VentaDiaria.producto_id == Producto.id)
+            # Outer join: los productos sin categoría van a la serie id 0 "Sin categoría".
+            .outerjoin(Categoria, Producto.categoria_id == Categoria.id)
+            .where(*rango)
+            .group_by(VentaDiaria.fecha, Categoria.id, Categoria.nombre)
+        )
+
+    filas = db.execute(stmt).all()
+    return JSONResponse(content=armar_serie(filas, desde, hasta, bucket))
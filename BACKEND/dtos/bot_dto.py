@@ -11,7 +11,8 @@ class BotRequest(BaseModel):
     # If the user is not logged in, this can be null/None
     usuario_origen: Optional[int] = None
     mensaje: str
-    # Optional recent conversation history from frontend (helps AI be coherent)
+    # Optional conversation history from older clients. The server keeps each user's recent
+    # turns itself (utils/bot_history.py), so new clients only send `mensaje`.
     history: Optional[List[dict]] = None
 
 
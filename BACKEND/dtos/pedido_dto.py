@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class PedidoBase(BaseModel):
@@ -26,6 +26,11 @@ class PedidoUpdate(BaseModel):
     total: float | None = None
 
 
+class PedidoEstadoMasivo(BaseModel):
+    ids: list[int] = Field(..., min_length=1, max_length=1000)
+    estado: str
+
+
 class PedidoOut(BaseModel):
     id_pedido: int
     cliente_id: int
@@ -36,3 +41,27 @@ class PedidoOut(BaseModel):
 
     class Config:
         orm_mode = True
+
+
+class DetalleHistorialOut(BaseModel):
+    id_detalle: int
+    producto_id: Optional[int] = None
+    producto_nombre: Optional[str] = None
+    imagen: Optional[str] = None
+    cantidad: Optional[int] = None
+    subtotal: Optional[float] = None
+
+
+class PedidoHistorialOut(BaseModel):
+    id_pedido: int
+    fecha_pedido: Optional[datetime] = None
+    estado: Optional[str] = None
+    total: Optional[float] = None
+    detalles: list[DetalleHistorialOut] = []
+
+
+class HistorialPedidosOut(BaseModel):
+    pedidos: list[PedidoHistorialOut]
+    # Cursor para la siguiente página (None si no hay más pedidos)
+    siguiente_fecha: Optional[datetime] = None
+    siguiente_id: Optional[int] = None
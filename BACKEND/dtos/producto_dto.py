@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -25,3 +25,10 @@ class ProductoOut(BaseModel):
 
     class Config:
         from_attributes = True  # Usa esto en vez de orm_mode en Pydantic v2
+
+
+class ProductoDetalleOut(ProductoOut):
+    # Acumulado de reseñas (tabla calificaciones_producto)
+    calificacion: Optional[float] = None
+    total_resenas: int = 0
+    histograma: List[int] = [0, 0, 0, 0, 0]
@@ -23,8 +23,15 @@ from controllers.rol_controller import router as rol_router
 from controllers.usuario_controller import router as usuario_router
 from controllers.bot_controller import router as bot_router
 from controllers.bot_admin_controller import router as bot_admin_router
+from controllers.moderacion_controller import router as moderacion_router
 from api import compra
 from controllers.ventas_controller import router as ventas_router
+from utils.openai_utils import close_client as cerrar_cliente_openai
+from utils.chat_log import chat_log
+from utils.passwords import password_hasher
+from utils.relacionados import motor_relacionados
+from utils.rate_limiting import RateLimitMiddleware
+from config import RATE_LIMIT_ENABLED
 
 # --- Crear la instancia de la aplicación FastAPI ---
 app = FastAPI()
@@ -85,12 +92,19 @@ if environment == "production":
 else:
     allow_credentials_cors = True
 
+# --- Rate limiting por ruta (login, compra, bot, catálogo) ---
+# Se registra antes que CORS para quedar por dentro: las respuestas 429 también llevan
+# las cabeceras CORS y el navegador puede leer el Retry-After.
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_credentials=allow_credentials_cors,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["Retry-After"],
 )
 
 @app.middleware("http")
@@ -140,6 +154,16 @@ app.include_router(pago_router)
 app.include_router(ventas_router)
 app.include_router(bot_router)
 app.include_router(bot_admin_router)
+app.include_router(moderacion_router)
+
+# Cerrar las conexiones del cliente de OpenAI y escribir el log de chat pendiente al apagar el servidor
+app.add_event_handler("shutdown", cerrar_cliente_openai)
+app.add_event_handler("shutdown", chat_log.close)
+# Arrancar los procesos del hash de contraseñas con la app y detenerlos al apagarla
+app.add_event_handler("startup", password_hasher.start)
+app.add_event_handler("shutdown", password_hasher.close)
+# Cargar la matriz de "comprados juntos" en segundo plano (utils/relacionados.py)
+app.add_event_handler("startup", motor_relacionados.iniciar_carga)
 
 # --- RUTA RAÍZ AÑADIDA PARA VISIBILIDAD DE DOCUMENTACIÓN ---
 @app.get("/", tags=["Healthcheck"])
@@ -32,6 +32,7 @@ if RAILWAY_DATABASE_URL:
 
 from db import Base, SQLALCHEMY_DATABASE_URL
 from models import Categoria, Producto , Item ,Usuario ,Rol , Inventario, Pedido, DetallePedido ,Video, Notificacion,Chat,Reseña ,Pago
+from models import PedidoArchivo, DetallePedidoArchivo, VentaDiaria, CalificacionProducto, ClienteProductoComprado, PalabraProhibida, BotResponseProposal, RevokedToken
 
 
 # this is the Alembic Config object, which provides
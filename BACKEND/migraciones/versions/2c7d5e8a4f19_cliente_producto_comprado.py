@@ -0,0 +1,50 @@
+"""Tabla cliente_producto_comprado
+
+Revision ID: 2c7d5e8a4f19
+Revises: 9e4b2f6c1a38
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c7d5e8a4f19'
+down_revision: Union[str, None] = '9e4b2f6c1a38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('cliente_producto_comprado',
+    sa.Column('cliente_id', sa.Integer(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('primera_fecha', sa.DateTime(), nullable=True),
+    sa.Column('veces', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['cliente_id'], ['usuarios.id_usuario'], ),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.PrimaryKeyConstraint('cliente_id', 'producto_id')
+    )
+    # Carga inicial desde el historial (vivo + archivado)
+    op.execute(
+        "INSERT INTO cliente_producto_comprado (cliente_id, producto_id, primera_fecha, veces) "
+        "SELECT l.cliente_id, l.producto_id, MIN(l.fecha), COUNT(*) "
+        "FROM ("
+        " SELECT p.cliente_id, d.producto_id, p.fecha_pedido AS fecha"
+        " FROM detalle_pedido d JOIN pedidos p ON d.pedido_id = p.id_pedido"
+        " WHERE p.cliente_id IS NOT NULL AND d.producto_id IS NOT NULL"
+        " UNION ALL"
+        " SELECT p.cliente_id, d.producto_id, p.fecha_pedido AS fecha"
+        " FROM detalle_pedido_archivo d JOIN pedidos_archivo p ON d.pedido_id = p.id_pedido"
+        " WHERE p.cliente_id IS NOT NULL AND d.producto_id IS NOT NULL"
+        ") l GROUP BY l.cliente_id, l.producto_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('cliente_producto_comprado')
@@ -0,0 +1,43 @@
+"""Indices para reportes de inventario y detalle de pedido
+
+Revision ID: 4f2a9c1d7e3b
+Revises: b33559cd47b4
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f2a9c1d7e3b'
+down_revision: Union[str, None] = 'b33559cd47b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Cubren las combinaciones de filtros de /inventarios/reportes
+    op.create_index('ix_inventarios_producto_cantidad', 'inventarios', ['producto_id', 'cantidad'], unique=False)
+    op.create_index('ix_inventarios_cantidad', 'inventarios', ['cantidad'], unique=False)
+    # Cubren las combinaciones de filtros de /detalles_pedido/reportes
+    op.create_index('ix_detalle_pedido_pedido_cantidad', 'detalle_pedido', ['pedido_id', 'cantidad'], unique=False)
+    op.create_index('ix_detalle_pedido_producto_cantidad', 'detalle_pedido', ['producto_id', 'cantidad'], unique=False)
+    op.create_index('ix_detalle_pedido_cantidad', 'detalle_pedido', ['cantidad'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # MySQL descarta el índice implícito de una FK cuando otro índice la cubre;
+    # lo recreamos antes de borrar los compuestos para no romper las FKs.
+    op.create_index('producto_id', 'inventarios', ['producto_id'], unique=False)
+    op.create_index('pedido_id', 'detalle_pedido', ['pedido_id'], unique=False)
+    op.create_index('producto_id', 'detalle_pedido', ['producto_id'], unique=False)
+    op.drop_index('ix_detalle_pedido_cantidad', table_name='detalle_pedido')
+    op.drop_index('ix_detalle_pedido_producto_cantidad', table_name='detalle_pedido')
+    op.drop_index('ix_detalle_pedido_pedido_cantidad', table_name='detalle_pedido')
+    op.drop_index('ix_inventarios_cantidad', table_name='inventarios')
+    op.drop_index('ix_inventarios_producto_cantidad', table_name='inventarios')
@@ -0,0 +1,49 @@
+"""Tabla acumulada ventas_diarias
+
+Revision ID: 5a0e7c3b9d21
+Revises: d17b3e9f0a6c
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a0e7c3b9d21'
+down_revision: Union[str, None] = 'd17b3e9f0a6c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ventas_diarias',
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('total_cantidad', sa.Integer(), nullable=False),
+    sa.Column('total_revenue', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.PrimaryKeyConstraint('fecha', 'producto_id')
+    )
+    # Carga inicial desde el historial (vivo + archivado)
+    op.execute(
+        "INSERT INTO ventas_diarias (fecha, producto_id, total_cantidad, total_revenue) "
+        "SELECT l.fecha, l.producto_id, COALESCE(SUM(l.cantidad), 0), COALESCE(SUM(l.subtotal), 0) "
+        "FROM ("
+        " SELECT DATE(p.fecha_pedido) AS fecha, d.producto_id, d.cantidad, d.subtotal"
+        " FROM detalle_pedido d JOIN pedidos p ON d.pedido_id = p.id_pedido"
+        " WHERE p.fecha_pedido IS NOT NULL AND d.producto_id IS NOT NULL"
+        " UNION ALL"
+        " SELECT DATE(p.fecha_pedido) AS fecha, d.producto_id, d.cantidad, d.subtotal"
+        " FROM detalle_pedido_archivo d JOIN pedidos_archivo p ON d.pedido_id = p.id_pedido"
+        " WHERE d.producto_id IS NOT NULL"
+        ") l GROUP BY l.fecha, l.producto_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('ventas_diarias')
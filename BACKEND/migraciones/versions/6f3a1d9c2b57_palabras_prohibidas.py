@@ -0,0 +1,37 @@
+"""Tabla palabras_prohibidas
+
+Revision ID: 6f3a1d9c2b57
+Revises: 2c7d5e8a4f19
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f3a1d9c2b57'
+down_revision: Union[str, None] = '2c7d5e8a4f19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    palabras = op.create_table('palabras_prohibidas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('palabra', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('palabra')
+    )
+    # Lista que antes estaba fija en resena_controller
+    op.bulk_insert(palabras, [
+        {'palabra': p} for p in ['sapo', 'hijodeputa', 'malparido', 'tonto', 'idiota', 'estupido']
+    ])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('palabras_prohibidas')
@@ -0,0 +1,50 @@
+"""Búsqueda indexada de usuarios e índice único de correo
+
+Revision ID: 7d3f1b8e6a20
+Revises: 5c2e9a71b4d8
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3f1b8e6a20'
+down_revision: Union[str, None] = '5c2e9a71b4d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # El índice único falla si ya hay correos repetidos: se listan para resolverlos a mano.
+    duplicados = op.get_bind().execute(sa.text(
+        "SELECT correo, COUNT(*) FROM usuarios WHERE correo IS NOT NULL "
+        "GROUP BY correo HAVING COUNT(*) > 1"
+    )).fetchall()
+    if duplicados:
+        raise RuntimeError(
+            "Hay correos repetidos en usuarios; resuélvelos antes de migrar: "
+            + ", ".join(f"{correo} ({n})" for correo, n in duplicados)
+        )
+    op.create_index(op.f('ix_usuarios_correo'), 'usuarios', ['correo'], unique=True)
+
+    op.add_column('usuarios', sa.Column('correo_busqueda', sa.String(length=100), nullable=True))
+    op.execute("UPDATE usuarios SET correo_busqueda = LOWER(TRIM(correo))")
+    op.create_index(op.f('ix_usuarios_correo_busqueda'), 'usuarios', ['correo_busqueda'], unique=False)
+    # Cubre el filtro por rol + prefijo de correo de /usuarios/reportes
+    op.create_index('ix_usuarios_rol_correo_busqueda', 'usuarios', ['rol_id', 'correo_busqueda'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # MySQL descarta el índice implícito de la FK rol_id cuando el compuesto la cubre;
+    # lo recreamos antes de borrar el compuesto para no romper la FK.
+    op.create_index('rol_id', 'usuarios', ['rol_id'], unique=False)
+    op.drop_index('ix_usuarios_rol_correo_busqueda', table_name='usuarios')
+    op.drop_index(op.f('ix_usuarios_correo_busqueda'), table_name='usuarios')
+    op.drop_column('usuarios', 'correo_busqueda')
+    op.drop_index(op.f('ix_usuarios_correo'), table_name='usuarios')
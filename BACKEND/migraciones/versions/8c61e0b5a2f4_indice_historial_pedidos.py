@@ -0,0 +1,31 @@
+"""Indice para el historial de pedidos por cliente
+
+Revision ID: 8c61e0b5a2f4
+Revises: 4f2a9c1d7e3b
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c61e0b5a2f4'
+down_revision: Union[str, None] = '4f2a9c1d7e3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset de /pedidos/cliente/{id}/historial: (cliente_id, fecha_pedido, id_pedido)
+    op.create_index('ix_pedidos_cliente_fecha', 'pedidos', ['cliente_id', 'fecha_pedido', 'id_pedido'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Conservar un índice para la FK cliente_id (MySQL descartó el implícito)
+    op.create_index('cliente_id', 'pedidos', ['cliente_id'], unique=False)
+    op.drop_index('ix_pedidos_cliente_fecha', table_name='pedidos')
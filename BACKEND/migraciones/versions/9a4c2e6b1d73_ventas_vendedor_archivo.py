@@ -0,0 +1,69 @@
+"""VwVentasVendedor1 incluye los pedidos archivados
+
+Revision ID: 9a4c2e6b1d73
+Revises: 7d3f1b8e6a20
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4c2e6b1d73'
+down_revision: Union[str, None] = '7d3f1b8e6a20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# SP_ConsultarVentasVendedor (/ventas/) lee esta vista: sin el archivo, las ventas de los
+# pedidos movidos por archivar_pedidos desaparecían del reporte.
+VISTA_CON_ARCHIVO = """
+CREATE OR REPLACE VIEW VwVentasVendedor1 AS
+SELECT
+    YEAR(v.fecha_pedido) AS Anio,
+    MONTH(v.fecha_pedido) AS Mes,
+    DAY(v.fecha_pedido) AS Dia,
+    SUM(v.subtotal) AS TotalVenta
+FROM (
+    SELECT p.fecha_pedido, dp.subtotal
+    FROM pedidos p
+    JOIN detalle_pedido dp ON p.id_pedido = dp.pedido_id
+    WHERE p.vendedor_id = 1
+    UNION ALL
+    SELECT pa.fecha_pedido, dpa.subtotal
+    FROM pedidos_archivo pa
+    JOIN detalle_pedido_archivo dpa ON pa.id_pedido = dpa.pedido_id
+    WHERE pa.vendedor_id = 1
+) v
+GROUP BY Anio, Mes, Dia
+ORDER BY Anio ASC, Mes ASC, Dia ASC
+"""
+
+VISTA_ORIGINAL = """
+CREATE OR REPLACE VIEW VwVentasVendedor1 AS
+SELECT
+    YEAR(p.fecha_pedido) AS Anio,
+    MONTH(p.fecha_pedido) AS Mes,
+    DAY(p.fecha_pedido) AS Dia,
+    SUM(dp.subtotal) AS TotalVenta
+FROM pedidos p
+JOIN detalle_pedido dp ON p.id_pedido = dp.pedido_id
+WHERE p.vendedor_id = 1
+GROUP BY Anio, Mes, Dia
+ORDER BY Anio ASC, Mes ASC, Dia ASC
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # La vista y el SP solo existen en MySQL (SQL_JOSNISHOP_final.sql).
+    if op.get_bind().dialect.name == "mysql":
+        op.execute(VISTA_CON_ARCHIVO)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "mysql":
+        op.execute(VISTA_ORIGINAL)
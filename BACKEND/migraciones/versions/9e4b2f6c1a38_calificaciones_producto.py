@@ -0,0 +1,50 @@
+"""Tabla acumulada calificaciones_producto
+
+Revision ID: 9e4b2f6c1a38
+Revises: 5a0e7c3b9d21
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4b2f6c1a38'
+down_revision: Union[str, None] = '5a0e7c3b9d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('calificaciones_producto',
+    sa.Column('producto_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('suma', sa.Integer(), nullable=False),
+    sa.Column('estrellas_1', sa.Integer(), nullable=False),
+    sa.Column('estrellas_2', sa.Integer(), nullable=False),
+    sa.Column('estrellas_3', sa.Integer(), nullable=False),
+    sa.Column('estrellas_4', sa.Integer(), nullable=False),
+    sa.Column('estrellas_5', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['producto_id'], ['productos.id'], ),
+    sa.PrimaryKeyConstraint('producto_id')
+    )
+    # Carga inicial desde las reseñas existentes
+    op.execute(
+        "INSERT INTO calificaciones_producto "
+        "(producto_id, total, suma, estrellas_1, estrellas_2, estrellas_3, estrellas_4, estrellas_5) "
+        "SELECT producto_id, COUNT(*), COALESCE(SUM(`calificación`), 0), "
+        "SUM(`calificación` = 1), SUM(`calificación` = 2), SUM(`calificación` = 3), "
+        "SUM(`calificación` = 4), SUM(`calificación` = 5) "
+        "FROM `reseñas` "
+        "WHERE producto_id IS NOT NULL AND `calificación` BETWEEN 1 AND 5 "
+        "GROUP BY producto_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('calificaciones_producto')
@@ -0,0 +1,34 @@
+"""Indices de reseñas por producto/cliente y fecha
+
+Revision ID: b81e4c7d3a62
+Revises: 6f3a1d9c2b57
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81e4c7d3a62'
+down_revision: Union[str, None] = '6f3a1d9c2b57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset (fecha, id) de /resenas/vendedor/{id}, /resenas/todas y /resenas/cliente/{id}
+    op.create_index('ix_resenas_producto_fecha', 'reseñas', ['producto_id', 'fecha', 'id_reseña'], unique=False)
+    op.create_index('ix_resenas_cliente_fecha', 'reseñas', ['cliente_id', 'fecha', 'id_reseña'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Conservar índices para las FKs (MySQL descartó los implícitos)
+    op.create_index('producto_id', 'reseñas', ['producto_id'], unique=False)
+    op.create_index('cliente_id', 'reseñas', ['cliente_id'], unique=False)
+    op.drop_index('ix_resenas_cliente_fecha', table_name='reseñas')
+    op.drop_index('ix_resenas_producto_fecha', table_name='reseñas')
@@ -0,0 +1,54 @@
+"""Tablas de archivo para pedidos y detalle_pedido
+
+Revision ID: d17b3e9f0a6c
+Revises: 8c61e0b5a2f4
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd17b3e9f0a6c'
+down_revision: Union[str, None] = '8c61e0b5a2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_pedidos_fecha', 'pedidos', ['fecha_pedido'], unique=False)
+    # Sin FKs y con fecha_pedido en la PK para permitir particionado por rango en MySQL
+    op.create_table('pedidos_archivo',
+    sa.Column('id_pedido', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('fecha_pedido', sa.DateTime(), nullable=False),
+    sa.Column('cliente_id', sa.Integer(), nullable=True),
+    sa.Column('vendedor_id', sa.Integer(), nullable=True),
+    sa.Column('estado', sa.String(length=50), nullable=True),
+    sa.Column('total', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id_pedido', 'fecha_pedido')
+    )
+    op.create_index('ix_pedidos_archivo_cliente_fecha', 'pedidos_archivo', ['cliente_id', 'fecha_pedido', 'id_pedido'], unique=False)
+    op.create_table('detalle_pedido_archivo',
+    sa.Column('id_detalle', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('pedido_id', sa.Integer(), nullable=True),
+    sa.Column('producto_id', sa.Integer(), nullable=True),
+    sa.Column('cantidad', sa.Integer(), nullable=True),
+    sa.Column('subtotal', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id_detalle')
+    )
+    op.create_index('ix_detalle_pedido_archivo_pedido', 'detalle_pedido_archivo', ['pedido_id'], unique=False)
+    op.create_index('ix_detalle_pedido_archivo_producto', 'detalle_pedido_archivo', ['producto_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_detalle_pedido_archivo_producto', table_name='detalle_pedido_archivo')
+    op.drop_index('ix_detalle_pedido_archivo_pedido', table_name='detalle_pedido_archivo')
+    op.drop_table('detalle_pedido_archivo')
+    op.drop_index('ix_pedidos_archivo_cliente_fecha', table_name='pedidos_archivo')
+    op.drop_table('pedidos_archivo')
+    op.drop_index('ix_pedidos_fecha', table_name='pedidos')
@@ -0,0 +1,44 @@
+"""Tabla bot_response_proposals
+
+Revision ID: e4a81c6f2d95
+Revises: b81e4c7d3a62
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a81c6f2d95'
+down_revision: Union[str, None] = 'b81e4c7d3a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('bot_response_proposals',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('clave', sa.String(length=200), nullable=False),
+    sa.Column('respuesta', sa.Text(), nullable=False),
+    sa.Column('examples', sa.Text(), nullable=True),
+    sa.Column('frequency', sa.Integer(), nullable=False),
+    sa.Column('signature', sa.String(length=200), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('bot_response_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['bot_response_id'], ['bot_responses.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_bot_response_proposals_signature'), 'bot_response_proposals', ['signature'], unique=False)
+    op.create_index(op.f('ix_bot_response_proposals_status'), 'bot_response_proposals', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_bot_response_proposals_status'), table_name='bot_response_proposals')
+    op.drop_index(op.f('ix_bot_response_proposals_signature'), table_name='bot_response_proposals')
+    op.drop_table('bot_response_proposals')
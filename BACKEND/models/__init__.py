@@ -1,14 +1,22 @@
+from .calificacion_producto import CalificacionProducto
 from .categoria import Categoria
 from .chatbox import Chat
+from .cliente_producto_comprado import ClienteProductoComprado
 from .detallepedido import DetallePedido
+from .detallepedido_archivo import DetallePedidoArchivo
 from .inventario import Inventario
 from .item import Item
 from .notificaciones import Notificacion
+from .palabra_prohibida import PalabraProhibida
 from .pedido import Pedido
+from .pedido_archivo import PedidoArchivo
 from .producto import Producto
 from .resenas import Reseña
 from .roles import Rol
 from .usuarios import Usuario
+from .venta_diaria import VentaDiaria
 from .videos import Video
 from .pagos import Pago
-from .bot_response import BotResponse
\ No newline at end of file
+from .bot_response import BotResponse
+from .bot_response_proposal import BotResponseProposal
+from .revoked_token import RevokedToken
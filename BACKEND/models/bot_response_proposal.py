@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text
+from db import Base
+
+
+class BotResponseProposal(Base):
+    """Frequent AI-answered question proposed as a `BotResponse` (see `utils/bot_mining.py`)."""
+    __tablename__ = "bot_response_proposals"
+    id = Column(Integer, primary_key=True)
+    clave = Column(String(200), nullable=False)
+    respuesta = Column(Text, nullable=False)
+    # JSON list of the most frequent phrasings in the cluster
+    examples = Column(Text)
+    frequency = Column(Integer, nullable=False, default=0)
+    # Normalized representative question; rejected/accepted signatures are not proposed again
+    signature = Column(String(200), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default="pending", index=True)
+    created_at = Column(DateTime)
+    bot_response_id = Column(Integer, ForeignKey("bot_responses.id", ondelete="SET NULL"))
@@ -0,0 +1,32 @@
+from sqlalchemy import (
+    Column,
+    ForeignKey,
+    Integer,
+)
+from sqlalchemy.orm import relationship
+
+from db import Base
+
+
+class CalificacionProducto(Base):
+    """Acumulado de calificaciones por producto (cantidad, suma e histograma 1-5),
+    mantenido al crear, editar o eliminar una reseña (ver `utils/calificaciones.py`)."""
+    __tablename__ = "calificaciones_producto"
+    producto_id = Column(Integer, ForeignKey("productos.id"), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+    suma = Column(Integer, nullable=False, default=0)
+    estrellas_1 = Column(Integer, nullable=False, default=0)
+    estrellas_2 = Column(Integer, nullable=False, default=0)
+    estrellas_3 = Column(Integer, nullable=False, default=0)
+    estrellas_4 = Column(Integer, nullable=False, default=0)
+    estrellas_5 = Column(Integer, nullable=False, default=0)
+
+    producto = relationship("Producto", back_populates="calificacion")
+
+    @property
+    def promedio(self):
+        return round(self.suma / self.total, 2) if self.total else None
+
+    @property
+    def histograma(self):
+        return [self.estrellas_1, self.estrellas_2, self.estrellas_3, self.estrellas_4, self.estrellas_5]
@@ -0,0 +1,21 @@
+from sqlalchemy import (
+    Column,
+    DateTime,
+    ForeignKey,
+    Integer,
+)
+from sqlalchemy.orm import relationship
+
+from db import Base
+
+
+class ClienteProductoComprado(Base):
+    """Qué productos compró cada cliente (primera compra y número de líneas).
+    Se escribe en la compra y se reconstruye con `scripts/reconstruir_compras_cliente.py`."""
+    __tablename__ = "cliente_producto_comprado"
+    cliente_id = Column(Integer, ForeignKey("usuarios.id_usuario"), primary_key=True)
+    producto_id = Column(Integer, ForeignKey("productos.id"), primary_key=True)
+    primera_fecha = Column(DateTime)
+    veces = Column(Integer, nullable=False, default=0)
+
+    producto = relationship("Producto")
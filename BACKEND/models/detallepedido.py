@@ -2,6 +2,7 @@ from sqlalchemy import (
     Column,
     Float,
     ForeignKey,
+    Index,
     Integer,
 )
 from sqlalchemy.orm import relationship
@@ -19,3 +20,10 @@ class DetallePedido(Base):
  
     pedido = relationship("Pedido", back_populates="detalles")
     producto = relationship("Producto")
+
+    # Índices para /detalles_pedido/reportes (pedido, producto y rango de cantidad).
+    __table_args__ = (
+        Index("ix_detalle_pedido_pedido_cantidad", "pedido_id", "cantidad"),
+        Index("ix_detalle_pedido_producto_cantidad", "producto_id", "cantidad"),
+        Index("ix_detalle_pedido_cantidad", "cantidad"),
+    )
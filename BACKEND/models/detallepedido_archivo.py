@@ -0,0 +1,30 @@
+from sqlalchemy import (
+    Column,
+    Float,
+    Index,
+    Integer,
+)
+from sqlalchemy.orm import relationship
+
+from db import Base
+
+
+class DetallePedidoArchivo(Base):
+    """Líneas de los pedidos archivados (ver `PedidoArchivo`)."""
+    __tablename__ = "detalle_pedido_archivo"
+    id_detalle = Column(Integer, primary_key=True, autoincrement=False)
+    pedido_id = Column(Integer)
+    producto_id = Column(Integer)
+    cantidad = Column(Integer)
+    subtotal = Column(Float)
+
+    producto = relationship(
+        "Producto",
+        primaryjoin="foreign(DetallePedidoArchivo.producto_id) == Producto.id",
+        viewonly=True,
+    )
+
+    __table_args__ = (
+        Index("ix_detalle_pedido_archivo_pedido", "pedido_id"),
+        Index("ix_detalle_pedido_archivo_producto", "producto_id"),
+    )
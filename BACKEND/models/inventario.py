@@ -2,6 +2,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
 )
 from sqlalchemy.orm import relationship
@@ -18,3 +19,10 @@ class Inventario(Base):
     fecha_actualizacion = Column(DateTime)
 
     producto = relationship("Producto")
+
+    # Índices para /inventarios/reportes: filtro por producto + rango de cantidad,
+    # o solo rango de cantidad.
+    __table_args__ = (
+        Index("ix_inventarios_producto_cantidad", "producto_id", "cantidad"),
+        Index("ix_inventarios_cantidad", "cantidad"),
+    )
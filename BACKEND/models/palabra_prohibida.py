@@ -0,0 +1,9 @@
+from sqlalchemy import Column, Integer, String
+from db import Base
+
+
+class PalabraProhibida(Base):
+    """Palabras no permitidas en reseñas (ver `utils/moderacion.py`)."""
+    __tablename__ = "palabras_prohibidas"
+    id = Column(Integer, primary_key=True)
+    palabra = Column(String(100), nullable=False, unique=True)
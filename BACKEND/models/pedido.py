@@ -3,6 +3,7 @@ from sqlalchemy import (
     DateTime,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
 )
@@ -23,3 +24,10 @@ class Pedido(Base):
     cliente = relationship("Usuario", foreign_keys=[cliente_id])
     vendedor = relationship("Usuario", foreign_keys=[vendedor_id])
     detalles = relationship("DetallePedido", back_populates="pedido")
+
+    # Historial del cliente paginado por fecha (keyset: fecha_pedido, id_pedido).
+    __table_args__ = (
+        Index("ix_pedidos_cliente_fecha", "cliente_id", "fecha_pedido", "id_pedido"),
+        # Selección de pedidos antiguos para el job de archivo.
+        Index("ix_pedidos_fecha", "fecha_pedido"),
+    )
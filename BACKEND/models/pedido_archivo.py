@@ -0,0 +1,36 @@
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+)
+from sqlalchemy.orm import relationship
+
+from db import Base
+
+
+class PedidoArchivo(Base):
+    """Pedidos cerrados y antiguos movidos fuera de `pedidos` por el job de archivo.
+
+    Sin llaves foráneas y con `fecha_pedido` dentro de la llave primaria para que
+    la tabla pueda particionarse por rango de fecha en MySQL (modo opcional).
+    """
+    __tablename__ = "pedidos_archivo"
+    id_pedido = Column(Integer, primary_key=True, autoincrement=False)
+    fecha_pedido = Column(DateTime, primary_key=True)
+    cliente_id = Column(Integer)
+    vendedor_id = Column(Integer)
+    estado = Column(String(50))
+    total = Column(Float)
+
+    detalles = relationship(
+        "DetallePedidoArchivo",
+        primaryjoin="PedidoArchivo.id_pedido == foreign(DetallePedidoArchivo.pedido_id)",
+        viewonly=True,
+    )
+
+    __table_args__ = (
+        Index("ix_pedidos_archivo_cliente_fecha", "cliente_id", "fecha_pedido", "id_pedido"),
+    )
@@ -20,3 +20,7 @@ class Producto(Base):
     categoria = relationship("Categoria", back_populates="productos")
     items = relationship("Item", back_populates="producto")
     videos = relationship("Video", back_populates="producto")
+    # El acumulado de calificaciones comparte la llave del producto: se borra con él.
+    calificacion = relationship(
+        "CalificacionProducto", back_populates="producto", uselist=False, cascade="all, delete-orphan"
+    )
@@ -2,6 +2,7 @@ from sqlalchemy import (
     Column,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     String,
 )
@@ -21,3 +22,9 @@ class Reseña(Base):
 
     producto = relationship("Producto")
     cliente = relationship("Usuario")
+
+    # Keyset por fecha de los listados de reseñas por producto/vendedor y por cliente.
+    __table_args__ = (
+        Index("ix_resenas_producto_fecha", "producto_id", "fecha", "id_reseña"),
+        Index("ix_resenas_cliente_fecha", "cliente_id", "fecha", "id_reseña"),
+    )
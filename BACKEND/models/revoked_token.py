@@ -0,0 +1,12 @@
+from sqlalchemy import Column, DateTime, String
+from db import Base
+
+
+class RevokedToken(Base):
+    """JWT revocado por logout o por rotación del refresh token (ver `utils/jwt_utils.py`)."""
+    __tablename__ = "revoked_tokens"
+    # SHA-256 en hexadecimal del token completo
+    token_hash = Column(String(64), primary_key=True)
+    # `exp` del token (UTC); pasada esta fecha la fila ya no hace falta
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, nullable=False, index=True)
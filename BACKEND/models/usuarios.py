@@ -2,6 +2,7 @@ from sqlalchemy import (
     Boolean,
     Column,
     ForeignKey,
+    Index,
     Integer,
     String,
 )
@@ -14,7 +15,7 @@ class Usuario(Base):
     __tablename__ = "usuarios"
     id_usuario = Column(Integer, primary_key=True)
     nombre = Column(String(100))
-    correo = Column(String(100))
+    correo = Column(String(100), unique=True, index=True)
     contraseña = Column(String(255))
     rol_id = Column(Integer, ForeignKey("roles.id_rol"))
     estado = Column(Boolean)
@@ -23,7 +24,14 @@ class Usuario(Base):
     fecha_nacimiento = Column(String(20), nullable=True)
     seguridad_pregunta = Column(String(255), nullable=True)
     seguridad_respuesta = Column(String(255), nullable=True)  # hashed
+    # Correo en minúsculas para buscar por prefijo con índice (ver utils/busqueda_usuarios.py)
+    correo_busqueda = Column(String(100), nullable=True, index=True)
 
     rol = relationship("Rol", back_populates="usuarios")
     pagos = relationship("Pago", back_populates="usuario")
-    foto_perfil = relationship("Video", back_populates="usuario", foreign_keys="Video.usuario_id")
\ No newline at end of file
+    foto_perfil = relationship("Video", back_populates="usuario", foreign_keys="Video.usuario_id")
+
+    # Filtro por rol + prefijo de correo de /usuarios/reportes
+    __table_args__ = (
+        Index("ix_usuarios_rol_correo_busqueda", "rol_id", "correo_busqueda"),
+    )
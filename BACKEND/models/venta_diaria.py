@@ -0,0 +1,22 @@
+from sqlalchemy import (
+    Column,
+    Date,
+    Float,
+    ForeignKey,
+    Integer,
+)
+from sqlalchemy.orm import relationship
+
+from db import Base
+
+
+class VentaDiaria(Base):
+    """Acumulado de ventas por (día, producto), mantenido en la compra y reconstruible
+    con `scripts/reconstruir_ventas_diarias.py`."""
+    __tablename__ = "ventas_diarias"
+    fecha = Column(Date, primary_key=True)
+    producto_id = Column(Integer, ForeignKey("productos.id"), primary_key=True)
+    total_cantidad = Column(Integer, nullable=False, default=0)
+    total_revenue = Column(Float, nullable=False, default=0.0)
+
+    producto = relationship("Producto")
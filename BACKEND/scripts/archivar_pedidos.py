@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Job de archivo de pedidos: mueve los pedidos cerrados más antiguos que
+ARCHIVO_EDAD_DIAS a `pedidos_archivo` / `detalle_pedido_archivo`, por lotes y con
+pausa entre lotes. Es reanudable: si se interrumpe, basta con volver a ejecutarlo.
+
+    python scripts/archivar_pedidos.py [--edad-dias N] [--lote N] [--pausa S] [--max-lotes N]
+
+Modo opcional (solo MySQL) para particionar la tabla de archivo por año:
+
+    python scripts/archivar_pedidos.py --particionar 2023 2030
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import ARCHIVO_EDAD_DIAS, ARCHIVO_PAUSA_SEGUNDOS, ARCHIVO_TAMANO_LOTE
+from db.session import SessionLocal
+from utils.archivo_pedidos import archivar_pedidos, particionar_archivo
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archiva pedidos cerrados antiguos")
+    parser.add_argument("--edad-dias", type=int, default=ARCHIVO_EDAD_DIAS)
+    parser.add_argument("--lote", type=int, default=ARCHIVO_TAMANO_LOTE)
+    parser.add_argument("--pausa", type=float, default=ARCHIVO_PAUSA_SEGUNDOS)
+    parser.add_argument("--max-lotes", type=int, default=None)
+    parser.add_argument("--particionar", nargs=2, type=int, metavar=("DESDE_ANIO", "HASTA_ANIO"))
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.particionar:
+            particionar_archivo(db, args.particionar[0], args.particionar[1])
+            print(f"pedidos_archivo particionada por año ({args.particionar[0]}-{args.particionar[1]})")
+            return
+        movidos = archivar_pedidos(
+            db,
+            edad_dias=args.edad_dias,
+            tamano_lote=args.lote,
+            pausa=args.pausa,
+            max_lotes=args.max_lotes,
+        )
+        print(f"Done. {movidos} pedido(s) archivados.")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Accuracy and latency benchmark of the /bot/respond fuzzy scorers on a labelled
+sample set (no database needed):
+
+- full:     the original scan, SequenceMatcher + token overlap over every response
+- sequence: the same scoring on the candidates of the intent index prefilter
+- vector:   hashed character-trigram cosine over all responses (NumPy)
+
+Accuracy compares the top-2 answers above COMBINE_THRESHOLD with the expected
+intent (messages labelled None should get no answer). Latency is measured on the
+labelled responses and again with the catalogue padded with synthetic responses.
+
+    python scripts/bench_bot_scorer.py [--extra 2000] [--repeat 20]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.bot_index import KEYWORD_BOOST, KEYWORDS_MAP, BotIndex, Intent
+
+COMBINE_THRESHOLD = 0.35
+
+RESPONSES = [
+    ("horario", 10), ("envio", 10), ("devolucion", 8), ("estado de mi pedido", 6),
+    ("recuperar contraseña", 6), ("metodos de pago", 5), ("cambiar nombre de usuario", 4),
+    ("productos agotados", 3), ("cancelar pedido", 5), ("factura electronica", 3),
+    ("garantia del producto", 4), ("cupon de descuento", 3), ("tallas disponibles", 2),
+    ("costo de envio", 5), ("ventas al por mayor", 2),
+]
+
+# (message, expected clave or None)
+LABELLED = [
+    ("a que hora abren la tienda", "horario"),
+    ("cual es su horario de atencion", "horario"),
+    ("cuanto demora el envio", "envio"),
+    ("cuanto cuesta el envio a medellin", "costo de envio"),
+    ("hacen envios a todo el pais", "envio"),
+    ("quiero hacer una devolucion", "devolucion"),
+    ("como puedo devolver un producto", "devolucion"),
+    ("donde veo el estado de mi pedido", "estado de mi pedido"),
+    ("mi pedido no ha llegado", "estado de mi pedido"),
+    ("olvide mi contraseña", "recuperar contraseña"),
+    ("como recupero la clave", "recuperar contraseña"),
+    ("que metodos de pago aceptan", "metodos de pago"),
+    ("puedo pagar con tarjeta", "metodos de pago"),
+    ("quiero cambiar mi nombre de usuario", "cambiar nombre de usuario"),
+    ("el producto esta agotado", "productos agotados"),
+    ("cuando vuelve a estar disponible", "productos agotados"),
+    ("necesito cancelar mi pedido", "cancelar pedido"),
+    ("me pueden enviar la factura", "factura electronica"),
+    ("el producto tiene garantia", "garantia del producto"),
+    ("tengo un cupon de descuento", "cupon de descuento"),
+    ("que tallas tienen", "tallas disponibles"),
+    ("venden al por mayor", "ventas al por mayor"),
+    ("precio por mayor", "ventas al por mayor"),
+    ("que es un sapo", None),
+    ("cuentame un chiste", None),
+    ("quien gano el partido", None),
+]
+
+
+def full_scan(intents, mensaje):
+    """The original /bot/respond fuzzy step, over every response."""
+    scored = []
+    for r in intents:
+        clave = r.clave.lower()
+        ratio = SequenceMatcher(None, mensaje, clave).ratio()
+        sb = set(clave.split())
+        overlap = len(set(mensaje.split()) & sb) / float(len(sb)) if sb else 0.0
+        boost = 0.0
+        for k, kws in KEYWORDS_MAP.items():
+            for kw in kws:
+                if kw in mensaje and (k in clave or kw in clave):
+                    boost += KEYWORD_BOOST
+                    break
+        scored.append((min(1.0, max(ratio, overlap) + boost) + (r.prioridad or 0) * 0.01, r))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return scored[:2]
+
+
+def _answers(ranked):
+    return [r.clave for s, r in ranked if s >= COMBINE_THRESHOLD][:2]
+
+
+def _accuracy(fn):
+    top1 = top2 = 0
+    for mensaje, esperado in LABELLED:
+        answers = _answers(fn(mensaje))
+        if esperado is None:
+            ok = not answers
+            top1 += ok
+            top2 += ok
+        else:
+            top1 += bool(answers) and answers[0] == esperado
+            top2 += esperado in answers
+    return top1 / len(LABELLED), top2 / len(LABELLED)
+
+
+def _latency(fn, repeat):
+    mensajes = [m for m, _ in LABELLED]
+    inicio = time.perf_counter()
+    for _ in range(repeat):
+        for m in mensajes:
+            fn(m)
+    return (time.perf_counter() - inicio) / (repeat * len(mensajes)) * 1000
+
+
+def _scorers(intents):
+    index = BotIndex(intents)
+    return {
+        "full": lambda m: full_scan(intents, m),
+        "sequence": lambda m: index.rank(m)[:2],
+        "vector": lambda m: index.rank_vectorized(m, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the bot fuzzy scorers")
+    parser.add_argument("--extra", type=int, default=2000, help="Synthetic responses added for the latency run")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    intents = [Intent(n, c, c, p) for n, (c, p) in enumerate(RESPONSES, 1)]
+    print(f"Labelled set: {len(LABELLED)} messages, {len(intents)} responses")
+    print(f"{'scorer':>9} {'top-1':>7} {'top-2':>7} {'ms/msg':>8}")
+    for name, fn in _scorers(intents).items():
+        top1, top2 = _accuracy(fn)
+        print(f"{name:>9} {top1:>7.0%} {top2:>7.0%} {_latency(fn, args.repeat):>8.3f}")
+
+    rnd = random.Random(7)
+    extra = [
+        Intent(1000 + n, " ".join("".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(4, 9)))
+                                  for _ in range(rnd.randint(1, 3))), "x", 0)
+        for n in range(args.extra)
+    ]
+    print(f"\nWith {args.extra} extra synthetic responses:")
+    print(f"{'scorer':>9} {'top-1':>7} {'top-2':>7} {'ms/msg':>8}")
+    for name, fn in _scorers(intents + extra).items():
+        top1, top2 = _accuracy(fn)
+        print(f"{name:>9} {top1:>7.0%} {top2:>7.0%} {_latency(fn, max(1, args.repeat // 10)):>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Costo de autenticar una petición con `get_current_user` (utils/jwt_utils.py), sin
+MySQL: las revocaciones van a una base SQLite en memoria.
+
+- verificación HS256 en cada llamada (como antes) contra la caché de tokens verificados;
+- petición autenticada completa por ASGI, con y sin caché, frente a una sin token;
+- un token revocado usado muchas veces (debe consultar la tabla una sola vez);
+- tasa de falsos positivos del filtro de Bloom a su capacidad.
+
+    python scripts/bench_jwt_auth.py [--requests 2000] [--bloom 100000]
+"""
+
+import argparse
+import asyncio
+import os
+import secrets
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("JWT_SECRET_KEY", secrets.token_hex(32))
+
+
+def _per_call_us(fn, n: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - inicio) / n * 1e6
+
+
+async def _asgi_get(app, path: str, token: str = None) -> int:
+    headers = [(b"host", b"bench")]
+    if token:
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": headers, "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    status = {}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status["code"] = message["status"]
+
+    await app(scope, receive, send)
+    return status["code"]
+
+
+async def _requests_us(app, path: str, token, n: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(n):
+        assert await _asgi_get(app, path, token) == 200
+    return (time.perf_counter() - inicio) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de autenticación JWT")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--bloom", type=int, default=100000, help="Capacidad del filtro de Bloom")
+    args = parser.parse_args()
+
+    from fastapi import Depends, FastAPI
+    from jose import jwt
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from models.revoked_token import RevokedToken
+    from utils import jwt_utils as ju
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    RevokedToken.__table__.create(engine)
+    ju.revoked_tokens.session_factory = sessionmaker(bind=engine)
+
+    token = ju.create_access_token({"sub": "bench@example.com", "id": 1})
+    n = args.requests
+
+    decode = _per_call_us(lambda: jwt.decode(token, ju.SECRET_KEY, algorithms=[ju.ALGORITHM]), n)
+    ju.verify_token(token)
+    cached = _per_call_us(lambda: ju.verify_token(token), n)
+    print(f"verificación HS256 por llamada: {decode:8.1f} us")
+    print(f"verify_token con caché:         {cached:8.1f} us")
+
+    app = FastAPI()
+
+    @app.get("/publico")
+    def publico():
+        return {"ok": True}
+
+    @app.get("/yo")
+    def yo(usuario: dict = Depends(ju.get_current_user)):
+        return {"sub": usuario["sub"]}
+
+    async def peticiones():
+        base = await _requests_us(app, "/publico", None, n)
+        con_cache = await _requests_us(app, "/yo", token, n)
+        ju.token_cache.max_entries = 0
+        ju.token_cache.clear()
+        sin_cache = await _requests_us(app, "/yo", token, n)
+        ju.token_cache.max_entries = ju.JWT_CACHE_MAX
+        return base, con_cache, sin_cache
+
+    base, con_cache, sin_cache = asyncio.run(peticiones())
+    print(f"petición sin token:             {base:8.1f} us")
+    print(f"petición autenticada, caché:    {con_cache:8.1f} us (+{con_cache - base:.1f})")
+    print(f"petición autenticada, sin caché:{sin_cache:8.1f} us (+{sin_cache - base:.1f})")
+
+    revocado = ju.create_access_token({"sub": "bench@example.com", "id": 1})
+    ju.revoke_token(revocado)
+    checks = ju.revoked_tokens.db_checks
+    rechazado = _per_call_us(lambda: ju.verify_token(revocado), n)
+    print(f"token revocado:                 {rechazado:8.1f} us, consultas a la tabla: {ju.revoked_tokens.db_checks - checks}")
+
+    bloom = ju.BloomFilter(args.bloom)
+    for _ in range(args.bloom):
+        bloom.add(secrets.token_hex(32))
+    pruebas = 100000
+    falsos = sum(secrets.token_hex(32) in bloom for _ in range(pruebas))
+    print(f"Bloom {args.bloom} llaves, {len(bloom.bits) / 1024:.0f} KiB, {bloom.hashes} hashes: "
+          f"falsos positivos {falsos / pruebas:.4%}")
+
+
+if __name__ == '__main__':
+    main()
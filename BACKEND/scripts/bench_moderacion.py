@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark del filtro de reseñas: compara el autómata Aho-Corasick de
+utils/moderacion.py contra la revisión anterior (`any(p in texto ...)` sobre la
+lista) para listas de distinto tamaño. No usa la base de datos.
+
+    python scripts/bench_moderacion.py [--comentarios 2000]
+"""
+
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.moderacion import AhoCorasick, normalizar
+
+TEXTO_BASE = (
+    "Excelente producto, llegó rápido y en buen estado. La calidad es mejor de lo "
+    "que esperaba y el vendedor respondió todas mis preguntas. Lo recomiendo. "
+)
+
+
+def _palabras(n, rnd):
+    return ["".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(5, 10))) for _ in range(n)]
+
+
+def _lineal(palabras, texto):
+    return any(p in texto for p in palabras)
+
+
+def _medir(fn, comentarios):
+    inicio = time.perf_counter()
+    for c in comentarios:
+        fn(c)
+    return (time.perf_counter() - inicio) / len(comentarios) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark del filtro de palabras prohibidas")
+    parser.add_argument("--comentarios", type=int, default=2000)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    comentarios = [TEXTO_BASE * rnd.randint(1, 3) for _ in range(args.comentarios)]
+
+    print(f"{'palabras':>9} {'lineal µs/com':>14} {'aho-corasick µs/com':>20} {'compilar ms':>12}")
+    for n in (10, 100, 1000, 5000):
+        palabras = _palabras(n, rnd)
+        inicio = time.perf_counter()
+        automata = AhoCorasick(palabras)
+        compilar = (time.perf_counter() - inicio) * 1000
+
+        lineal = _medir(lambda c: _lineal(palabras, normalizar(c)), comentarios)
+        aho = _medir(lambda c: automata.buscar(normalizar(c), primera=True), comentarios)
+        # Ambos deben coincidir en el resultado
+        for c in comentarios[:50]:
+            assert bool(automata.buscar(normalizar(c))) == any(p in normalizar(c) for p in palabras)
+        print(f"{n:>9} {lineal:>14.1f} {aho:>20.1f} {compilar:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Efecto de un pico de logins sobre los demás endpoints, con bcrypt en línea (en el
+threadpool compartido, como antes) y con el pool de procesos de utils/passwords.py.
+
+Lanza `--logins` verificaciones concurrentes y, mientras corren, mide cuánto tarda una
+tarea trivial en el threadpool (lo que espera cualquier endpoint `def` sin hash). Al
+final mide una carga masiva de `--bulk` contraseñas y muestra `password_hasher.stats()`.
+
+    python scripts/bench_password_hash.py [--logins 100] [--bulk 200] [--rounds 10]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+async def _pico(verificar, n: int) -> tuple:
+    """(segundos del pico, ms que esperó la tarea trivial del threadpool)."""
+    from starlette.concurrency import run_in_threadpool
+
+    inicio = time.perf_counter()
+    logins = [asyncio.ensure_future(verificar(f"clave-{i}")) for i in range(n)]
+    await asyncio.sleep(0.05)
+    t = time.perf_counter()
+    await run_in_threadpool(lambda: None)
+    espera = (time.perf_counter() - t) * 1000
+    await asyncio.gather(*logins)
+    return time.perf_counter() - inicio, espera
+
+
+async def _main(args) -> None:
+    import bcrypt
+    from starlette.concurrency import run_in_threadpool
+
+    from utils.passwords import PasswordHasher
+
+    hasher = PasswordHasher(rounds=args.rounds, max_pending=args.logins + args.bulk)
+    hasher.start()
+    guardado = bcrypt.hashpw(b"correcta", bcrypt.gensalt(args.rounds)).decode("utf-8")
+
+    def en_linea(clave):
+        return run_in_threadpool(bcrypt.checkpw, clave.encode("utf-8"), guardado.encode("utf-8"))
+
+    for nombre, verificar in (("en línea", en_linea), ("pool", lambda c: hasher.verify(c, guardado))):
+        total, espera = await _pico(verificar, args.logins)
+        print(f"{nombre:9s} {args.logins} logins en {total:.2f}s; tarea trivial del threadpool esperó {espera:.0f} ms")
+
+    claves = [f"usuario-{i}" for i in range(args.bulk)]
+    inicio = time.perf_counter()
+    for clave in claves:
+        await run_in_threadpool(bcrypt.hashpw, clave.encode("utf-8"), bcrypt.gensalt(args.rounds))
+    print(f"carga masiva de {args.bulk}, en serie: {time.perf_counter() - inicio:.2f}s")
+    inicio = time.perf_counter()
+    await hasher.hash_many(claves)
+    print(f"carga masiva de {args.bulk}, hash_many ({hasher.workers} procesos): {time.perf_counter() - inicio:.2f}s")
+
+    print(json.dumps(hasher.stats(), indent=2))
+    hasher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del hash de contraseñas")
+    parser.add_argument("--logins", type=int, default=100, help="Verificaciones concurrentes del pico")
+    parser.add_argument("--bulk", type=int, default=200, help="Contraseñas de la carga masiva")
+    parser.add_argument("--rounds", type=int, default=10, help="Costo de bcrypt")
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == '__main__':
+    main()
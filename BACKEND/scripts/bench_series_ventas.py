@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark del armado de /ventas/serie (utils/series_ventas.py): mide
+`armar_serie` con un año de datos y con el rango máximo admitido por cada
+intervalo, con filas densas (todos los productos venden todos los días), el peor
+caso de la matriz grupos × intervalos. No usa la base de datos; el objetivo es
+< 100 ms para un año.
+
+    python scripts/bench_series_ventas.py [--productos 300] [--repeticiones 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import SERIE_VENTAS_MAX_DIAS
+from utils.series_ventas import BUCKETS, armar_serie, validar_rango
+
+
+def _filas(desde, dias, productos, rnd):
+    filas = []
+    for d in range(dias):
+        fecha = desde + timedelta(days=d)
+        for p in range(1, productos + 1):
+            cantidad = rnd.randint(1, 5)
+            filas.append((fecha, p, f"Producto {p}", cantidad, cantidad * 9.99))
+    return filas
+
+
+def _medir(bucket, desde, dias, filas, repeticiones):
+    hasta = desde + timedelta(days=dias - 1)
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        serie = armar_serie(filas, desde, hasta, bucket)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    print(
+        f"{bucket:>7} {dias:>6} {len(filas):>9} {len(serie['buckets']):>11} "
+        f"{min(tiempos):>11.1f} {sum(tiempos) / len(tiempos):>11.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark de /ventas/serie")
+    parser.add_argument("--productos", type=int, default=300)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    rnd = random.Random(42)
+    desde = date(2020, 1, 1)
+    print(f"{'bucket':>7} {'días':>6} {'filas':>9} {'intervalos':>11} {'ms (mejor)':>11} {'ms (media)':>11}")
+    for bucket in BUCKETS:
+        maximo = SERIE_VENTAS_MAX_DIAS[bucket]
+        assert validar_rango(desde, desde + timedelta(days=maximo - 1), bucket) is None
+        assert validar_rango(desde, desde + timedelta(days=maximo), bucket) is not None
+        for dias in sorted({366, maximo}):
+            _medir(bucket, desde, dias, _filas(desde, dias, args.productos, rnd), args.repeticiones)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Verifica con EXPLAIN que los reportes parametrizados de inventario y detalle de
+pedido usan índices (no hacen full scan) para cada combinación de filtros.
+
+Ejecutar desde BACKEND/ contra una base MySQL con datos representativos
+(con tablas casi vacías el optimizador puede preferir un full scan):
+
+    python scripts/check_report_indexes.py
+
+Termina con código 1 si alguna consulta sale con `type = ALL`.
+"""
+
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, text
+
+from controllers.detalle_pedido_controller import filtrar_reporte_detalle_pedido
+from controllers.inventario_controller import filtrar_reporte_inventario
+from db.session import SessionLocal
+from models.detallepedido import DetallePedido
+from models.inventario import Inventario
+
+# Valores de ejemplo para cada filtro; solo importa el plan, no el resultado.
+VALORES = {"pedido_id": 1, "producto_id": 1, "cantidad_min": 5, "cantidad_max": 50}
+
+
+def _combinaciones(nombres):
+    for n in range(1, len(nombres) + 1):
+        for combo in itertools.combinations(nombres, n):
+            yield {k: (VALORES[k] if k in combo else None) for k in nombres}
+
+
+def _explain(db, query):
+    sql = str(query.statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True}))
+    result = db.execute(text("EXPLAIN " + sql))
+    columns = list(result.keys())
+    return [dict(zip(columns, row)) for row in result.fetchall()]
+
+
+def main():
+    db = SessionLocal()
+    fallos = 0
+    try:
+        casos = []
+        for filtros in _combinaciones(["producto_id", "cantidad_min", "cantidad_max"]):
+            casos.append(("inventarios", filtros, filtrar_reporte_inventario(db.query(Inventario), **filtros)))
+            casos.append(("inventarios (total)", filtros, filtrar_reporte_inventario(db.query(func.count(Inventario.id)), **filtros)))
+        for filtros in _combinaciones(["pedido_id", "producto_id", "cantidad_min", "cantidad_max"]):
+            casos.append(("detalle_pedido", filtros, filtrar_reporte_detalle_pedido(db.query(DetallePedido), **filtros)))
+            casos.append(("detalle_pedido (total)", filtros, filtrar_reporte_detalle_pedido(db.query(func.count(DetallePedido.id_detalle)), **filtros)))
+
+        for nombre, filtros, query in casos:
+            usados = {k: v for k, v in filtros.items() if v is not None}
+            for fila in _explain(db, query):
+                if fila.get("type") == "ALL":
+                    fallos += 1
+                    print(f"FULL SCAN  {nombre} {usados} -> key={fila.get('key')} rows={fila.get('rows')}")
+                else:
+                    print(f"ok         {nombre} {usados} -> type={fila.get('type')} key={fila.get('key')} extra={fila.get('Extra')}")
+    finally:
+        db.close()
+
+    if fallos:
+        print(f"{fallos} consulta(s) de reporte sin índice.")
+        sys.exit(1)
+    print("Todas las consultas de reporte usan índices.")
+
+
+if __name__ == '__main__':
+    main()
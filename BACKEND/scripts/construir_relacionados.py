@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Construye desde cero la matriz de "comprados juntos" (utils/relacionados.py)
+recorriendo `detalle_pedido` y su archivo por lotes, y guarda la instantánea en
+`RELACIONADOS_ARCHIVO`. El servidor la carga en segundo plano al arrancar y desde
+ahí solo incorpora las líneas nuevas (sin instantánea tiene que construirla él).
+Conviene ejecutarlo periódicamente (p. ej. cada noche) para reflejar ediciones y
+bajas de pedidos ya contados.
+
+    python scripts/construir_relacionados.py [--lote 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import RELACIONADOS_ARCHIVO, RELACIONADOS_TAMANO_LOTE
+from db.session import SessionLocal
+from utils.relacionados import MotorRelacionados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Construye la matriz de productos comprados juntos.")
+    parser.add_argument("--lote", type=int, default=RELACIONADOS_TAMANO_LOTE, help="Pedidos por lote")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        motor = MotorRelacionados()
+        inicio = time.perf_counter()
+        motor.construir(db, tamano_lote=args.lote)
+        ids, _, pesos = motor._tabla
+        print(
+            f"Done. {len(ids)} producto(s) con relacionados, {int((pesos > 0).sum())} vecino(s) "
+            f"en {time.perf_counter() - inicio:.2f}s."
+        )
+        motor.guardar(RELACIONADOS_ARCHIVO)
+        print(f"Instantánea guardada en {RELACIONADOS_ARCHIVO}")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
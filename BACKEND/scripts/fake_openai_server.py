@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat completions API, to exercise utils/openai_utils
+without network access or an API key.
+
+Serve it and point the backend at it:
+
+    python scripts/fake_openai_server.py --port 8765 --delay 0.3
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8765/v1 uvicorn main:app
+
+Every reply echoes the last user message; with `"stream": true` it is sent word by
+word as SSE chunks. A message containing "lento" makes the server sleep `--slow`
+seconds (to trigger client timeouts) and "error" returns 500 (when streaming, an error
+event after the first words).
+
+With `--check` it starts on a free port, points the client at itself and checks
+cache hits, history bypass, timeouts, concurrency limit, streaming and the metrics.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeCompletions(BaseHTTPRequestHandler):
+    delay = 0.0
+    slow = 5.0
+    calls = 0
+    in_flight = 0
+    max_in_flight = 0
+    _lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        cls = type(self)
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        messages = body.get("messages") or []
+        prompt = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        with cls._lock:
+            cls.calls += 1
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            reply = f"Respuesta a: {prompt} (turnos: {len(messages)})"
+            if body.get("stream"):
+                self._stream(body, prompt, reply)
+                return
+            time.sleep(cls.slow if "lento" in prompt else cls.delay)
+            if "error" in prompt:
+                self._send(500, {"error": {"message": "fake failure", "type": "server_error"}})
+                return
+            self._send(200, {
+                "id": f"chatcmpl-fake-{cls.calls}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            })
+        finally:
+            with cls._lock:
+                cls.in_flight -= 1
+
+    def _stream(self, body, prompt, reply):
+        """SSE chunks, one per word, spread over `delay` (or `slow` for "lento")."""
+        cls = type(self)
+        words = reply.split(" ")
+        pause = (cls.slow if "lento" in prompt else cls.delay) / len(words)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for n, word in enumerate(words):
+            time.sleep(pause)
+            if "error" in prompt and n == 2:
+                error = {"error": {"message": "fake failure mid-stream", "type": "server_error"}}
+                self.wfile.write(f"data: {json.dumps(error)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                return
+            chunk = {
+                "id": f"chatcmpl-fake-{cls.calls}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0, "delta": {"content": word if n == 0 else " " + word}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve(port: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", port), FakeCompletions)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _expect(condition: bool, message: str) -> None:
+    print(("OK   " if condition else "FAIL ") + message)
+    if not condition:
+        _expect.failed = True
+
+
+_expect.failed = False
+
+
+async def _check() -> None:
+    from utils import openai_utils as ou
+
+    ou.openai_metrics.reset()
+    ou.reply_cache.clear()
+
+    first = await ou.ask_openai("¿Cuál es el horario?")
+    calls = FakeCompletions.calls
+    again = await ou.ask_openai("cual es el HORARIO")
+    _expect(first is not None and again == first and FakeCompletions.calls == calls,
+            "normalized repeat question served from cache")
+
+    await ou.ask_openai("cual es el horario", history=[{"from": "user", "text": "hola"}])
+    _expect(FakeCompletions.calls == calls + 1, "question with history skips the cache")
+
+    started = time.perf_counter()
+    slow = await ou.ask_openai("un proceso lento")
+    elapsed = time.perf_counter() - started
+    _expect(slow is None and elapsed < ou.OPENAI_TIMEOUT_SECONDS + ou.OPENAI_CONNECT_TIMEOUT_SECONDS + 0.5,
+            f"slow upstream cut at the timeout ({elapsed:.2f}s)")
+
+    _expect(await ou.ask_openai("provoca error") is None, "upstream error returns None")
+
+    # The server keeps sleeping on the timed-out request; let it finish first.
+    while FakeCompletions.in_flight:
+        await asyncio.sleep(0.05)
+    FakeCompletions.max_in_flight = 0
+    await asyncio.gather(*(ou.ask_openai(f"pregunta distinta {n}") for n in range(ou.OPENAI_MAX_CONCURRENCY * 3)))
+    _expect(FakeCompletions.max_in_flight <= ou.OPENAI_MAX_CONCURRENCY,
+            f"at most {ou.OPENAI_MAX_CONCURRENCY} concurrent upstream calls (saw {FakeCompletions.max_in_flight})")
+
+    started = time.perf_counter()
+    first = None
+    pieces = []
+    status = {}
+    async for piece in ou.stream_openai("una pregunta para transmitir", status=status):
+        if first is None:
+            first = time.perf_counter() - started
+        pieces.append(piece)
+    total = time.perf_counter() - started
+    _expect(len(pieces) > 1 and first < total / 2,
+            f"streamed reply: first token after {first * 1000:.0f} ms of {total * 1000:.0f} ms")
+    cached = [p async for p in ou.stream_openai("Una pregunta para transmitir")]
+    _expect(cached == ["".join(pieces).strip()], "completed stream cached and replayed whole")
+    _expect(status.get("complete") is True, "completed stream reported as complete")
+
+    status = {}
+    partial = [p async for p in ou.stream_openai("provoca error al transmitir", status=status)]
+    _expect(partial and not status.get("complete"), f"stream cut by an upstream error reported as incomplete ({len(partial)} pieces)")
+
+    snap = ou.openai_metrics.snapshot()
+    print(json.dumps(snap, indent=2))
+    _expect(snap["cache_hits"] == 2 and snap["timeouts"] == 1 and snap["latency_ms"] is not None
+            and snap["first_token_ms"] is not None, "metrics count hits, timeouts and latency")
+    await ou.close_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.05, help="Seconds per normal reply")
+    parser.add_argument("--slow", type=float, default=5.0, help="Seconds for messages containing 'lento'")
+    parser.add_argument("--check", action="store_true", help="Run the client checks against this server")
+    args = parser.parse_args()
+
+    FakeCompletions.delay = args.delay
+    FakeCompletions.slow = args.slow
+
+    if not args.check:
+        server = ThreadingHTTPServer(("127.0.0.1", args.port), FakeCompletions)
+        print(f"Fake OpenAI listening on http://127.0.0.1:{args.port}/v1")
+        server.serve_forever()
+        return
+
+    server = serve(0)
+    # Settings are read at import time, so they must be set before importing the client.
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ.setdefault("OPENAI_TIMEOUT_SECONDS", "1")
+    os.environ.setdefault("OPENAI_QUEUE_TIMEOUT_SECONDS", "5")
+    FakeCompletions.delay = max(args.delay, 0.1)
+    asyncio.run(_check())
+    server.shutdown()
+    sys.exit(1 if _expect.failed else 0)
+
+
+if __name__ == '__main__':
+    main()
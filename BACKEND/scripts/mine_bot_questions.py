@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Batch job: mine the AI-answered bot questions in `chat` and replace the pending
+BotResponse proposals (see utils/bot_mining.py). Review them at
+GET /bot/responses/proposals. Meant to run daily (cron).
+
+    python scripts/mine_bot_questions.py [--days 30] [--min-count 3] [--similarity 0.6]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import BOT_MINING_DAYS, BOT_MINING_MIN_COUNT, BOT_MINING_SIMILARITY
+from db.session import SessionLocal
+from utils.bot_mining import mine_proposals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Propose BotResponses from frequent AI-answered questions")
+    parser.add_argument("--days", type=int, default=BOT_MINING_DAYS, help="Days of chat to scan (0 = all)")
+    parser.add_argument("--min-count", type=int, default=BOT_MINING_MIN_COUNT)
+    parser.add_argument("--similarity", type=float, default=BOT_MINING_SIMILARITY)
+    parser.add_argument("--limit", type=int, default=50, help="Maximum proposals")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        proposals = mine_proposals(db, days=args.days or None, min_count=args.min_count,
+                                   similarity=args.similarity, limit=args.limit)
+        print(f"{len(proposals)} proposals")
+        for p in proposals:
+            print(f"  {p.frequency:>5}  {p.clave}")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Reconstruye `cliente_producto_comprado` a partir de los pedidos vivos y archivados.
+Útil tras crear pedidos fuera de /compra (carga masiva, panel de administración) o
+tras borrar pedidos.
+
+    python scripts/reconstruir_compras_cliente.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.session import SessionLocal
+from utils.compras_cliente import reconstruir_compras_cliente
+
+
+def main():
+    db = SessionLocal()
+    try:
+        filas = reconstruir_compras_cliente(db)
+        print(f"Done. {filas} par(es) cliente/producto reconstruidos.")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Reconstruye la tabla acumulada `ventas_diarias` a partir de `detalle_pedido` (y de
+las tablas de archivo). Útil tras ediciones manuales de pedidos o cargas masivas.
+
+    python scripts/reconstruir_ventas_diarias.py                      # todo el historial
+    python scripts/reconstruir_ventas_diarias.py 2025-01-01 2025-01-31  # solo ese rango
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.session import SessionLocal
+from utils.ventas_diarias import reconstruir_ventas_diarias
+
+
+def usage():
+    print("Usage: python reconstruir_ventas_diarias.py [YYYY-MM-DD YYYY-MM-DD]")
+
+
+def main():
+    desde = hasta = None
+    if len(sys.argv) == 3:
+        try:
+            desde = datetime.strptime(sys.argv[1], "%Y-%m-%d").date()
+            hasta = datetime.strptime(sys.argv[2], "%Y-%m-%d").date()
+        except ValueError:
+            usage()
+            return
+    elif len(sys.argv) != 1:
+        usage()
+        return
+
+    db = SessionLocal()
+    try:
+        filas = reconstruir_ventas_diarias(db, desde, hasta)
+        rango = f"{desde} .. {hasta}" if desde else "todo el historial"
+        print(f"Done. {filas} fila(s) de ventas_diarias reconstruidas ({rango}).")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Mantiene las tablas acumuladas al día cuando se escriben pedidos o líneas de pedido
+fuera de `api/compra.py` (`/pedidos` y `/detalles_pedido`):
+
+- `ventas_diarias` (ver `utils/ventas_diarias.py`).
+- `cliente_producto_comprado`, que habilita las reseñas (ver `utils/compras_cliente.py`).
+
+`sumar_linea` y `restar_linea` reciben el pedido de la línea (o un `DatosPedido` con
+sus valores anteriores a una edición) y no hacen commit: se llaman en la misma
+transacción que la escritura. Igual que en las reconstrucciones, las líneas sin
+pedido o sin producto no cuentan y las de pedidos sin fecha solo cuentan como compra.
+"""
+
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+
+from utils.compras_cliente import quitar_compra, registrar_compra
+from utils.ventas_diarias import registrar_venta_diaria, restar_venta_diaria
+
+
+class DatosPedido(NamedTuple):
+    fecha_pedido: Optional[datetime]
+    cliente_id: Optional[int]
+
+
+def datos_pedido(pedido) -> DatosPedido:
+    return DatosPedido(pedido.fecha_pedido, pedido.cliente_id)
+
+
+def _fecha(valor) -> Optional[datetime]:
+    # `PedidoUpdate` asigna la fecha como texto; en la base ya es DATETIME.
+    return datetime.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def _dia(valor) -> date:
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def sumar_linea(db, pedido, producto_id, cantidad, subtotal) -> None:
+    if pedido is None or producto_id is None:
+        return
+    fecha = _fecha(pedido.fecha_pedido)
+    if fecha is not None:
+        registrar_venta_diaria(db, _dia(fecha), producto_id, cantidad, subtotal)
+    if pedido.cliente_id is not None:
+        registrar_compra(db, pedido.cliente_id, producto_id, fecha)
+
+
+def restar_linea(db, pedido, producto_id, cantidad, subtotal) -> None:
+    if pedido is None or producto_id is None:
+        return
+    fecha = _fecha(pedido.fecha_pedido)
+    if fecha is not None:
+        restar_venta_diaria(db, _dia(fecha), producto_id, cantidad, subtotal)
+    if pedido.cliente_id is not None:
+        quitar_compra(db, pedido.cliente_id, producto_id)
@@ -0,0 +1,182 @@
+"""
+Archivo de pedidos antiguos (tiering de `pedidos` / `detalle_pedido`).
+
+- `archivar_pedidos` mueve por lotes los pedidos cerrados más antiguos que la edad
+  configurada a `pedidos_archivo` / `detalle_pedido_archivo`. Cada lote es una
+  transacción (copiar + borrar), así que si el job se interrumpe basta con volver a
+  ejecutarlo: continúa con los pedidos que siguen en las tablas vivas. Tras cada lote
+  se invalidan los reportes de ventas cacheados de las fechas movidas (los DELETE de
+  Core no pasan por los eventos de la sesión).
+- `pedidos_cliente` y `historial_cliente` leen de ambas tablas cuando el rango
+  pedido llega a fechas anteriores al corte de archivo.
+- `particionar_archivo` es el modo opcional de particionado por rango de
+  `fecha_pedido` (solo MySQL) para la tabla de archivo.
+"""
+
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, delete, func, insert, or_, select, text
+from sqlalchemy.orm import selectinload
+
+from config import (
+    ARCHIVO_EDAD_DIAS,
+    ARCHIVO_ESTADOS_CERRADOS,
+    ARCHIVO_PAUSA_SEGUNDOS,
+    ARCHIVO_TAMANO_LOTE,
+)
+from models.detallepedido import DetallePedido
+from models.detallepedido_archivo import DetallePedidoArchivo
+from models.pedido import Pedido
+from models.pedido_archivo import PedidoArchivo
+from models.producto import Producto
+from utils.cache_reportes import cache_reportes
+
+_COLUMNAS_PEDIDO = ["id_pedido", "cliente_id", "vendedor_id", "fecha_pedido", "estado", "total"]
+_COLUMNAS_DETALLE = ["id_detalle", "pedido_id", "producto_id", "cantidad", "subtotal"]
+
+
+def fecha_corte(edad_dias: int = ARCHIVO_EDAD_DIAS) -> datetime:
+    """Fecha a partir de la cual (hacia atrás) los pedidos pueden estar archivados."""
+    return datetime.now() - timedelta(days=edad_dias)
+
+
+def archivar_pedidos(
+    db,
+    edad_dias: int = ARCHIVO_EDAD_DIAS,
+    estados: Optional[list] = None,
+    tamano_lote: int = ARCHIVO_TAMANO_LOTE,
+    pausa: float = ARCHIVO_PAUSA_SEGUNDOS,
+    max_lotes: Optional[int] = None,
+) -> int:
+    """Mueve pedidos cerrados y antiguos a las tablas de archivo. Devuelve cuántos movió.
+
+    `pausa` segundos entre lotes limita la carga sobre la base OLTP; `max_lotes`
+    permite ejecutar solo una parte (p. ej. en una ventana de mantenimiento).
+    """
+    estados = [e.lower() for e in (estados or ARCHIVO_ESTADOS_CERRADOS)]
+    corte = fecha_corte(edad_dias)
+    movidos = 0
+    lotes = 0
+
+    while max_lotes is None or lotes < max_lotes:
+        filas = db.execute(
+            select(Pedido.id_pedido, Pedido.fecha_pedido)
+            .where(Pedido.fecha_pedido < corte, func.lower(Pedido.estado).in_(estados))
+            .order_by(Pedido.fecha_pedido, Pedido.id_pedido)
+            .limit(tamano_lote)
+        ).all()
+        ids = [id_pedido for id_pedido, _ in filas]
+        if not ids:
+            break
+
+        try:
+            db.execute(
+                insert(PedidoArchivo).from_select(
+                    _COLUMNAS_PEDIDO,
+                    select(*[getattr(Pedido, c) for c in _COLUMNAS_PEDIDO]).where(Pedido.id_pedido.in_(ids)),
+                )
+            )
+            db.execute(
+                insert(DetallePedidoArchivo).from_select(
+                    _COLUMNAS_DETALLE,
+                    select(*[getattr(DetallePedido, c) for c in _COLUMNAS_DETALLE]).where(DetallePedido.pedido_id.in_(ids)),
+                )
+            )
+            db.execute(delete(DetallePedido).where(DetallePedido.pedido_id.in_(ids)))
+            db.execute(delete(Pedido).where(Pedido.id_pedido.in_(ids)))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        for dia in {fecha.date() for _, fecha in filas}:
+            cache_reportes.invalidar_fecha(dia)
+
+        movidos += len(ids)
+        lotes += 1
+        print(f"[ARCHIVO] Lote {lotes}: {len(ids)} pedidos archivados (total {movidos})")
+        if len(ids) < tamano_lote:
+            break
+        if pausa:
+            time.sleep(pausa)
+
+    return movidos
+
+
+def pedidos_cliente(db, cliente_id: int, desde: Optional[datetime] = None, hasta: Optional[datetime] = None) -> list:
+    """Pedidos de un cliente entre `desde` y `hasta`, incluyendo los archivados si el
+    rango llega a fechas anteriores al corte (sin `desde` se considera todo el historial)."""
+    resultado = []
+    modelos = [Pedido]
+    if desde is None or desde < fecha_corte():
+        modelos.append(PedidoArchivo)
+    for modelo in modelos:
+        query = db.query(modelo).filter(modelo.cliente_id == cliente_id)
+        if desde is not None:
+            query = query.filter(modelo.fecha_pedido >= desde)
+        if hasta is not None:
+            query = query.filter(modelo.fecha_pedido <= hasta)
+        resultado.extend(query.all())
+    return resultado
+
+
+def _pagina_historial(db, modelo, detalle_modelo, cliente_id, antes_fecha, antes_id, limit):
+    query = (
+        db.query(modelo)
+        .filter(modelo.cliente_id == cliente_id, modelo.fecha_pedido.isnot(None))
+        .options(
+            selectinload(modelo.detalles)
+            .selectinload(detalle_modelo.producto)
+            .selectinload(Producto.videos)
+        )
+    )
+    if antes_fecha is not None:
+        if antes_id is not None:
+            query = query.filter(or_(
+                modelo.fecha_pedido < antes_fecha,
+                and_(modelo.fecha_pedido == antes_fecha, modelo.id_pedido < antes_id),
+            ))
+        else:
+            query = query.filter(modelo.fecha_pedido < antes_fecha)
+    return query.order_by(modelo.fecha_pedido.desc(), modelo.id_pedido.desc()).limit(limit).all()
+
+
+def historial_cliente(db, cliente_id: int, antes_fecha: Optional[datetime], antes_id: Optional[int], limit: int) -> list:
+    """Página keyset (fecha desc, id desc) del historial de un cliente sobre pedidos vivos
+    y archivados. El archivo solo se consulta cuando la página llega a fechas donde
+    puede haber pedidos archivados."""
+    vivos = _pagina_historial(db, Pedido, DetallePedido, cliente_id, antes_fecha, antes_id, limit)
+
+    # Búsqueda por índice (cliente_id, fecha_pedido): ¿hay algo archivado para este cliente?
+    max_archivo = (
+        db.query(func.max(PedidoArchivo.fecha_pedido))
+        .filter(PedidoArchivo.cliente_id == cliente_id)
+        .scalar()
+    )
+    if max_archivo is None:
+        return vivos
+    if len(vivos) >= limit and vivos[-1].fecha_pedido > max_archivo:
+        return vivos
+
+    archivados = _pagina_historial(db, PedidoArchivo, DetallePedidoArchivo, cliente_id, antes_fecha, antes_id, limit)
+    combinados = sorted(vivos + archivados, key=lambda p: (p.fecha_pedido, p.id_pedido), reverse=True)
+    return combinados[:limit]
+
+
+def particionar_archivo(db, desde_anio: int, hasta_anio: int) -> None:
+    """Modo opcional (solo MySQL): particiona `pedidos_archivo` por año de `fecha_pedido`.
+
+    Las tablas vivas no se particionan porque InnoDB no admite llaves foráneas en
+    tablas particionadas y `detalle_pedido` referencia a `pedidos`.
+    """
+    if db.get_bind().dialect.name != "mysql":
+        raise RuntimeError("El particionado por rango solo está soportado en MySQL")
+    particiones = ", ".join(
+        f"PARTITION p{anio} VALUES LESS THAN ({anio + 1})" for anio in range(desde_anio, hasta_anio + 1)
+    )
+    db.execute(text(
+        "ALTER TABLE pedidos_archivo PARTITION BY RANGE (YEAR(fecha_pedido)) "
+        f"({particiones}, PARTITION pmax VALUES LESS THAN MAXVALUE)"
+    ))
+    db.commit()
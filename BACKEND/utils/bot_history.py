@@ -0,0 +1,164 @@
+"""
+Server-side conversation history for the bot.
+
+Each user has a ring buffer of their last `BOT_HISTORY_MAX_TURNS` turns
+({from: 'user'|'bot', text}), so clients only send the new message. Users idle for
+`BOT_HISTORY_IDLE_SECONDS` are forgotten and, past `BOT_HISTORY_MAX_USERS`, the least
+recently active user is evicted (LRU).
+
+`recent` returns the newest turns that fit in `BOT_HISTORY_TOKEN_BUDGET` (estimated
+at ~4 characters per token), which bounds the prompt sent to OpenAI however long the
+conversation gets.
+
+`is_follow_up` tells whether a message needs the earlier turns at all: standalone
+questions are sent without history, so their replies stay cacheable in
+utils/openai_utils.py (cached replies are keyed by the bare question).
+
+With `BOT_HISTORY_FROM_CHAT` a user that is not in memory (restart, another worker)
+is warmed up from the `chat` table, which already logs the user messages and the AI
+replies.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, or_, select
+
+from config import (
+    BOT_HISTORY_FROM_CHAT,
+    BOT_HISTORY_IDLE_SECONDS,
+    BOT_HISTORY_MAX_TURNS,
+    BOT_HISTORY_MAX_USERS,
+    BOT_HISTORY_TOKEN_BUDGET,
+)
+from models.chatbox import Chat
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token, plus one for the message framing)."""
+    return len(text or "") // 4 + 1
+
+
+def trim_to_budget(turns, budget: int = BOT_HISTORY_TOKEN_BUDGET) -> list:
+    """Newest turns whose estimated tokens fit in `budget`, in chronological order."""
+    kept = []
+    used = 0
+    for turn in reversed(list(turns)):
+        cost = estimate_tokens(turn.get("text", ""))
+        if used + cost > budget:
+            break
+        kept.append(turn)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+# Words that point back to something said earlier: demonstratives, third-person
+# pronouns and continuation words. Matched with accents kept ("él" but not the article
+# "el", "esta" is left out for the verb "está"), listing the unaccented spelling too.
+FOLLOW_UP_WORDS = frozenset({
+    "eso", "esto", "ese", "esa", "esos", "esas", "estos", "estas",
+    "aquel", "aquella", "aquello", "ahí", "ahi", "allí", "alli",
+    "él", "ella", "ellos", "ellas",
+    "también", "tambien", "entonces", "otro", "otra", "otros", "otras", "mismo", "misma",
+    "anterior", "dicho", "dicha",
+})
+# Openers that continue the previous turn ("y en rojo?", "pero cuánto cuesta?").
+FOLLOW_UP_OPENERS = frozenset({"y", "pero", "ok", "vale", "sí", "si", "no"})
+# Messages this short ("¿y envío?", "gracias") only make sense in context.
+FOLLOW_UP_MAX_WORDS = 2
+
+
+def is_follow_up(message: Optional[str]) -> bool:
+    """True if `message` seems to refer to earlier turns. It errs towards True: a
+    standalone question taken for a follow-up only misses the reply cache."""
+    words = re.findall(r"\w+", (message or "").casefold())
+    if len(words) <= FOLLOW_UP_MAX_WORDS:
+        return True
+    return words[0] in FOLLOW_UP_OPENERS or any(w in FOLLOW_UP_WORDS for w in words)
+
+
+class ConversationStore:
+    def __init__(
+        self,
+        max_turns: int = BOT_HISTORY_MAX_TURNS,
+        max_users: int = BOT_HISTORY_MAX_USERS,
+        idle_seconds: float = BOT_HISTORY_IDLE_SECONDS,
+    ):
+        self.max_turns = max_turns
+        self.max_users = max_users
+        self.idle_seconds = idle_seconds
+        # usuario_id -> (deque of turns, last activity); least recently active first
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float) -> None:
+        while self._users:
+            usuario_id, (_turns, last) = next(iter(self._users.items()))
+            if now - last < self.idle_seconds:
+                break
+            del self._users[usuario_id]
+
+    def has(self, usuario_id: int) -> bool:
+        with self._lock:
+            self._expire(time.monotonic())
+            return usuario_id in self._users
+
+    def append(self, usuario_id: int, role: str, text: str) -> None:
+        if not usuario_id or not text:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._users.pop(usuario_id, None)
+            turns = entry[0] if entry else deque(maxlen=self.max_turns)
+            turns.append({"from": role, "text": text})
+            self._users[usuario_id] = (turns, now)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def load(self, usuario_id: int, turns) -> None:
+        """Replace a user's buffer (e.g. with the turns read from `chat`)."""
+        with self._lock:
+            self._users.pop(usuario_id, None)
+            self._users[usuario_id] = (deque(turns, maxlen=self.max_turns), time.monotonic())
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def recent(self, usuario_id: int, budget: int = BOT_HISTORY_TOKEN_BUDGET) -> list:
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._users.get(usuario_id)
+            turns = list(entry[0]) if entry else []
+        return trim_to_budget(turns, budget)
+
+    def clear(self, usuario_id: Optional[int] = None) -> None:
+        with self._lock:
+            if usuario_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(usuario_id, None)
+
+    def warm_from_chat(self, db, usuario_id: int) -> None:
+        """Load the user's latest bot conversation from `chat` (messages within the idle
+        window) if it is not in memory."""
+        if not BOT_HISTORY_FROM_CHAT or self.has(usuario_id):
+            return
+        rows = db.execute(
+            select(Chat.usuario_origen, Chat.mensaje)
+            .where(or_(
+                and_(Chat.usuario_origen == usuario_id, Chat.usuario_destino.is_(None)),
+                and_(Chat.usuario_origen.is_(None), Chat.usuario_destino == usuario_id),
+            ), Chat.fecha_envio >= datetime.now() - timedelta(seconds=self.idle_seconds))
+            .order_by(Chat.id.desc())
+            .limit(self.max_turns)
+        ).all()
+        turns = [{"from": "user" if origen else "bot", "text": mensaje} for origen, mensaje in reversed(rows) if mensaje]
+        self.load(usuario_id, turns)
+
+
+conversations = ConversationStore()
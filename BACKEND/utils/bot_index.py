@@ -0,0 +1,235 @@
+"""
+In-memory intent index for `/bot/respond`.
+
+Built once from the enabled `bot_responses` rows (highest `prioridad` first) and
+swapped atomically on rebuild, so a request always sees a complete index:
+
+- a multi-pattern automaton over every full `clave` (exact substring match) and
+  over every `clave` token (the "does the message mention any known topic?" check);
+- an inverted index token -> responses, used for the token-overlap score;
+- a character bigram index used as a candidate prefilter, so the fuzzy
+  `SequenceMatcher` ratio only runs on the few responses that share text with
+  the message instead of on every row;
+- the keyword-boost map resolved per response ahead of time;
+- a NumPy matrix of hashed character-trigram vectors (one L2-normalised row per
+  clave), so every response can be scored with one matrix-vector product
+  (`rank_vectorized`) instead of one `SequenceMatcher` per row.
+
+`bot_admin_controller` rebuilds the index after every write; other worker
+processes pick up changes within `BOT_INDEX_RELOAD_SECONDS`.
+"""
+
+import threading
+import time
+import zlib
+from collections import Counter, defaultdict, namedtuple
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from config import BOT_INDEX_RELOAD_SECONDS, BOT_SCORER
+from models.bot_response import BotResponse
+from utils.moderacion import AhoCorasick
+
+Intent = namedtuple("Intent", "id clave respuesta prioridad")
+
+# Intent keyword groups: a message containing one of the keywords boosts the
+# responses whose clave mentions the group name or that keyword.
+KEYWORDS_MAP = {
+    'horario': ['horario', 'abren', 'cierra', 'hora'],
+    'envio': ['envio', 'envios', 'llegar', 'tiempo', 'demora', 'entrega', 'enviar'],
+    'devolucion': ['devoluci', 'devolver', 'reembolso', 'reembols'],
+    'pedido': ['pedido', 'compr', 'orden', 'estado', 'entregado', 'cancelar'],
+    'contraseña': ['contrase', 'clave', 'password', 'recuperar', 'restablecer'],
+    'nombre': ['nombre', 'usuario', 'apodo', 'editar nombre', 'cambiar nombre'],
+    'ventas': ['venta', 'mayor', 'precio', 'oferta', 'promocion', 'promo'],
+    'stock': ['agotado', 'agotada', 'stock', 'disponible']
+}
+KEYWORD_BOOST = 0.15
+# Upper bound of bigram-prefiltered candidates that get a SequenceMatcher ratio.
+MAX_FUZZY_CANDIDATES = 25
+
+
+# Dimension of the hashed character n-gram vectors (collisions are rare at this size
+# for short claves and only add a little noise to the cosine).
+NGRAM_DIM = 4096
+NGRAM_SIZE = 3
+
+
+def _bigrams(text: str) -> set:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def ngram_vector(text: str) -> np.ndarray:
+    """L2-normalised hashed character-trigram counts of `text` (padded with spaces)."""
+    vec = np.zeros(NGRAM_DIM, dtype=np.float32)
+    padded = f" {text} "
+    if len(padded) >= NGRAM_SIZE:
+        # crc32 instead of hash(): stable across processes and runs
+        idx = [zlib.crc32(padded[i:i + NGRAM_SIZE].encode("utf-8")) % NGRAM_DIM
+               for i in range(len(padded) - NGRAM_SIZE + 1)]
+        np.add.at(vec, idx, 1.0)
+        norm = np.linalg.norm(vec)
+        if norm:
+            vec /= norm
+    return vec
+
+
+class BotIndex:
+    def __init__(self, intents=()):
+        # Kept in priority order: the first exact match wins, like the old scan.
+        self.intents = [i for i in intents if i.clave]
+        self._order = {i: n for n, i in enumerate(self.intents)}
+        claves = [i.clave.lower() for i in self.intents]
+        self._claves = claves
+
+        self._clave_automaton = AhoCorasick(sorted(set(claves)))
+        self._by_clave = defaultdict(list)
+        for n, c in enumerate(claves):
+            self._by_clave[c].append(n)
+
+        self._token_sets = [set(c.split()) for c in claves]
+        self._token_automaton = AhoCorasick(sorted({t for ts in self._token_sets for t in ts}))
+        self._by_token = defaultdict(list)
+        for n, tokens in enumerate(self._token_sets):
+            for t in tokens:
+                self._by_token[t].append(n)
+
+        self._by_bigram = defaultdict(list)
+        for n, c in enumerate(claves):
+            for g in _bigrams(c):
+                self._by_bigram[g].append(n)
+
+        self._matrix = (
+            np.vstack([ngram_vector(c) for c in claves]) if claves
+            else np.zeros((0, NGRAM_DIM), dtype=np.float32)
+        )
+        self._token_counts = np.array([len(t) for t in self._token_sets], dtype=np.float32)
+        self._priority = np.array([(i.prioridad or 0) * 0.01 for i in self.intents], dtype=np.float32)
+
+        # keyword -> [(response, group)] that the keyword boosts when present in a message
+        self._keyword_automaton = AhoCorasick(sorted({kw for kws in KEYWORDS_MAP.values() for kw in kws}))
+        self._boosted_by = defaultdict(list)
+        for group, kws in KEYWORDS_MAP.items():
+            for kw in kws:
+                for n, c in enumerate(claves):
+                    if group in c or kw in c:
+                        self._boosted_by[kw].append((n, group))
+
+    def mentions_any_clave(self, mensaje: str) -> bool:
+        """True if any token of any clave appears (as a substring) in the message."""
+        return bool(self._token_automaton.buscar(mensaje, primera=True))
+
+    def exact_match(self, mensaje: str):
+        """Highest-priority intent whose full clave is a substring of the message."""
+        found = self._clave_automaton.buscar(mensaje)
+        if not found:
+            return None
+        best = min(n for c in found for n in self._by_clave[c])
+        return self.intents[best]
+
+    def _boosts(self, mensaje: str) -> dict:
+        groups = defaultdict(set)
+        for kw in set(self._keyword_automaton.buscar(mensaje)):
+            for n, group in self._boosted_by[kw]:
+                groups[n].add(group)
+        return {n: KEYWORD_BOOST * len(g) for n, g in groups.items()}
+
+    def candidates(self, mensaje: str) -> set:
+        """Responses worth scoring: shared token, keyword boost or top bigram overlap."""
+        cands = set()
+        for t in set(mensaje.split()):
+            cands.update(self._by_token.get(t, ()))
+        shared = Counter()
+        for g in _bigrams(mensaje):
+            shared.update(self._by_bigram.get(g, ()))
+        cands.update(n for n, _ in shared.most_common(MAX_FUZZY_CANDIDATES))
+        return cands
+
+    def fuzzy_score(self, mensaje: str, n: int) -> float:
+        """max(SequenceMatcher ratio, token overlap) of the message against response `n`."""
+        clave = self._claves[n]
+        ratio = SequenceMatcher(None, mensaje, clave).ratio()
+        tokens = self._token_sets[n]
+        overlap = len(set(mensaje.split()) & tokens) / float(len(tokens)) if tokens else 0.0
+        return max(ratio, overlap)
+
+    def rank(self, mensaje: str) -> list:
+        """[(adjusted_score, Intent)] for the candidate responses, best first."""
+        boosts = self._boosts(mensaje)
+        scored = []
+        for n in self.candidates(mensaje) | set(boosts):
+            score = min(1.0, self.fuzzy_score(mensaje, n) + boosts.get(n, 0.0))
+            scored.append((score + (self.intents[n].prioridad or 0) * 0.01, self.intents[n]))
+        # Ties keep priority order, as the old stable sort over the ordered rows did.
+        scored.sort(key=lambda x: (-x[0], self._order[x[1]]))
+        return scored
+
+    def rank_vectorized(self, mensaje: str, top: int = 2) -> list:
+        """Best `top` [(adjusted_score, Intent)] over every response.
+
+        Same score shape as `rank` (max(similarity, token overlap) + keyword boost,
+        capped at 1, plus priority), but the similarity is the cosine between
+        hashed trigram vectors, computed for all responses at once.
+        """
+        n = len(self.intents)
+        if not n:
+            return []
+        similarity = self._matrix @ ngram_vector(mensaje)
+
+        shared = np.zeros(n, dtype=np.float32)
+        for t in set(mensaje.split()):
+            for i in self._by_token.get(t, ()):
+                shared[i] += 1.0
+        overlap = np.divide(shared, self._token_counts, out=np.zeros_like(shared), where=self._token_counts > 0)
+
+        boosts = np.zeros(n, dtype=np.float32)
+        for i, b in self._boosts(mensaje).items():
+            boosts[i] = b
+
+        scores = np.minimum(1.0, np.maximum(similarity, overlap) + boosts) + self._priority
+        if n > top:
+            best = np.argpartition(-scores, top - 1)[:top]
+        else:
+            best = np.arange(n)
+        # Rows are in priority order, so ties resolve to the higher-priority response.
+        best = sorted(best.tolist(), key=lambda i: (-scores[i], i))
+        return [(float(scores[i]), self.intents[i]) for i in best]
+
+    def best_matches(self, mensaje: str, top: int = 2) -> list:
+        """Top candidates with the scorer selected by `BOT_SCORER`."""
+        if BOT_SCORER == "sequence":
+            return self.rank(mensaje)[:top]
+        return self.rank_vectorized(mensaje, top)
+
+
+class BotIndexHolder:
+    """Holds the current `BotIndex` and rebuilds it from the database."""
+
+    def __init__(self, reload_seconds: float = BOT_INDEX_RELOAD_SECONDS):
+        self.reload_seconds = reload_seconds
+        self.index = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def rebuild(self, db) -> BotIndex:
+        rows = (
+            db.query(BotResponse.id, BotResponse.clave, BotResponse.respuesta, BotResponse.prioridad)
+            .filter(BotResponse.enabled == True)
+            .order_by(BotResponse.prioridad.desc())
+            .all()
+        )
+        index = BotIndex([Intent(*r) for r in rows])
+        with self._lock:
+            self.index = index
+            self._built_at = time.monotonic()
+        return index
+
+    def get(self, db) -> BotIndex:
+        index = self.index
+        if index is None or time.monotonic() - self._built_at >= self.reload_seconds:
+            index = self.rebuild(db)
+        return index
+
+
+bot_index = BotIndexHolder()
@@ -0,0 +1,187 @@
+"""
+Mining of the questions the bot sends to OpenAI, to promote the frequent ones into
+`bot_responses`.
+
+1. `ai_answered` scans `chat` (keyset by id) and pairs each user message with the AI
+   reply logged right after it for that user (DB answers do not log a bot row, so only
+   AI-answered questions pair up).
+2. Questions are normalized (`normalize_question`) and exact repeats merged; the distinct
+   phrasings get a MinHash signature over character 4-gram shingles and LSH banding
+   proposes candidate pairs, which are grouped when their estimated Jaccard similarity
+   reaches `BOT_MINING_SIMILARITY`.
+3. Clusters asked at least `BOT_MINING_MIN_COUNT` times become `BotResponseProposal`
+   rows (clave = most frequent phrasing, respuesta = most frequent AI reply), skipping
+   signatures already accepted or rejected and questions the current index already
+   answers exactly. An admin accepts or rejects them from /bot/responses/proposals.
+"""
+
+import json
+import zlib
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from itertools import combinations
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from config import BOT_MINING_DAYS, BOT_MINING_MIN_COUNT, BOT_MINING_SIMILARITY
+from models.bot_response_proposal import BotResponseProposal
+from models.chatbox import Chat
+from utils.bot_index import bot_index
+from utils.openai_utils import normalize_question
+
+SHINGLE_SIZE = 4
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+# Mersenne prime 2^31 - 1: shingle hashes are reduced below it so a * x + b fits in 64 bits.
+_PRIME = (1 << 31) - 1
+SCAN_BATCH = 5000
+# Members of one LSH bucket compared pairwise (guards against a degenerate huge bucket)
+MAX_BUCKET_PAIRS = 200
+MAX_EXAMPLES = 5
+
+
+def shingles(text: str) -> np.ndarray:
+    padded = f" {text} "
+    grams = {padded[i:i + SHINGLE_SIZE] for i in range(max(1, len(padded) - SHINGLE_SIZE + 1))}
+    return np.array([zlib.crc32(g.encode("utf-8")) % _PRIME for g in grams], dtype=np.uint64)
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        x = shingles(text)
+        return ((self.a[:, None] * x[None, :] + self.b[:, None]) % _PRIME).min(axis=1)
+
+
+def ai_answered(db, since: Optional[datetime] = None):
+    """Yield (question, ai_reply) pairs from the bot conversations logged in `chat`."""
+    pending = {}
+    last_id = 0
+    while True:
+        query = (
+            select(Chat.id, Chat.usuario_origen, Chat.usuario_destino, Chat.mensaje)
+            .where(Chat.id > last_id)
+            .where((Chat.usuario_origen.is_(None)) | (Chat.usuario_destino.is_(None)))
+            .order_by(Chat.id)
+            .limit(SCAN_BATCH)
+        )
+        if since is not None:
+            query = query.where(Chat.fecha_envio >= since)
+        rows = db.execute(query).all()
+        if not rows:
+            return
+        for _id, origen, destino, mensaje in rows:
+            if origen is not None and destino is None:
+                pending[origen] = mensaje
+            elif origen is None and destino is not None:
+                question = pending.pop(destino, None)
+                if question and mensaje:
+                    yield question, mensaje
+        last_id = rows[-1][0]
+
+
+def cluster_questions(pairs, similarity: float = BOT_MINING_SIMILARITY) -> list:
+    """Group near-duplicate questions. Returns clusters sorted by frequency, each
+    {"frequency", "phrasings": Counter(normalized -> count), "examples": {normalized: original},
+    "answers": Counter}."""
+    counts = Counter()
+    originals = {}
+    answers = defaultdict(Counter)
+    for question, answer in pairs:
+        key = normalize_question(question)
+        if not key:
+            continue
+        counts[key] += 1
+        originals.setdefault(key, question.strip())
+        answers[key][answer.strip()] += 1
+
+    phrasings = list(counts)
+    if not phrasings:
+        return []
+    hasher = MinHasher()
+    signatures = np.vstack([hasher.signature(p) for p in phrasings])
+
+    parent = list(range(len(phrasings)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(BANDS):
+        buckets = defaultdict(list)
+        block = signatures[:, band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        for i, row in enumerate(block):
+            buckets[row.tobytes()].append(i)
+        for members in buckets.values():
+            for i, j in combinations(members[:MAX_BUCKET_PAIRS], 2):
+                a, b = find(i), find(j)
+                if a != b and np.mean(signatures[i] == signatures[j]) >= similarity:
+                    parent[b] = a
+
+    groups = defaultdict(list)
+    for i in range(len(phrasings)):
+        groups[find(i)].append(phrasings[i])
+
+    clusters = []
+    for members in groups.values():
+        cluster_answers = Counter()
+        for m in members:
+            cluster_answers.update(answers[m])
+        clusters.append({
+            "frequency": sum(counts[m] for m in members),
+            "phrasings": Counter({m: counts[m] for m in members}),
+            "examples": {m: originals[m] for m in members},
+            "answers": cluster_answers,
+        })
+    clusters.sort(key=lambda c: c["frequency"], reverse=True)
+    return clusters
+
+
+def mine_proposals(
+    db,
+    days: Optional[int] = BOT_MINING_DAYS,
+    min_count: int = BOT_MINING_MIN_COUNT,
+    similarity: float = BOT_MINING_SIMILARITY,
+    limit: int = 50,
+) -> list:
+    """Replace the pending proposals with the current top clusters. Returns the new rows."""
+    since = datetime.now() - timedelta(days=days) if days else None
+    clusters = cluster_questions(ai_answered(db, since), similarity)
+
+    decided = set(db.execute(
+        select(BotResponseProposal.signature).where(BotResponseProposal.status != "pending")
+    ).scalars())
+    index = bot_index.get(db)
+
+    db.query(BotResponseProposal).filter(BotResponseProposal.status == "pending").delete(synchronize_session=False)
+    proposals = []
+    for cluster in clusters:
+        if cluster["frequency"] < min_count or len(proposals) >= limit:
+            break
+        # Most asked phrasing; the shortest one on ties
+        signature = min(cluster["phrasings"], key=lambda p: (-cluster["phrasings"][p], len(p)))[:200]
+        if signature in decided or index.exact_match(signature) is not None:
+            continue
+        examples = [cluster["examples"][p] for p, _ in cluster["phrasings"].most_common(MAX_EXAMPLES)]
+        proposal = BotResponseProposal(
+            clave=signature,
+            respuesta=cluster["answers"].most_common(1)[0][0],
+            examples=json.dumps(examples, ensure_ascii=False),
+            frequency=cluster["frequency"],
+            signature=signature,
+            status="pending",
+            created_at=datetime.now(),
+        )
+        db.add(proposal)
+        proposals.append(proposal)
+    db.commit()
+    return proposals
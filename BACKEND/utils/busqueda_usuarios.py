@@ -0,0 +1,153 @@
+"""
+Búsqueda de usuarios para `/usuarios/reportes` sin recorrer la tabla con `ILIKE '%...%'`.
+
+- Correo: la columna `correo_busqueda` guarda el correo en minúsculas y sin espacios
+  (se llena sola en cada flush, ver `registrar_eventos`) y está indexada, así que el
+  filtro es un `LIKE 'prefijo%'` que usa el índice (o el compuesto con `rol_id`).
+- Nombre: índice invertido en memoria trigrama -> ids de usuario sobre el nombre
+  normalizado (minúsculas, sin acentos). Una búsqueda intersecta las listas de sus
+  trigramas y confirma la subcadena en los pocos candidatos; con menos de 3 letras se
+  revisan los nombres en memoria. El resultado es la lista ordenada de ids; el
+  endpoint la pagina en memoria y solo consulta los de la página (`id_usuario IN`).
+- El índice se carga la primera vez que se usa y se recarga cada
+  `USUARIOS_BUSQUEDA_RECARGA_SEGUNDOS` (cambios de otros workers); los cambios hechos
+  en este proceso se aplican tras cada commit.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import USUARIOS_BUSQUEDA_RECARGA_SEGUNDOS
+from models.usuarios import Usuario
+from utils.moderacion import normalizar
+
+
+def normalizar_correo(correo: Optional[str]) -> Optional[str]:
+    return correo.strip().lower() if correo is not None else None
+
+
+def normalizar_nombre(nombre: Optional[str]) -> str:
+    return " ".join(normalizar(nombre or "").split())
+
+
+def trigramas(texto: str) -> set:
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceNombres:
+    def __init__(self, recarga_segundos: float = USUARIOS_BUSQUEDA_RECARGA_SEGUNDOS):
+        self.recarga_segundos = recarga_segundos
+        # id_usuario -> nombre normalizado
+        self._nombres = None
+        # trigrama -> ids de usuario cuyo nombre lo contiene
+        self._trigramas = defaultdict(set)
+        self._cargado_en = 0.0
+        self._lock = threading.Lock()
+
+    def reconstruir(self, db) -> None:
+        nombres = {id_usuario: normalizar_nombre(nombre) for id_usuario, nombre in db.query(Usuario.id_usuario, Usuario.nombre)}
+        indice = defaultdict(set)
+        for id_usuario, nombre in nombres.items():
+            for trigrama in trigramas(nombre):
+                indice[trigrama].add(id_usuario)
+        with self._lock:
+            self._nombres = nombres
+            self._trigramas = indice
+            self._cargado_en = time.monotonic()
+
+    def _asegurar(self, db) -> None:
+        if self._nombres is None or time.monotonic() - self._cargado_en >= self.recarga_segundos:
+            self.reconstruir(db)
+
+    def _quitar(self, id_usuario: int) -> None:
+        anterior = self._nombres.pop(id_usuario, None)
+        for trigrama in trigramas(anterior or ""):
+            ids = self._trigramas.get(trigrama)
+            if ids is not None:
+                ids.discard(id_usuario)
+                if not ids:
+                    del self._trigramas[trigrama]
+
+    def aplicar(self, actualizados: dict, borrados: set) -> None:
+        """Aplica altas/ediciones (id -> nombre) y bajas ya confirmadas."""
+        with self._lock:
+            if self._nombres is None:
+                return
+            for id_usuario in borrados:
+                self._quitar(id_usuario)
+            for id_usuario, nombre in actualizados.items():
+                self._quitar(id_usuario)
+                nombre = normalizar_nombre(nombre)
+                self._nombres[id_usuario] = nombre
+                for trigrama in trigramas(nombre):
+                    self._trigramas[trigrama].add(id_usuario)
+
+    def buscar(self, texto: str, db) -> List[int]:
+        """Ids (ordenados) de los usuarios cuyo nombre contiene `texto`."""
+        self._asegurar(db)
+        texto = normalizar_nombre(texto)
+        with self._lock:
+            if len(texto) < 3:
+                candidatos = self._nombres.keys()
+            else:
+                # Se intersecta empezando por la lista más corta.
+                listas = sorted((self._trigramas.get(t, ()) for t in trigramas(texto)), key=len)
+                candidatos = set(listas[0])
+                for ids in listas[1:]:
+                    if not candidatos:
+                        break
+                    candidatos &= ids
+            return sorted(i for i in candidatos if texto in self._nombres[i])
+
+    def __len__(self) -> int:
+        return len(self._nombres or ())
+
+
+indice_nombres = IndiceNombres()
+
+
+def registrar_eventos() -> None:
+    """Mantiene `correo_busqueda` al día en cada flush y, tras el commit, aplica al
+    índice de nombres las altas, ediciones y bajas de usuarios."""
+
+    @event.listens_for(Session, "before_flush")
+    def _normalizar(session, flush_context, instances):
+        for obj in list(session.new) + list(session.dirty):
+            if isinstance(obj, Usuario):
+                correo = normalizar_correo(obj.correo)
+                if obj.correo_busqueda != correo:
+                    obj.correo_busqueda = correo
+
+    @event.listens_for(Session, "after_flush")
+    def _recolectar(session, flush_context):
+        # En after_flush new/dirty/deleted aún son los del flush y los ids ya existen.
+        actualizados = {
+            obj.id_usuario: obj.nombre
+            for obj in list(session.new) + list(session.dirty)
+            if isinstance(obj, Usuario)
+        }
+        borrados = {obj.id_usuario for obj in session.deleted if isinstance(obj, Usuario)}
+        if actualizados or borrados:
+            pendientes = session.info.setdefault("usuarios_busqueda", ({}, set()))
+            for id_usuario in borrados:
+                pendientes[0].pop(id_usuario, None)
+            pendientes[0].update(actualizados)
+            pendientes[1].update(borrados)
+
+    @event.listens_for(Session, "after_commit")
+    def _aplicar(session):
+        pendientes = session.info.pop("usuarios_busqueda", None)
+        if pendientes:
+            indice_nombres.aplicar(*pendientes)
+
+    @event.listens_for(Session, "after_rollback")
+    def _descartar(session):
+        session.info.pop("usuarios_busqueda", None)
+
+
+registrar_eventos()
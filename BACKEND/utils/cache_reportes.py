@@ -0,0 +1,230 @@
+"""
+Caché de resultados de reportes de ventas.
+
+- La llave es (reporte, parámetros). Los reportes de periodos cerrados (un día,
+  mes o año que ya terminó) no cambian, así que se guardan sin expiración en
+  memoria y en disco (`REPORTES_CACHE_DIR`) para sobrevivir a reinicios.
+- El periodo abierto (el que contiene la fecha de hoy) expira a los
+  `REPORTES_CACHE_TTL_SEGUNDOS` y solo vive en memoria.
+- Los parámetros vienen del cliente, así que la memoria es un LRU de
+  `REPORTES_CACHE_MAX_ENTRADAS` llaves y las entradas vencidas se barren cada TTL;
+  en disco solo se guardan los periodos cerrados con ventas (ver `guardar`).
+- Cuando se crea, modifica o elimina un pedido o un detalle de pedido se invalidan
+  las entradas del año, mes y día de ese pedido (ver `registrar_invalidacion`).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from config import REPORTES_CACHE_DIR, REPORTES_CACHE_MAX_ENTRADAS, REPORTES_CACHE_TTL_SEGUNDOS
+from models.detallepedido import DetallePedido
+from models.pedido import Pedido
+
+_SIN_VALOR = object()
+
+
+def _fin_periodo(anio: int, mes: Optional[int], dia: Optional[int]) -> date:
+    """Último día del periodo (año, año+mes o año+mes+día)."""
+    if mes is None:
+        return date(anio, 12, 31)
+    if dia is None:
+        siguiente = date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+        return siguiente - timedelta(days=1)
+    return date(anio, mes, dia)
+
+
+def periodo_cerrado(anio: Optional[int], mes: Optional[int] = None, dia: Optional[int] = None) -> bool:
+    """True si el periodo terminó antes de hoy. Sin año (todos los años) nunca está cerrado."""
+    if anio is None:
+        return False
+    try:
+        return _fin_periodo(anio, mes, dia) < date.today()
+    except ValueError:
+        # Fecha inválida (p. ej. 31 de febrero): no se guarda de forma permanente.
+        return False
+
+
+class CacheReportes:
+    def __init__(
+        self,
+        directorio: str = REPORTES_CACHE_DIR,
+        ttl: float = REPORTES_CACHE_TTL_SEGUNDOS,
+        max_entradas: int = REPORTES_CACHE_MAX_ENTRADAS,
+    ):
+        self.directorio = directorio
+        self.ttl = ttl
+        self.max_entradas = max_entradas
+        # llave -> (valor, expira_en o None si es permanente), de menos a más reciente
+        self._memoria: OrderedDict = OrderedDict()
+        self._proximo_barrido = time.monotonic() + ttl
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _llave(reporte: str, params: dict) -> str:
+        return reporte + ":" + json.dumps(params, sort_keys=True, default=str)
+
+    def _ruta(self, llave: str) -> str:
+        nombre = hashlib.sha1(llave.encode("utf-8")).hexdigest() + ".json"
+        return os.path.join(self.directorio, nombre)
+
+    def obtener(self, reporte: str, params: dict) -> Any:
+        """Valor guardado o `None` si no hay entrada vigente."""
+        llave = self._llave(reporte, params)
+        with self._lock:
+            entrada = self._memoria.get(llave)
+            if entrada is not None:
+                self._memoria.move_to_end(llave)
+        if entrada is not None:
+            valor, expira = entrada
+            if expira is None:
+                # Otro proceso pudo haber invalidado la entrada borrando el archivo.
+                if os.path.exists(self._ruta(llave)):
+                    return valor
+            elif expira > time.monotonic():
+                return valor
+            with self._lock:
+                self._memoria.pop(llave, None)
+            return None
+
+        valor = self._leer_disco(llave)
+        if valor is _SIN_VALOR:
+            return None
+        self._recordar(llave, valor, None)
+        return valor
+
+    def guardar(self, reporte: str, params: dict, valor: Any, permanente: bool) -> None:
+        """`permanente` guarda en disco sin expiración. Un resultado vacío nunca es
+        permanente: sería cualquier año que el cliente pida sin ventas, y el disco
+        crecería sin límite; esos viven en memoria con TTL como el periodo abierto."""
+        llave = self._llave(reporte, params)
+        if permanente and valor:
+            self._escribir_disco(llave, valor)
+            expira = None
+        else:
+            expira = time.monotonic() + self.ttl
+        self._recordar(llave, valor, expira)
+
+    def _recordar(self, llave: str, valor: Any, expira: Optional[float]) -> None:
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora >= self._proximo_barrido:
+                # Las entradas con TTL que nadie vuelve a pedir no se leen nunca más.
+                for vencida in [k for k, (_, exp) in self._memoria.items() if exp is not None and exp <= ahora]:
+                    del self._memoria[vencida]
+                self._proximo_barrido = ahora + self.ttl
+            self._memoria[llave] = (valor, expira)
+            self._memoria.move_to_end(llave)
+            while len(self._memoria) > self.max_entradas:
+                self._memoria.popitem(last=False)
+
+    def invalidar(self, reporte: str, params: dict) -> None:
+        llave = self._llave(reporte, params)
+        with self._lock:
+            self._memoria.pop(llave, None)
+        try:
+            os.remove(self._ruta(llave))
+        except FileNotFoundError:
+            pass
+
+    def invalidar_fecha(self, fecha) -> None:
+        """Invalida los reportes de ventas del año, mes y día de `fecha` (y el del
+        mismo día de cualquier mes del año, `mes=None` con `dia`)."""
+        if fecha is None:
+            return
+        if isinstance(fecha, str):
+            # Los DTO de pedidos asignan la fecha como texto antes del flush.
+            fecha = datetime.fromisoformat(fecha)
+        if isinstance(fecha, datetime):
+            fecha = fecha.date()
+        for params in (
+            {"anio": fecha.year, "mes": None, "dia": None},
+            {"anio": fecha.year, "mes": fecha.month, "dia": None},
+            {"anio": fecha.year, "mes": None, "dia": fecha.day},
+            {"anio": fecha.year, "mes": fecha.month, "dia": fecha.day},
+        ):
+            self.invalidar("ventas", params)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._memoria.clear()
+        if os.path.isdir(self.directorio):
+            for nombre in os.listdir(self.directorio):
+                if nombre.endswith(".json"):
+                    os.remove(os.path.join(self.directorio, nombre))
+
+    def _leer_disco(self, llave: str) -> Any:
+        try:
+            with open(self._ruta(llave), encoding="utf-8") as f:
+                contenido = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return _SIN_VALOR
+        # Protección ante colisiones de hash: se compara la llave completa.
+        if contenido.get("llave") != llave:
+            return _SIN_VALOR
+        return contenido.get("valor")
+
+    def _escribir_disco(self, llave: str, valor: Any) -> None:
+        os.makedirs(self.directorio, exist_ok=True)
+        ruta = self._ruta(llave)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({"llave": llave, "valor": valor}, f)
+        # Reemplazo atómico: un lector nunca ve un archivo a medio escribir.
+        os.replace(temporal, ruta)
+
+
+cache_reportes = CacheReportes()
+
+
+def _fechas_afectadas(session: Session) -> set:
+    fechas = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Pedido):
+            fechas.add(obj.fecha_pedido)
+            # Si se cambió la fecha del pedido también cambia el periodo anterior.
+            # Si el objeto estaba expirado el historial no trae el valor viejo; como
+            # aún no se hizo el flush, la base todavía lo tiene.
+            estado = inspect(obj)
+            historial = estado.attrs.fecha_pedido.history
+            if historial.deleted:
+                fechas.update(historial.deleted)
+            elif historial.added and estado.persistent:
+                fechas.add(session.scalar(select(Pedido.fecha_pedido).where(Pedido.id_pedido == obj.id_pedido)))
+        elif isinstance(obj, DetallePedido) and obj.pedido_id is not None:
+            pedido = session.get(Pedido, obj.pedido_id)
+            if pedido is not None:
+                fechas.add(pedido.fecha_pedido)
+    fechas.discard(None)
+    return fechas
+
+
+def registrar_invalidacion() -> None:
+    """Escucha los flush de todas las sesiones y, tras el commit, invalida los
+    reportes de las fechas de los pedidos tocados (altas, ediciones y bajas)."""
+
+    @event.listens_for(Session, "before_flush")
+    def _recolectar(session, flush_context, instances):
+        fechas = _fechas_afectadas(session)
+        if fechas:
+            session.info.setdefault("fechas_reportes", set()).update(fechas)
+
+    @event.listens_for(Session, "after_commit")
+    def _invalidar(session):
+        for fecha in session.info.pop("fechas_reportes", ()):
+            cache_reportes.invalidar_fecha(fecha)
+
+    @event.listens_for(Session, "after_rollback")
+    def _descartar(session):
+        session.info.pop("fechas_reportes", None)
+
+
+registrar_invalidacion()
@@ -0,0 +1,55 @@
+"""
+Mantenimiento del acumulado `calificaciones_producto`.
+
+`ajustar_calificacion` aplica el cambio de una reseña (alta, edición o baja) con un
+único UPDATE relativo, dentro de la misma transacción que modifica la reseña, así
+que dos reseñas simultáneas del mismo producto no se pisan.
+"""
+
+from typing import Optional
+
+from sqlalchemy import insert, update
+
+from models.calificacion_producto import CalificacionProducto
+
+CALIFICACIONES = range(1, 6)
+
+
+def _columna(calificacion: int) -> str:
+    return f"estrellas_{calificacion}"
+
+
+def ajustar_calificacion(db, producto_id: int, anterior: Optional[int], nueva: Optional[int]) -> None:
+    """Quita `anterior` (si hay) y suma `nueva` (si hay) al acumulado del producto.
+    Valores fuera de 1-5 (datos antiguos) no cuentan en el acumulado. No hace commit."""
+    anterior = anterior if anterior in CALIFICACIONES else None
+    nueva = nueva if nueva in CALIFICACIONES else None
+    if anterior == nueva:
+        return
+    cambios = {"total": 0, "suma": 0}
+    if anterior is not None:
+        cambios["total"] -= 1
+        cambios["suma"] -= anterior
+        cambios[_columna(anterior)] = cambios.get(_columna(anterior), 0) - 1
+    if nueva is not None:
+        cambios["total"] += 1
+        cambios["suma"] += nueva
+        cambios[_columna(nueva)] = cambios.get(_columna(nueva), 0) + 1
+
+    if db.get_bind().dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(CalificacionProducto).values(producto_id=producto_id, **cambios)
+        db.execute(stmt.on_duplicate_key_update(**{
+            col: getattr(CalificacionProducto, col) + getattr(stmt.inserted, col) for col in cambios
+        }))
+        return
+
+    # Otros motores (desarrollo/pruebas): UPDATE y, si no existía la fila, INSERT.
+    result = db.execute(
+        update(CalificacionProducto)
+        .where(CalificacionProducto.producto_id == producto_id)
+        .values({col: getattr(CalificacionProducto, col) + delta for col, delta in cambios.items()})
+    )
+    if result.rowcount == 0:
+        db.execute(insert(CalificacionProducto).values(producto_id=producto_id, **cambios))
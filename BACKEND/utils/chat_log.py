@@ -0,0 +1,230 @@
+"""
+Buffered writer for the bot's `chat` log rows.
+
+Requests only append the row to an in-memory queue; a background thread writes the
+queue with one multi-row INSERT per batch, as soon as `CHAT_LOG_BATCH_SIZE` rows are
+pending or at most every `CHAT_LOG_FLUSH_MS`. `close()` (called on app shutdown and at
+interpreter exit) writes whatever is still queued.
+
+The queue holds at most `CHAT_LOG_QUEUE_MAX` rows. When it is full (e.g. the database
+is down) `CHAT_LOG_OVERFLOW` decides what happens to a new row:
+
+- "drop_oldest": discard the oldest queued row to make room (default);
+- "drop_newest": discard the new row;
+- "block": wait up to `CHAT_LOG_BLOCK_MS` for room, then discard the new row.
+
+Async handlers call `enqueue_async`: under "block" (and during shutdown, when rows
+are written directly) the call may wait, so it runs in the threadpool instead of on
+the event loop. Dropped rows are counted in `stats()`. A failed write is put back at the front of the
+queue (as far as the bound allows) and retried after one flush interval.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+
+from config import (
+    CHAT_LOG_BATCH_SIZE,
+    CHAT_LOG_BLOCK_MS,
+    CHAT_LOG_FLUSH_MS,
+    CHAT_LOG_OVERFLOW,
+    CHAT_LOG_QUEUE_MAX,
+)
+from db.session import SessionLocal
+from models.chatbox import Chat
+
+logger = logging.getLogger("chat_log")
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class ChatLogWriter:
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        batch_size: int = CHAT_LOG_BATCH_SIZE,
+        flush_ms: float = CHAT_LOG_FLUSH_MS,
+        max_queue: int = CHAT_LOG_QUEUE_MAX,
+        overflow: str = CHAT_LOG_OVERFLOW,
+        block_ms: float = CHAT_LOG_BLOCK_MS,
+    ):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"CHAT_LOG_OVERFLOW must be one of {OVERFLOW_POLICIES}")
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_seconds = flush_ms / 1000.0
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.block_seconds = block_ms / 1000.0
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closing = False
+        # Rows taken by the writer thread and not yet committed
+        self._in_flight = 0
+        self._flush_now = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.batches = 0
+
+    # --- Producer side ---
+
+    def enqueue(self, usuario_origen, usuario_destino, mensaje) -> bool:
+        """Queue one chat row (only for logged-in users). False if it was dropped."""
+        if not (usuario_origen or usuario_destino):
+            return False
+        row = {
+            "usuario_origen": usuario_origen,
+            "usuario_destino": usuario_destino,
+            "mensaje": mensaje,
+            "fecha_envio": datetime.now(),
+        }
+        with self._cond:
+            closing = self._closing
+        if closing:
+            # Late writes during shutdown go straight to the database.
+            return self._write([row])
+        with self._cond:
+            self._ensure_thread()
+            if len(self._pending) >= self.max_queue:
+                if self.overflow == "drop_oldest":
+                    self._pending.popleft()
+                    self.dropped += 1
+                elif self.overflow == "block" and self._cond.wait_for(
+                    lambda: len(self._pending) < self.max_queue, timeout=self.block_seconds
+                ):
+                    pass
+                else:
+                    self.dropped += 1
+                    return False
+            self._pending.append(row)
+            self.enqueued += 1
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    async def enqueue_async(self, usuario_origen, usuario_destino, mensaje) -> bool:
+        """`enqueue` for async handlers: never waits on the event loop."""
+        if self.overflow == "block" or self._closing:
+            return await run_in_threadpool(self.enqueue, usuario_origen, usuario_destino, mensaje)
+        return self.enqueue(usuario_origen, usuario_destino, mensaje)
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="chat-log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    # --- Writer thread ---
+
+    def _take_batch(self) -> list:
+        n = min(len(self._pending), self.batch_size)
+        batch = [self._pending.popleft() for _ in range(n)]
+        self._in_flight = n
+        if batch:
+            # Wake producers waiting for room ("block" policy).
+            self._cond.notify_all()
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: len(self._pending) >= self.batch_size or self._closing or self._flush_now,
+                    timeout=self.flush_seconds,
+                )
+                self._flush_now = False
+                batch = self._take_batch()
+                closing = self._closing
+            ok = not batch or self._write(batch)
+            if not ok and closing:
+                with self._cond:
+                    lost = len(batch) + len(self._pending)
+                    self._pending.clear()
+                    self._in_flight = 0
+                    self.dropped += lost
+                logger.error("Chat log: database unavailable at shutdown, %d rows lost", lost)
+                return
+            if not ok:
+                self._requeue(batch)
+                time.sleep(self.flush_seconds)
+                continue
+            with self._cond:
+                self._in_flight = 0
+            if closing:
+                with self._cond:
+                    if not self._pending:
+                        return
+
+    def _write(self, batch: list) -> bool:
+        db = self.session_factory()
+        try:
+            # executemany of one statement: a multi-row INSERT on MySQL
+            db.execute(insert(Chat), batch)
+            db.commit()
+            self.written += len(batch)
+            self.batches += 1
+            return True
+        except Exception:
+            db.rollback()
+            self.failed_flushes += 1
+            logger.exception("Chat log: failed to write %d rows", len(batch))
+            return False
+        finally:
+            db.close()
+
+    def _requeue(self, batch: list) -> None:
+        with self._cond:
+            room = self.max_queue - len(self._pending)
+            keep = batch[:max(room, 0)]
+            self.dropped += len(batch) - len(keep)
+            self._pending.extendleft(reversed(keep))
+            self._in_flight = 0
+
+    # --- Lifecycle ---
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is committed. False on timeout."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._cond:
+                if not self._pending and not self._in_flight:
+                    return True
+                # Wake the writer now instead of at the end of the interval.
+                self._flush_now = True
+                self._cond.notify_all()
+            time.sleep(0.005)
+        return False
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Write the remaining rows and stop the writer thread (idempotent)."""
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queued": len(self._pending),
+                "max_queue": self.max_queue,
+                "overflow": self.overflow,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "batches": self.batches,
+                "dropped": self.dropped,
+                "failed_flushes": self.failed_flushes,
+            }
+
+
+chat_log = ChatLogWriter()
@@ -0,0 +1,162 @@
+"""
+Materialización `cliente_producto_comprado`: qué productos compró cada cliente.
+
+- `registrar_compra` suma una línea de pedido a la tabla y `quitar_compra` la
+  descuenta; se llaman dentro de la transacción que escribe la línea (ver
+  `api/compra.py` y `utils/acumulados_pedidos.py`).
+- `ha_comprado` responde con una búsqueda por llave primaria, con una caché en
+  memoria de los pares ya confirmados. Solo se cachean los positivos: una compra
+  solo deja de existir si se borran sus líneas (raro; los demás procesos lo ven
+  cuando el par sale de su LRU), pero un "no" puede cambiar en cualquier momento (y
+  en otro proceso), así que siempre se vuelve a consultar.
+- `reconstruir_compras_cliente` recalcula la tabla desde los pedidos vivos y
+  archivados.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, union_all, update
+
+from config import COMPRAS_CACHE_MAX
+from models.cliente_producto_comprado import ClienteProductoComprado
+from models.detallepedido import DetallePedido
+from models.detallepedido_archivo import DetallePedidoArchivo
+from models.pedido import Pedido
+from models.pedido_archivo import PedidoArchivo
+from models.producto import Producto
+
+
+class CacheCompras:
+    """Conjunto LRU acotado de pares (cliente_id, producto_id) comprados."""
+
+    def __init__(self, maximo: int = COMPRAS_CACHE_MAX):
+        self.maximo = maximo
+        self._pares = OrderedDict()
+        self._lock = threading.Lock()
+
+    def contiene(self, cliente_id: int, producto_id: int) -> bool:
+        par = (cliente_id, producto_id)
+        with self._lock:
+            if par in self._pares:
+                self._pares.move_to_end(par)
+                return True
+        return False
+
+    def agregar(self, cliente_id: int, producto_id: int) -> None:
+        par = (cliente_id, producto_id)
+        with self._lock:
+            self._pares[par] = True
+            self._pares.move_to_end(par)
+            while len(self._pares) > self.maximo:
+                self._pares.popitem(last=False)
+
+    def quitar(self, cliente_id: int, producto_id: int) -> None:
+        with self._lock:
+            self._pares.pop((cliente_id, producto_id), None)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._pares.clear()
+
+
+cache_compras = CacheCompras()
+
+
+def registrar_compra(db, cliente_id: int, producto_id: int, fecha: datetime) -> None:
+    """Marca que `cliente_id` compró `producto_id`. No hace commit."""
+    if db.get_bind().dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(ClienteProductoComprado).values(
+            cliente_id=cliente_id, producto_id=producto_id, primera_fecha=fecha, veces=1
+        )
+        db.execute(stmt.on_duplicate_key_update(
+            primera_fecha=func.least(ClienteProductoComprado.primera_fecha, stmt.inserted.primera_fecha),
+            veces=ClienteProductoComprado.veces + 1,
+        ))
+        return
+
+    # Otros motores (desarrollo/pruebas): UPDATE y, si no existía la fila, INSERT.
+    result = db.execute(
+        update(ClienteProductoComprado)
+        .where(
+            ClienteProductoComprado.cliente_id == cliente_id,
+            ClienteProductoComprado.producto_id == producto_id,
+        )
+        .values(veces=ClienteProductoComprado.veces + 1)
+    )
+    if result.rowcount == 0:
+        db.execute(insert(ClienteProductoComprado).values(
+            cliente_id=cliente_id, producto_id=producto_id, primera_fecha=fecha, veces=1
+        ))
+
+
+def quitar_compra(db, cliente_id: int, producto_id: int) -> None:
+    """Descuenta una línea; el par se borra si no le quedan compras. No hace commit."""
+    donde = (
+        ClienteProductoComprado.cliente_id == cliente_id,
+        ClienteProductoComprado.producto_id == producto_id,
+    )
+    db.execute(update(ClienteProductoComprado).where(*donde).values(veces=ClienteProductoComprado.veces - 1))
+    db.execute(delete(ClienteProductoComprado).where(*donde, ClienteProductoComprado.veces <= 0))
+    cache_compras.quitar(cliente_id, producto_id)
+
+
+def ha_comprado(db, cliente_id: int, producto_id: int) -> bool:
+    if cache_compras.contiene(cliente_id, producto_id):
+        return True
+    existe = db.execute(
+        select(ClienteProductoComprado.veces).where(
+            ClienteProductoComprado.cliente_id == cliente_id,
+            ClienteProductoComprado.producto_id == producto_id,
+        )
+    ).first()
+    if existe is None:
+        return False
+    cache_compras.agregar(cliente_id, producto_id)
+    return True
+
+
+def productos_comprados(db, cliente_id: int) -> list:
+    """[(id, nombre)] de los productos que compró el cliente (prefijo de la llave primaria)."""
+    return (
+        db.query(Producto.id, Producto.nombre)
+        .join(ClienteProductoComprado, ClienteProductoComprado.producto_id == Producto.id)
+        .filter(ClienteProductoComprado.cliente_id == cliente_id)
+        .order_by(ClienteProductoComprado.primera_fecha.desc())
+        .all()
+    )
+
+
+def reconstruir_compras_cliente(db) -> int:
+    """Recalcula la tabla completa. Devuelve el número de pares escritos."""
+    lineas = [
+        select(
+            pedido_modelo.cliente_id.label("cliente_id"),
+            detalle_modelo.producto_id.label("producto_id"),
+            pedido_modelo.fecha_pedido.label("fecha"),
+        )
+        .join(pedido_modelo, detalle_modelo.pedido_id == pedido_modelo.id_pedido)
+        .where(pedido_modelo.cliente_id.isnot(None), detalle_modelo.producto_id.isnot(None))
+        for pedido_modelo, detalle_modelo in ((Pedido, DetallePedido), (PedidoArchivo, DetallePedidoArchivo))
+    ]
+    todas = union_all(*lineas).subquery()
+    agregado = (
+        select(todas.c.cliente_id, todas.c.producto_id, func.min(todas.c.fecha), func.count())
+        .group_by(todas.c.cliente_id, todas.c.producto_id)
+    )
+    try:
+        db.execute(delete(ClienteProductoComprado))
+        result = db.execute(
+            insert(ClienteProductoComprado).from_select(
+                ["cliente_id", "producto_id", "primera_fecha", "veces"], agregado
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    cache_compras.limpiar()
+    return result.rowcount
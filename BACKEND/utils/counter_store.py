@@ -0,0 +1,273 @@
+"""
+Contadores con expiración para los limitadores (bloqueo de login, rate limit por IP).
+
+Interfaz `CounterStore`:
+- `incr(key, ttl)`: suma al contador y devuelve (valor, expira_en). Si la llave no
+  existe o ya expiró empieza de cero con expiración `ttl` segundos desde ahora (ventana
+  fija desde el primer golpe).
+- `get(key)`, `set(key, valor, ttl)`, `delete(key)` y `sweep()` (borra lo expirado).
+- `throttle(key, interval, burst)`: limitador GCRA (token bucket). Por llave se guarda
+  solo el "theoretical arrival time" (TAT): cada solicitud lo corre `interval` segundos
+  y se rechaza si quedaría más de `burst * interval` segundos por delante de ahora. La
+  llave expira sola al llegar a su TAT (entonces equivale a un bucket lleno).
+
+Backends (`COUNTER_STORE`):
+- "memory": `MemoryCounterStore`, diccionarios repartidos en shards con su propio lock;
+  lo expirado se barre por shard cada `COUNTER_STORE_SWEEP_SECONDS` y cada shard guarda
+  como máximo `COUNTER_STORE_MAX_KEYS / shards` llaves (se descarta la más antigua).
+  Solo vale para un proceso.
+- "sqlite" (por defecto): `SQLiteCounterStore`, un archivo SQLite en modo WAL
+  (`COUNTER_STORE_PATH`) compartido por todos los workers de uvicorn de la máquina; el
+  incremento es un único UPSERT atómico. Si el archivo no se puede abrir se usa memoria.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Optional, Tuple
+
+from config import (
+    COUNTER_STORE,
+    COUNTER_STORE_MAX_KEYS,
+    COUNTER_STORE_PATH,
+    COUNTER_STORE_SWEEP_SECONDS,
+)
+
+logger = logging.getLogger("counter_store")
+
+
+class CounterStore:
+    def incr(self, key: str, ttl: float, amount: int = 1) -> Tuple[int, float]:
+        raise NotImplementedError
+
+    def get(self, key: str) -> Tuple[int, Optional[float]]:
+        """(valor, expira_en) o (0, None) si la llave no existe o expiró."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: int, ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        """Borra las llaves expiradas. Devuelve cuántas borró."""
+        raise NotImplementedError
+
+    def throttle(self, key: str, interval: float, burst: int) -> Tuple[bool, float]:
+        """(permitida, segundos hasta que se permita la siguiente si no lo fue)."""
+        raise NotImplementedError
+
+
+class _Shard:
+    __slots__ = ("lock", "data", "next_sweep")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # llave -> [valor, expira_en], en orden de creación
+        self.data = {}
+        self.next_sweep = 0.0
+
+
+class MemoryCounterStore(CounterStore):
+    def __init__(
+        self,
+        shards: int = 16,
+        max_keys: int = COUNTER_STORE_MAX_KEYS,
+        sweep_seconds: float = COUNTER_STORE_SWEEP_SECONDS,
+    ):
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+        self.max_keys_per_shard = max(1, max_keys // len(self._shards))
+        self.sweep_seconds = sweep_seconds
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[zlib.crc32(key.encode("utf-8")) % len(self._shards)]
+
+    @staticmethod
+    def _sweep_shard(shard: _Shard, now: float) -> int:
+        expiradas = [k for k, (_v, exp) in shard.data.items() if exp <= now]
+        for k in expiradas:
+            del shard.data[k]
+        return len(expiradas)
+
+    def _maintain(self, shard: _Shard, now: float) -> None:
+        """Barrido periódico y tope de llaves (se llama con el lock del shard)."""
+        if now >= shard.next_sweep:
+            self._sweep_shard(shard, now)
+            shard.next_sweep = now + self.sweep_seconds
+        while len(shard.data) > self.max_keys_per_shard:
+            del shard.data[next(iter(shard.data))]
+
+    def incr(self, key: str, ttl: float, amount: int = 1) -> Tuple[int, float]:
+        now = time.time()
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.data.get(key)
+            if entry is None or entry[1] <= now:
+                shard.data.pop(key, None)
+                entry = shard.data[key] = [0, now + ttl]
+                self._maintain(shard, now)
+            entry[0] += amount
+            return entry[0], entry[1]
+
+    def get(self, key: str) -> Tuple[int, Optional[float]]:
+        now = time.time()
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.data.get(key)
+            if entry is None:
+                return 0, None
+            if entry[1] <= now:
+                del shard.data[key]
+                return 0, None
+            return entry[0], entry[1]
+
+    def set(self, key: str, value: int, ttl: float) -> None:
+        now = time.time()
+        shard = self._shard(key)
+        with shard.lock:
+            shard.data.pop(key, None)
+            shard.data[key] = [value, now + ttl]
+            self._maintain(shard, now)
+
+    def delete(self, key: str) -> None:
+        shard = self._shard(key)
+        with shard.lock:
+            shard.data.pop(key, None)
+
+    def sweep(self) -> int:
+        now = time.time()
+        borradas = 0
+        for shard in self._shards:
+            with shard.lock:
+                borradas += self._sweep_shard(shard, now)
+                shard.next_sweep = now + self.sweep_seconds
+        return borradas
+
+    def throttle(self, key: str, interval: float, burst: int) -> Tuple[bool, float]:
+        now = time.time()
+        limit = burst * interval
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.data.get(key)
+            tat = max(entry[0], now) if entry is not None else now
+            if tat + interval - now > limit:
+                return False, tat + interval - now - limit
+            if entry is None:
+                shard.data[key] = [tat + interval, tat + interval]
+                self._maintain(shard, now)
+            else:
+                entry[0] = entry[1] = tat + interval
+            return True, 0.0
+
+    def __len__(self) -> int:
+        return sum(len(s.data) for s in self._shards)
+
+
+class SQLiteCounterStore(CounterStore):
+    def __init__(self, path: str = COUNTER_STORE_PATH, sweep_seconds: float = COUNTER_STORE_SWEEP_SECONDS):
+        self.path = path
+        self.sweep_seconds = sweep_seconds
+        self._local = threading.local()
+        self._next_sweep = 0.0
+        directorio = os.path.dirname(path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters ("
+            " key TEXT PRIMARY KEY, value INTEGER NOT NULL, expires_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_counters_expires_at ON counters (expires_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS throttles (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_throttles_tat ON throttles (tat)")
+
+    def _conn(self) -> sqlite3.Connection:
+        # Una conexión por hilo; autocommit (cada sentencia es su propia transacción).
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_seconds
+            self.sweep()
+
+    def incr(self, key: str, ttl: float, amount: int = 1) -> Tuple[int, float]:
+        now = time.time()
+        self._maybe_sweep(now)
+        row = self._conn().execute(
+            "INSERT INTO counters (key, value, expires_at) VALUES (:key, :amount, :exp) "
+            "ON CONFLICT(key) DO UPDATE SET "
+            " value = CASE WHEN expires_at <= :now THEN :amount ELSE value + :amount END,"
+            " expires_at = CASE WHEN expires_at <= :now THEN :exp ELSE expires_at END "
+            "RETURNING value, expires_at",
+            {"key": key, "amount": amount, "exp": now + ttl, "now": now},
+        ).fetchone()
+        return row[0], row[1]
+
+    def get(self, key: str) -> Tuple[int, Optional[float]]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    def set(self, key: str, value: int, ttl: float) -> None:
+        now = time.time()
+        self._maybe_sweep(now)
+        self._conn().execute(
+            "INSERT INTO counters (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value, now + ttl),
+        )
+
+    def delete(self, key: str) -> None:
+        self._conn().execute("DELETE FROM counters WHERE key = ?", (key,))
+
+    def sweep(self) -> int:
+        now = time.time()
+        conn = self._conn()
+        return (
+            conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,)).rowcount
+            + conn.execute("DELETE FROM throttles WHERE tat <= ?", (now,)).rowcount
+        )
+
+    def throttle(self, key: str, interval: float, burst: int) -> Tuple[bool, float]:
+        now = time.time()
+        self._maybe_sweep(now)
+        limit = burst * interval
+        conn = self._conn()
+        # Un solo UPSERT atómico: solo avanza el TAT (y devuelve fila) si se permite.
+        row = conn.execute(
+            "INSERT INTO throttles (key, tat) VALUES (:key, :now + :interval) "
+            "ON CONFLICT(key) DO UPDATE SET tat = max(tat, :now) + :interval "
+            "WHERE max(tat, :now) + :interval - :now <= :limit "
+            "RETURNING tat",
+            {"key": key, "now": now, "interval": interval, "limit": limit},
+        ).fetchone()
+        if row is not None:
+            return True, 0.0
+        row = conn.execute("SELECT tat FROM throttles WHERE key = ?", (key,)).fetchone()
+        tat = max(row[0], now) if row else now
+        return False, max(0.0, tat + interval - now - limit)
+
+
+def create_store(backend: str = COUNTER_STORE) -> CounterStore:
+    if backend == "sqlite":
+        try:
+            return SQLiteCounterStore()
+        except (OSError, sqlite3.Error):
+            logger.exception("No se pudo abrir %s; los contadores quedan en memoria", COUNTER_STORE_PATH)
+    elif backend != "memory":
+        raise ValueError("COUNTER_STORE debe ser 'memory' o 'sqlite'")
+    return MemoryCounterStore()
+
+
+counter_store = create_store()
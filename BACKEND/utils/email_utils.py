@@ -379,6 +379,23 @@ def enviar_cambio_estado_pedido(correo, pedido_id, nuevo_estado):
     return _send_email_message(correo, asunto, texto, html, purpose='estado_pedido')
 
 
+def enviar_cambios_estado_pedidos(notificaciones):
+    """Envía en serie los avisos de cambio de estado de un lote de pedidos.
+
+    `notificaciones` es una lista de tuplas (correo, pedido_id, nuevo_estado).
+    Pensado para ejecutarse en un hilo aparte: un fallo en un correo no detiene el resto.
+    """
+    enviados = 0
+    for correo, pedido_id, nuevo_estado in notificaciones:
+        try:
+            if enviar_cambio_estado_pedido(correo, pedido_id, nuevo_estado):
+                enviados += 1
+        except Exception as e:
+            print(f"[ESTADO_PEDIDO] Error enviando aviso del pedido #{pedido_id} a {correo}: {e}")
+    print(f"[ESTADO_PEDIDO] Lote terminado: {enviados}/{len(notificaciones)} correos enviados")
+    return enviados
+
+
 def enviar_recuperacion_contrasena(destinatario, nueva_contrasena):
     settings = _get_email_settings()
     if not settings: 
@@ -1,12 +1,41 @@
+"""
+JWT helpers.
+
+- `verify_token` remembers already verified tokens (LRU keyed by the token's SHA-256,
+  each entry valid until the token's `exp`), so protected calls do not re-check the
+  HS256 signature on every request.
+- Logout and refresh rotation revoke tokens (`revoke_token`). Revocations are stored in
+  `revoked_tokens` and mirrored in an in-memory Bloom filter: a token the filter has
+  never seen (almost every token) is accepted without touching the database; a filter
+  hit is confirmed once against the table and the answer remembered. Each worker picks
+  up the revocations made by the others every `JWT_REVOCATION_RELOAD_SECONDS`.
+"""
+
+import hashlib
+import logging
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from typing import Optional
+
 from jose import JWTError, jwt
+from sqlalchemy.exc import IntegrityError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 import os
 from dotenv import load_dotenv
 
+from config import JWT_CACHE_MAX, JWT_REVOCATION_CAPACITY, JWT_REVOCATION_RELOAD_SECONDS
+from db.session import SessionLocal
+from models.revoked_token import RevokedToken
+
 load_dotenv()
 
+logger = logging.getLogger("jwt_utils")
+
 # Load JWT secret from environment. Accept either `JWT_SECRET_KEY` (preferred) or legacy `SECRET_KEY`.
 SECRET_KEY = os.getenv("JWT_SECRET_KEY") or os.getenv("SECRET_KEY")
 if not SECRET_KEY:
@@ -21,31 +50,274 @@ REFRESH_TOKEN_EXPIRE_DAYS = 7
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="usuarios/login")
 
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class TokenCache:
+    """LRU map token hash -> verified payload; entries expire at the token's `exp`."""
+
+    def __init__(self, max_entries: int = JWT_CACHE_MAX):
+        self.max_entries = max_entries
+        # key -> (payload, exp timestamp)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, payload: dict) -> None:
+        if self.max_entries <= 0 or not isinstance(payload.get("exp"), (int, float)):
+            return
+        with self._lock:
+            self._entries[key] = (payload, payload["exp"])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class BloomFilter:
+    """Bloom filter over SHA-256 hex keys (double hashing on the digest)."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        self.size = max(1024, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = bytes.fromhex(key)
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RevocationList:
+    # Expired rows are purged and the filter rebuilt at most this often
+    REBUILD_SECONDS = 3600
+    # Filter hits already confirmed against the table (key -> revoked)
+    MAX_CONFIRMED = 10000
+
+    def __init__(
+        self,
+        session_factory=SessionLocal,
+        capacity: int = JWT_REVOCATION_CAPACITY,
+        reload_seconds: float = JWT_REVOCATION_RELOAD_SECONDS,
+    ):
+        self.session_factory = session_factory
+        self.capacity = capacity
+        self.reload_seconds = reload_seconds
+        self._bloom = None
+        self._confirmed = OrderedDict()
+        self._lock = threading.Lock()
+        # Held during the first load, so concurrent callers wait for a filter.
+        self._load_lock = threading.Lock()
+        self._next_reload = 0.0
+        self._next_rebuild = 0.0
+        self._last_seen = None
+        self.db_checks = 0
+        self.filter_hits = 0
+
+    # --- Loading ---
+
+    def _rebuild(self, db, now: datetime) -> None:
+        db.query(RevokedToken).filter(RevokedToken.expires_at <= now).delete(synchronize_session=False)
+        db.commit()
+        bloom = BloomFilter(max(self.capacity, 1))
+        last_seen = None
+        for key, revoked_at in db.query(RevokedToken.token_hash, RevokedToken.revoked_at):
+            bloom.add(key)
+            last_seen = revoked_at if last_seen is None or revoked_at > last_seen else last_seen
+        self._bloom = bloom
+        self._last_seen = last_seen or now
+
+    def _load_new(self, db, now: datetime) -> None:
+        # The margin covers rows committed late by other workers; re-adding is harmless.
+        since = self._last_seen - timedelta(seconds=self.reload_seconds)
+        for key, revoked_at in db.query(RevokedToken.token_hash, RevokedToken.revoked_at).filter(
+            RevokedToken.revoked_at > since
+        ):
+            self._bloom.add(key)
+            if revoked_at > self._last_seen:
+                self._last_seen = revoked_at
+            with self._lock:
+                if key in self._confirmed:
+                    self._confirmed[key] = True
+
+    def _refresh(self) -> None:
+        mono = time.monotonic()
+        if self._bloom is None:
+            with self._load_lock:
+                if self._bloom is None:
+                    self._next_reload = mono + self.reload_seconds
+                    self._load(mono)
+            return
+        if mono < self._next_reload:
+            return
+        with self._lock:
+            if mono < self._next_reload:
+                return
+            self._next_reload = mono + self.reload_seconds
+        self._load(mono)
+
+    def _load(self, mono: float) -> None:
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            if self._bloom is None or mono >= self._next_rebuild or self._bloom.count > self.capacity:
+                self._rebuild(db, now)
+                self._next_rebuild = mono + self.REBUILD_SECONDS
+            else:
+                self._load_new(db, now)
+        except Exception:
+            db.rollback()
+            logger.exception("Could not load revoked tokens")
+            if self._bloom is None:
+                # Keep working with what this worker revokes until the table is reachable.
+                self._bloom = BloomFilter(max(self.capacity, 1))
+                self._last_seen = now
+        finally:
+            db.close()
+
+    def _remember(self, key: str, revoked: bool) -> None:
+        with self._lock:
+            self._confirmed[key] = revoked
+            self._confirmed.move_to_end(key)
+            while len(self._confirmed) > self.MAX_CONFIRMED:
+                self._confirmed.popitem(last=False)
+
+    # --- API ---
+
+    def is_revoked(self, key: str) -> bool:
+        self._refresh()
+        bloom = self._bloom
+        if bloom is None or key not in bloom:
+            return False
+        self.filter_hits += 1
+        with self._lock:
+            known = self._confirmed.get(key)
+        if known is not None:
+            return known
+        db = self.session_factory()
+        try:
+            self.db_checks += 1
+            revoked = db.get(RevokedToken, key) is not None
+        except Exception:
+            # The filter says it may be revoked and the table cannot tell: refuse it.
+            logger.exception("Could not check a revoked token")
+            return True
+        finally:
+            db.close()
+        self._remember(key, revoked)
+        return revoked
+
+    def revoke(self, key: str, exp: float) -> None:
+        self._refresh()
+        now = datetime.utcnow()
+        db = self.session_factory()
+        try:
+            db.merge(RevokedToken(token_hash=key, expires_at=datetime.utcfromtimestamp(exp), revoked_at=now))
+            db.commit()
+        except IntegrityError:
+            # Revoked concurrently (e.g. a double logout): the row is already there.
+            db.rollback()
+        finally:
+            db.close()
+        if self._bloom is not None:
+            self._bloom.add(key)
+        self._remember(key, True)
+
+    def stats(self) -> dict:
+        return {
+            "filter_entries": self._bloom.count if self._bloom is not None else 0,
+            "filter_hits": self.filter_hits,
+            "db_checks": self.db_checks,
+        }
+
+
+token_cache = TokenCache()
+revoked_tokens = RevocationList()
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # `jti` makes every token unique, so revoking one session never revokes another.
+    to_encode.update({"exp": expire, "type": "access", "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def create_refresh_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "type": "refresh", "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 def verify_token(token: str):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+    key = token_hash(token)
+    # Revoked tokens are refused before any signature check.
+    if revoked_tokens.is_revoked(key):
+        token_cache.discard(key)
         return None
+    payload = token_cache.get(key)
+    if payload is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return None
+        token_cache.put(key, payload)
+    return dict(payload)
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def revoke_token(token: str) -> bool:
+    """Revoke a valid token (logout, refresh rotation). False if it was already invalid."""
     payload = verify_token(token)
     if not payload:
+        return False
+    key = token_hash(token)
+    revoked_tokens.revoke(key, payload["exp"])
+    token_cache.discard(key)
+    return True
+
+def get_current_user(token: str = Depends(oauth2_scheme)):
+    payload = verify_token(token)
+    # A refresh token only buys new tokens at /usuarios/refresh, never API access.
+    # Tokens without `type` predate it and were all access tokens.
+    if not payload or payload.get("type") == "refresh":
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido o expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return payload
\ No newline at end of file
+    return payload
@@ -0,0 +1,129 @@
+"""
+Filtro de palabras prohibidas para reseñas.
+
+Las palabras viven en la tabla `palabras_prohibidas` y se compilan en un autómata
+Aho-Corasick, así que revisar un comentario es una sola pasada sobre el texto sin
+importar cuántas palabras haya. Texto y palabras se normalizan igual (minúsculas y
+sin tildes), de modo que "Estúpido", "estupido" y "ESTUPIDO" coinciden. Como el
+filtro anterior, la coincidencia es por subcadena.
+
+La lista se recarga sin reiniciar: al escribir desde /moderacion/palabras y, en los
+demás procesos, cuando cambia la huella (cantidad, id máximo) de la tabla, que se
+revisa como mucho cada `MODERACION_RECARGA_SEGUNDOS`.
+"""
+
+import threading
+import time
+import unicodedata
+from collections import deque
+
+from sqlalchemy import func, select
+
+from config import MODERACION_RECARGA_SEGUNDOS
+from models.palabra_prohibida import PalabraProhibida
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas y sin marcas diacríticas ("Árbol" -> "arbol")."""
+    descompuesto = unicodedata.normalize("NFKD", texto.casefold())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+class AhoCorasick:
+    """Autómata de búsqueda de múltiples patrones (transiciones en dicts por nodo)."""
+
+    def __init__(self, patrones):
+        self._hijos = [{}]
+        self._falla = [0]
+        # Patrones que terminan en cada nodo, incluidos los heredados por enlaces de falla.
+        self._salida = [()]
+        for patron in patrones:
+            if patron:
+                self._agregar(patron)
+        self._enlazar()
+
+    def _agregar(self, patron: str) -> None:
+        nodo = 0
+        for c in patron:
+            siguiente = self._hijos[nodo].get(c)
+            if siguiente is None:
+                siguiente = len(self._hijos)
+                self._hijos[nodo][c] = siguiente
+                self._hijos.append({})
+                self._falla.append(0)
+                self._salida.append(())
+            nodo = siguiente
+        self._salida[nodo] = self._salida[nodo] + (patron,)
+
+    def _enlazar(self) -> None:
+        cola = deque(self._hijos[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for c, hijo in self._hijos[nodo].items():
+                cola.append(hijo)
+                falla = self._falla[nodo]
+                while falla and c not in self._hijos[falla]:
+                    falla = self._falla[falla]
+                destino = self._hijos[falla].get(c, 0)
+                self._falla[hijo] = destino if destino != hijo else 0
+                self._salida[hijo] = self._salida[hijo] + self._salida[self._falla[hijo]]
+
+    def buscar(self, texto: str, primera: bool = False) -> list:
+        """Patrones encontrados en `texto` (con `primera`, se detiene en el primero)."""
+        hijos, falla, salida = self._hijos, self._falla, self._salida
+        encontrados = []
+        nodo = 0
+        for c in texto:
+            while nodo and c not in hijos[nodo]:
+                nodo = falla[nodo]
+            nodo = hijos[nodo].get(c, 0)
+            if salida[nodo]:
+                if primera:
+                    return [salida[nodo][0]]
+                encontrados.extend(salida[nodo])
+        return encontrados
+
+
+class Moderador:
+    def __init__(self, cada: float = MODERACION_RECARGA_SEGUNDOS):
+        self.cada = cada
+        self._automata = AhoCorasick([])
+        self._huella = None
+        self._ultima_revision = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _leer_huella(db):
+        return tuple(db.execute(
+            select(func.count(PalabraProhibida.id), func.max(PalabraProhibida.id))
+        ).one())
+
+    def recargar(self, db) -> int:
+        """Vuelve a compilar el autómata desde la tabla. Devuelve cuántas palabras cargó."""
+        with self._lock:
+            huella = self._leer_huella(db)
+            palabras = {normalizar(p) for p in db.execute(select(PalabraProhibida.palabra)).scalars()}
+            # Se reemplaza completo: las búsquedas en curso siguen con el autómata anterior.
+            self._automata = AhoCorasick(sorted(palabras))
+            self._huella = huella
+            self._ultima_revision = time.monotonic()
+            return len(palabras)
+
+    def _asegurar_vigente(self, db) -> None:
+        if self._huella is not None and time.monotonic() - self._ultima_revision < self.cada:
+            return
+        if self._huella is None or self._leer_huella(db) != self._huella:
+            self.recargar(db)
+        else:
+            self._ultima_revision = time.monotonic()
+
+    def palabras_encontradas(self, db, texto: str) -> list:
+        self._asegurar_vigente(db)
+        return self._automata.buscar(normalizar(texto))
+
+    def es_apropiado(self, db, texto: str) -> bool:
+        self._asegurar_vigente(db)
+        return not self._automata.buscar(normalizar(texto), primera=True)
+
+
+moderador = Moderador()
@@ -1,36 +1,212 @@
-import os
+"""
+OpenAI helper for the bot.
+
+- One pooled `AsyncOpenAI` client per event loop (keep-alive connections, bounded
+  pool) with connect/read timeouts and a hard overall deadline per call, so a slow
+  upstream costs at most `OPENAI_TIMEOUT_SECONDS + OPENAI_CONNECT_TIMEOUT_SECONDS`
+  and, being awaited, never pins a worker thread.
+- A semaphore caps concurrent upstream calls at `OPENAI_MAX_CONCURRENCY`; callers
+  that cannot get a slot within `OPENAI_QUEUE_TIMEOUT_SECONDS` get `None` (the bot
+  then falls back to WhatsApp) instead of queueing without bound.
+- Replies to questions asked without history are cached by normalized question
+  (TTL + LRU), since the same FAQs are asked all day. The bot only sends history
+  with follow-up messages (`is_follow_up` in utils/bot_history.py).
+- `stream_openai` yields the reply as the tokens arrive (for SSE responses).
+- `openai_metrics.snapshot()` reports cache hit rate and upstream latency.
+
+Set `OPENAI_BASE_URL` to point the client at another OpenAI-compatible server
+(e.g. `scripts/fake_openai_server.py`).
+"""
+
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict, deque
 from typing import Optional
 
-from config import OPENAI_API_KEY
+import httpx
+
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_BASE_URL,
+    OPENAI_CACHE_MAX,
+    OPENAI_CACHE_TTL_SECONDS,
+    OPENAI_CONNECT_TIMEOUT_SECONDS,
+    OPENAI_MAX_CONCURRENCY,
+    OPENAI_MODEL,
+    OPENAI_QUEUE_TIMEOUT_SECONDS,
+    OPENAI_TIMEOUT_SECONDS,
+)
+from utils.moderacion import normalizar
 
 try:
     import openai
 except Exception:
     openai = None
 
+SYSTEM_PROMPT = (
+    "Eres un asistente breve y amable para una tienda online, pero también puedes responder preguntas generales "
+    "(naturaleza, cultura, definiciones básicas, etc.) de forma clara y concisa en español. Responde en un máximo de 150 palabras, "
+    "mantén un tono servicial y práctico. Si el usuario pregunta por algo sensible o peligroso, indica que no puedes ayudar y sugiere contactar soporte. "
+    "Cuando sea apropiado, ofrece pasos accionables o una breve explicación."
+)
 
-def ask_openai(prompt: str, language: str = "es", history: Optional[list] = None) -> Optional[str]:
-    """Ask OpenAI ChatCompletion for a helpful reply in Spanish using optional conversation history.
 
-    - `history` expected as list of { from: 'user'|'bot', text: str } from the frontend.
-    Returns assistant text or None on error / if OpenAI not configured.
-    """
-    if not OPENAI_API_KEY:
-        return None
-    if openai is None:
-        return None
+def normalize_question(text: str) -> str:
+    """Cache key form of a question: case/accents folded, punctuation dropped, spaces collapsed."""
+    return " ".join(re.sub(r"[^\w]+", " ", normalizar(text or "")).split())
+
+
+class ReplyCache:
+    """LRU map question -> reply whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_entries: int = OPENAI_CACHE_MAX, ttl: float = OPENAI_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # key -> (reply, expires_at)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            reply, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return reply
+
+    def put(self, key, reply: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (reply, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class OpenAIMetrics:
+    """Counters plus a window of the latest upstream latencies."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._window = window
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.cache_hits = 0
+            self.cache_misses = 0
+            self.cache_skipped = 0
+            self.upstream_calls = 0
+            self.upstream_errors = 0
+            self.timeouts = 0
+            self.rejected = 0
+            self._latencies = deque(maxlen=self._window)
+            self._first_token = deque(maxlen=self._window)
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def observe_first_token(self, seconds: float) -> None:
+        with self._lock:
+            self._first_token.append(seconds)
+
+    @staticmethod
+    def _summary(samples) -> Optional[dict]:
+        if not samples:
+            return None
+        samples = sorted(samples)
+
+        def pct(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+        return {
+            "samples": len(samples),
+            "avg": round(sum(samples) / len(samples) * 1000, 1),
+            "p50": pct(0.50),
+            "p95": pct(0.95),
+            "max": round(samples[-1] * 1000, 1),
+        }
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.cache_hits + self.cache_misses
+            return {
+                "cache_hits": self.cache_hits,
+                "cache_misses": self.cache_misses,
+                "cache_skipped": self.cache_skipped,
+                "hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+                # Over every AI question, counting those sent with history (never cached).
+                "overall_hit_rate": round(self.cache_hits / (lookups + self.cache_skipped), 4)
+                if lookups + self.cache_skipped else 0.0,
+                "upstream_calls": self.upstream_calls,
+                "upstream_errors": self.upstream_errors,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+                "latency_ms": self._summary(self._latencies),
+                # Streamed calls only: time until the first token arrived.
+                "first_token_ms": self._summary(self._first_token),
+            }
+
+
+reply_cache = ReplyCache()
+openai_metrics = OpenAIMetrics()
+
+# Client and semaphore are bound to the event loop that created them.
+_state = {"loop": None, "client": None, "semaphore": None}
+
+
+def _get_client():
+    loop = asyncio.get_running_loop()
+    if _state["loop"] is not loop:
+        _state["client"] = openai.AsyncOpenAI(
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL or None,
+            timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+            # No SDK retries: a retry would silently double the worst-case latency.
+            max_retries=0,
+            # The semaphore bounds concurrency; the extra pool room covers connections
+            # still held by calls cancelled at the hard deadline.
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONCURRENCY * 2,
+                    max_keepalive_connections=OPENAI_MAX_CONCURRENCY,
+                ),
+            ),
+        )
+        _state["semaphore"] = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+        _state["loop"] = loop
+    return _state["client"], _state["semaphore"]
 
-    openai.api_key = OPENAI_API_KEY
 
-    system = (
-        "Eres un asistente breve y amable para una tienda online, pero también puedes responder preguntas generales "
-        "(naturaleza, cultura, definiciones básicas, etc.) de forma clara y concisa en español. Responde en un máximo de 150 palabras, "
-        "mantén un tono servicial y práctico. Si el usuario pregunta por algo sensible o peligroso, indica que no puedes ayudar y sugiere contactar soporte. "
-        "Cuando sea apropiado, ofrece pasos accionables o una breve explicación."
-    )
+async def close_client() -> None:
+    """Close the pooled connections of the current loop's client (app shutdown)."""
+    client = _state["client"]
+    if client is not None and _state["loop"] is asyncio.get_running_loop():
+        await client.close()
+    _state.update(loop=None, client=None, semaphore=None)
 
-    messages = [{"role": "system", "content": system}]
-    # append history if provided
+
+def build_messages(prompt: str, history: Optional[list] = None) -> list:
+    """System prompt + frontend history ({from: 'user'|'bot', text}) + the current prompt."""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
     if history:
         for h in history:
             try:
@@ -38,26 +214,143 @@ def ask_openai(prompt: str, language: str = "es", history: Optional[list] = None
                 messages.append({"role": role, "content": h.get("text", "")})
             except Exception:
                 continue
-
-    # finally add the current user prompt
     if prompt:
         messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+# Hard deadline of one upstream call: the httpx timeouts apply per phase (connect,
+# each read), so a slowly trickling response could otherwise run longer.
+CALL_DEADLINE_SECONDS = OPENAI_TIMEOUT_SECONDS + OPENAI_CONNECT_TIMEOUT_SECONDS
+
 
+async def _acquire(semaphore) -> bool:
     try:
-        resp = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            max_tokens=400,
-            temperature=0.6,
+        await asyncio.wait_for(semaphore.acquire(), OPENAI_QUEUE_TIMEOUT_SECONDS)
+        return True
+    except asyncio.TimeoutError:
+        openai_metrics.incr("rejected")
+        return False
+
+
+def _cache_lookup(prompt: str, language: str, history: Optional[list]):
+    """(cache key or None when history is present, cached reply or None)."""
+    # A reply that depends on earlier turns is not reusable for the bare question.
+    if history:
+        openai_metrics.incr("cache_skipped")
+        return None, None
+    key = (language, normalize_question(prompt))
+    cached = reply_cache.get(key)
+    openai_metrics.incr("cache_hits" if cached is not None else "cache_misses")
+    return key, cached
+
+
+async def _complete(messages: list) -> Optional[str]:
+    client, semaphore = _get_client()
+    if not await _acquire(semaphore):
+        return None
+    started = time.perf_counter()
+    try:
+        openai_metrics.incr("upstream_calls")
+        resp = await asyncio.wait_for(
+            client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=messages,
+                max_tokens=400,
+                temperature=0.6,
+            ),
+            CALL_DEADLINE_SECONDS,
         )
-        # Backwards-compat: different openai versions return slightly different shapes
-        try:
-            text = resp.choices[0].message.content.strip()
-        except Exception:
-            try:
-                text = resp.choices[0].text.strip()
-            except Exception:
-                return None
-        return text
+        return (resp.choices[0].message.content or "").strip() or None
+    except (asyncio.TimeoutError, openai.APITimeoutError):
+        openai_metrics.incr("timeouts")
+        return None
     except Exception:
+        openai_metrics.incr("upstream_errors")
         return None
+    finally:
+        openai_metrics.observe(time.perf_counter() - started)
+        semaphore.release()
+
+
+async def ask_openai(prompt: str, language: str = "es", history: Optional[list] = None) -> Optional[str]:
+    """Ask OpenAI for a helpful reply in Spanish using optional conversation history.
+
+    - `history` expected as list of { from: 'user'|'bot', text: str } from the frontend.
+    Returns assistant text or None on error, timeout, saturation or if OpenAI is not configured.
+    """
+    if not OPENAI_API_KEY or openai is None:
+        return None
+
+    key, cached = _cache_lookup(prompt, language, history)
+    if cached is not None:
+        return cached
+
+    text = await _complete(build_messages(prompt, history))
+    if text and key is not None:
+        reply_cache.put(key, text)
+    return text
+
+
+async def stream_openai(
+    prompt: str, language: str = "es", history: Optional[list] = None, status: Optional[dict] = None
+):
+    """Like `ask_openai`, but yields the reply in pieces as the upstream produces them.
+
+    A cached reply is yielded whole. Yields nothing when OpenAI is not configured or the
+    call is rejected, and stops early on error or timeout; only complete replies are cached.
+    If given, `status["complete"]` is set to True only when the whole reply was yielded,
+    so callers can tell a finished reply from a truncated one.
+    """
+    if not OPENAI_API_KEY or openai is None:
+        return
+
+    key, cached = _cache_lookup(prompt, language, history)
+    if cached is not None:
+        yield cached
+        if status is not None:
+            status["complete"] = True
+        return
+
+    client, semaphore = _get_client()
+    if not await _acquire(semaphore):
+        return
+    started = time.perf_counter()
+    deadline = started + CALL_DEADLINE_SECONDS
+    parts = []
+    stream = None
+    try:
+        openai_metrics.incr("upstream_calls")
+        stream = await asyncio.wait_for(
+            client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=build_messages(prompt, history),
+                max_tokens=400,
+                temperature=0.6,
+                stream=True,
+            ),
+            CALL_DEADLINE_SECONDS,
+        )
+        async for chunk in stream:
+            if time.perf_counter() > deadline:
+                raise asyncio.TimeoutError()
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if not parts:
+                    openai_metrics.observe_first_token(time.perf_counter() - started)
+                parts.append(delta)
+                yield delta
+        text = "".join(parts).strip()
+        if text and key is not None:
+            reply_cache.put(key, text)
+        if status is not None:
+            status["complete"] = True
+    except (asyncio.TimeoutError, openai.APITimeoutError):
+        openai_metrics.incr("timeouts")
+    except Exception:
+        openai_metrics.incr("upstream_errors")
+    finally:
+        openai_metrics.observe(time.perf_counter() - started)
+        semaphore.release()
+        if stream is not None:
+            await stream.close()
@@ -0,0 +1,212 @@
+"""
+Hash y verificación de contraseñas (y respuestas de seguridad) con bcrypt en un pool
+de procesos propio.
+
+- bcrypt es CPU puro (~250 ms por hash con costo 12). Se ejecuta en
+  `PASSWORD_HASH_WORKERS` procesos dedicados y los endpoints lo esperan con `await`,
+  así un pico de logins o una carga masiva no ocupa el threadpool compartido de FastAPI
+  ni frena los demás endpoints.
+- Como máximo hay `PASSWORD_HASH_QUEUE_MAX` operaciones pendientes (en cola o en curso);
+  más allá se responde 503 con Retry-After en vez de encolar sin límite.
+- Los hashes nuevos usan costo `PASSWORD_HASH_ROUNDS`. `needs_rehash` indica si un hash
+  guardado usa otro costo; el login lo actualiza tras una verificación correcta.
+- `hash_many` reparte una carga masiva en trozos de `PASSWORD_HASH_CHUNK` contraseñas y
+  nunca ocupa todos los procesos, para que los logins sigan entrando.
+- `password_hasher.stats()` reporta el tiempo en cola y el tiempo de hash (p50/p95).
+"""
+
+import asyncio
+import multiprocessing
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+import bcrypt
+from fastapi import HTTPException
+
+from config import (
+    PASSWORD_HASH_CHUNK,
+    PASSWORD_HASH_QUEUE_MAX,
+    PASSWORD_HASH_ROUNDS,
+    PASSWORD_HASH_WORKERS,
+)
+
+
+# --- Funciones que corren en los procesos del pool ---
+# Devuelven también cuándo empezaron y terminaron (time.monotonic es el mismo reloj
+# para todos los procesos de la máquina) para medir el tiempo en cola.
+
+def _hash(passwords: list, rounds: int) -> tuple:
+    inicio = time.monotonic()
+    hashes = [bcrypt.hashpw(p.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8") for p in passwords]
+    return hashes, inicio, time.monotonic()
+
+
+def _verify(password: str, hashed: str) -> tuple:
+    inicio = time.monotonic()
+    try:
+        ok = bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+    except ValueError:
+        # Hash mal formado en la base de datos: se trata como credencial incorrecta.
+        ok = False
+    return ok, inicio, time.monotonic()
+
+
+def _ping() -> tuple:
+    ahora = time.monotonic()
+    return None, ahora, ahora
+
+
+def _summary(samples) -> Optional[dict]:
+    if not samples:
+        return None
+    samples = sorted(samples)
+
+    def pct(p):
+        return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 1)
+    return {
+        "samples": len(samples),
+        "avg": round(sum(samples) / len(samples) * 1000, 1),
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "max": round(samples[-1] * 1000, 1),
+    }
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_QUEUE_MAX,
+        rounds: int = PASSWORD_HASH_ROUNDS,
+        chunk: int = PASSWORD_HASH_CHUNK,
+        window: int = 1000,
+    ):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.rounds = rounds
+        self.chunk = max(1, chunk)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+        self.pool_errors = 0
+        self._queue_times = deque(maxlen=window)
+        self._run_times = deque(maxlen=window)
+
+    # --- Pool ---
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # "spawn": el servidor ya tiene hilos (writer del chat, threadpool) y un
+                # fork los copiaría a medias; además es lo que usa Windows.
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def start(self) -> None:
+        """Arranca los procesos del pool (al iniciar la app) para que el primer login no
+        pague el arranque."""
+        pool = self._get_pool()
+        for future in [pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Servidor ocupado, intenta de nuevo en unos segundos.",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        enviado = time.monotonic()
+        try:
+            resultado, inicio, fin = await asyncio.wrap_future(self._get_pool().submit(fn, *args))
+        except BrokenProcessPool:
+            # Un proceso del pool murió: se descarta el pool y el siguiente uso crea otro.
+            with self._lock:
+                self.pool_errors += 1
+                if self._pool is not None:
+                    self._pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+            raise HTTPException(status_code=503, detail="Servicio de contraseñas no disponible", headers={"Retry-After": "1"})
+        finally:
+            with self._lock:
+                self._pending -= 1
+        with self._lock:
+            self._queue_times.append(max(0.0, inicio - enviado))
+            self._run_times.append(fin - inicio)
+        return resultado
+
+    # --- API ---
+
+    async def hash(self, password: str) -> str:
+        hashes = await self._run(_hash, [password], self.rounds)
+        with self._lock:
+            self.hashed += 1
+        return hashes[0]
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        if not hashed:
+            return False
+        ok = await self._run(_verify, password, hashed)
+        with self._lock:
+            self.verified += 1
+        return ok
+
+    async def hash_many(self, passwords: list) -> list:
+        """Hashes de una carga masiva en el mismo orden. Deja un proceso libre (si hay más
+        de uno) para las operaciones interactivas."""
+        trozos = [passwords[i:i + self.chunk] for i in range(0, len(passwords), self.chunk)]
+        en_vuelo = asyncio.Semaphore(max(1, self.workers - 1))
+
+        async def hash_trozo(trozo):
+            async with en_vuelo:
+                return await self._run(_hash, trozo, self.rounds)
+
+        resultados = await asyncio.gather(*(hash_trozo(t) for t in trozos))
+        with self._lock:
+            self.hashed += len(passwords)
+        return [h for hashes in resultados for h in hashes]
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True si el hash guardado no usa el costo configurado ($2b$12$...)."""
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "rounds": self.rounds,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "hashed": self.hashed,
+                "verified": self.verified,
+                "rejected": self.rejected,
+                "pool_errors": self.pool_errors,
+                # Desde que se envía la operación hasta que un proceso la empieza
+                "queue_ms": _summary(self._queue_times),
+                "hash_ms": _summary(self._run_times),
+            }
+
+
+password_hasher = PasswordHasher()
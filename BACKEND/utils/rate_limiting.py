@@ -1,16 +1,43 @@
 """
 Rate Limiting Utilities
 Protege contra fuerza bruta, DDoS y abuso de API
+
+`RateLimitMiddleware` (ASGI puro, registrado en main.py) aplica las políticas de
+`RATE_POLICIES` antes de que corra cualquier handler: GCRA (token bucket) por IP o por
+usuario, con un solo timestamp por llave que expira solo, y 429 con Retry-After.
+La decisión (validar el token y consultar el almacén, que puede ser SQLite o leer
+revocaciones de MySQL) corre en el threadpool, no en el event loop; si el almacén
+falla, la petición pasa (fail open) y queda en el log.
 """
 
 from datetime import datetime, timedelta
-from typing import Dict, Tuple
 from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from functools import wraps
+import ipaddress
+import json
+import logging
+import math
 import os
+import re
+
+from config import (
+    RATE_LIMIT_BOT_BURST,
+    RATE_LIMIT_BOT_PER_MINUTE,
+    RATE_LIMIT_CATALOG_BURST,
+    RATE_LIMIT_CATALOG_PER_MINUTE,
+    RATE_LIMIT_COMPRA_BURST,
+    RATE_LIMIT_COMPRA_PER_MINUTE,
+    RATE_LIMIT_LOGIN_BURST,
+    RATE_LIMIT_LOGIN_PER_MINUTE,
+    TRUSTED_PROXIES,
+)
+from utils.jwt_utils import verify_token
+
+# Contadores con expiración compartidos entre workers (ver utils/counter_store.py)
+from utils.counter_store import counter_store
 
-# Almacenamiento en memoria (en producción, usar Redis)
-rate_limit_store: Dict[str, Tuple[int, float]] = {}
+logger = logging.getLogger("rate_limiting")
 
 # Configuraciones desde .env
 MAX_REQUESTS = int(os.getenv("RATE_LIMIT_MAX_REQUESTS", "100"))
@@ -19,11 +46,34 @@ MAX_LOGIN_ATTEMPTS = int(os.getenv("MAX_LOGIN_ATTEMPTS", "5"))
 LOGIN_ATTEMPT_TIMEOUT = int(os.getenv("LOGIN_ATTEMPT_TIMEOUT", "300"))  # 5 minutos
 
 
+_PROXIES_CONFIABLES = [ipaddress.ip_network(p, strict=False) for p in TRUSTED_PROXIES]
+
+
+def _es_proxy_confiable(ip: str) -> bool:
+    try:
+        direccion = ipaddress.ip_address(ip)
+    except ValueError:
+        return False
+    return any(direccion in red for red in _PROXIES_CONFIABLES)
+
+
+def _ip_cliente(peer: str, forwarded_for) -> str:
+    """IP del cliente. X-Forwarded-For solo cuenta si la conexión viene de un proxy de
+    `TRUSTED_PROXIES`; se recorre de derecha a izquierda y se toma la primera IP que no
+    es de un proxy de confianza (las de la izquierda las pudo escribir el cliente)."""
+    if not forwarded_for or not _es_proxy_confiable(peer):
+        return peer
+    saltos = [ip.strip() for ip in forwarded_for.split(",") if ip.strip()]
+    for ip in reversed(saltos):
+        if not _es_proxy_confiable(ip):
+            return ip
+    return saltos[0] if saltos else peer
+
+
 def get_client_ip(request: Request) -> str:
-    """Obtener IP del cliente, considerando proxies"""
-    if request.headers.get('x-forwarded-for'):
-        return request.headers.get('x-forwarded-for').split(',')[0].strip()
-    return request.client.host
+    """Obtener IP del cliente, considerando proxies de confianza"""
+    peer = request.client.host if request.client else "desconocido"
+    return _ip_cliente(peer, request.headers.get('x-forwarded-for'))
 
 
 def rate_limit_by_ip(request: Request, max_requests: int = MAX_REQUESTS, window: int = RATE_LIMIT_WINDOW) -> bool:
@@ -38,27 +88,10 @@ def rate_limit_by_ip(request: Request, max_requests: int = MAX_REQUESTS, window:
     - window: ventana de tiempo en segundos
     """
     client_ip = get_client_ip(request)
-    current_time = datetime.now().timestamp()
-    
-    if client_ip not in rate_limit_store:
-        rate_limit_store[client_ip] = (1, current_time)
-        return True
-    
-    request_count, window_start = rate_limit_store[client_ip]
-    time_elapsed = current_time - window_start
-    
-    # Si pasó la ventana de tiempo, reiniciar contador
-    if time_elapsed > window:
-        rate_limit_store[client_ip] = (1, current_time)
-        return True
-    
-    # Si no ha pasado la ventana, incrementar contador
-    if request_count < max_requests:
-        rate_limit_store[client_ip] = (request_count + 1, window_start)
-        return True
-    
-    # Se excedió el límite
-    return False
+    # GCRA: max_requests de ráfaga que se recuperan a ritmo constante durante `window`
+    # (una ventana fija dejaría pasar el doble justo en el borde entre dos ventanas).
+    allowed, _ = counter_store.throttle(f"rate:{client_ip}", window / max_requests, max_requests)
+    return allowed
 
 
 def check_rate_limit(request: Request, max_requests: int = MAX_REQUESTS, window: int = RATE_LIMIT_WINDOW):
@@ -75,62 +108,45 @@ def check_rate_limit(request: Request, max_requests: int = MAX_REQUESTS, window:
 
 def reset_rate_limit(client_ip: str):
     """Resetear el contador de rate limit para un cliente específico"""
-    if client_ip in rate_limit_store:
-        del rate_limit_store[client_ip]
+    counter_store.delete(f"rate:{client_ip}")
 
 
 class BruteForceProtection:
-    """Protección contra ataques de fuerza bruta (login, etc)"""
+    """Protección contra ataques de fuerza bruta (login, etc)
+
+    Los fallos se cuentan en una ventana de TIMEOUT segundos; al llegar a MAX_ATTEMPTS
+    el identificador queda bloqueado TIMEOUT segundos.
+    """
     
-    failed_attempts: Dict[str, Tuple[int, float]] = {}
     MAX_ATTEMPTS = MAX_LOGIN_ATTEMPTS
     TIMEOUT = LOGIN_ATTEMPT_TIMEOUT
     
     @classmethod
     def is_blocked(cls, identifier: str) -> bool:
         """Verificar si el cliente está bloqueado"""
-        if identifier not in cls.failed_attempts:
-            return False
-        
-        attempts, block_until = cls.failed_attempts[identifier]
-        current_time = datetime.now().timestamp()
-        
-        # Si pasó el timeout, desbloquear
-        if current_time >= block_until:
-            del cls.failed_attempts[identifier]
-            return False
-        
-        return True
+        blocked, _ = counter_store.get(f"blocked:{identifier}")
+        return blocked > 0
     
     @classmethod
     def record_failure(cls, identifier: str):
         """Registrar un intento fallido"""
-        current_time = datetime.now().timestamp()
-        
-        if identifier not in cls.failed_attempts:
-            cls.failed_attempts[identifier] = (1, current_time + cls.TIMEOUT)
-        else:
-            attempts, block_until = cls.failed_attempts[identifier]
-            
-            if attempts + 1 >= cls.MAX_ATTEMPTS:
-                # Bloquear por TIMEOUT segundos
-                cls.failed_attempts[identifier] = (attempts + 1, current_time + cls.TIMEOUT)
-            else:
-                cls.failed_attempts[identifier] = (attempts + 1, block_until)
+        attempts, _ = counter_store.incr(f"failed:{identifier}", ttl=cls.TIMEOUT)
+        if attempts >= cls.MAX_ATTEMPTS:
+            # Bloquear por TIMEOUT segundos y empezar de cero al desbloquear
+            counter_store.set(f"blocked:{identifier}", 1, ttl=cls.TIMEOUT)
+            counter_store.delete(f"failed:{identifier}")
     
     @classmethod
     def record_success(cls, identifier: str):
         """Limpiar intentos fallidos después de éxito"""
-        if identifier in cls.failed_attempts:
-            del cls.failed_attempts[identifier]
+        counter_store.delete(f"failed:{identifier}")
     
     @classmethod
     def get_remaining_time(cls, identifier: str) -> int:
         """Obtener tiempo restante de bloqueo en segundos"""
-        if identifier not in cls.failed_attempts:
+        _, block_until = counter_store.get(f"blocked:{identifier}")
+        if block_until is None:
             return 0
-        
-        _, block_until = cls.failed_attempts[identifier]
         current_time = datetime.now().timestamp()
         remaining = max(0, int(block_until - current_time))
         return remaining
@@ -153,3 +169,116 @@ def rate_limit_endpoint(max_requests: int = MAX_REQUESTS, window: int = RATE_LIM
             return await func(request, *args, **kwargs)
         return wrapper
     return decorator
+
+
+# --- Middleware ASGI con políticas por ruta ---
+
+class RatePolicy:
+    """Límite de `per_minute` solicitudes (ráfaga de `burst`) para las rutas cuyo método
+    está en `methods` y cuyo path coincide con `pattern`. `key` es "ip" o "user"."""
+
+    def __init__(self, name: str, methods, pattern: str, per_minute: float, burst: int, key: str = "ip"):
+        self.name = name
+        self.methods = set(methods)
+        self.pattern = re.compile(pattern)
+        self.interval = 60.0 / per_minute
+        self.burst = max(1, burst)
+        self.key = key
+
+    def matches(self, method: str, path: str) -> bool:
+        return method in self.methods and self.pattern.match(path) is not None
+
+
+# La primera política que coincide es la que se aplica
+RATE_POLICIES = [
+    RatePolicy(
+        "login", {"POST"},
+        r"/usuarios/(login|register|recuperar-contrasena|\d+/verificar-seguridad)/?$",
+        RATE_LIMIT_LOGIN_PER_MINUTE, RATE_LIMIT_LOGIN_BURST,
+    ),
+    RatePolicy(
+        "compra", {"POST"}, r"/(compra|pedidos)/?$",
+        RATE_LIMIT_COMPRA_PER_MINUTE, RATE_LIMIT_COMPRA_BURST, key="user",
+    ),
+    RatePolicy(
+        "bot", {"POST"}, r"/bot/respond(/stream)?/?$",
+        RATE_LIMIT_BOT_PER_MINUTE, RATE_LIMIT_BOT_BURST, key="user",
+    ),
+    RatePolicy(
+        "catalog", {"GET"}, r"/(productos|categorias|api/resenas)(/|$)",
+        RATE_LIMIT_CATALOG_PER_MINUTE, RATE_LIMIT_CATALOG_BURST,
+    ),
+]
+
+
+def _scope_ip(scope) -> str:
+    """Como `get_client_ip`, pero sobre el scope ASGI."""
+    client = scope.get("client")
+    peer = client[0] if client else "desconocido"
+    if not _PROXIES_CONFIABLES:
+        return peer
+    for name, value in scope.get("headers") or ():
+        if name == b"x-forwarded-for":
+            return _ip_cliente(peer, value.decode("latin-1"))
+    return peer
+
+
+def _scope_user(scope):
+    for name, value in scope.get("headers") or ():
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                payload = verify_token(token.strip())
+                if payload and payload.get("type") != "refresh" and payload.get("id") is not None:
+                    return payload["id"]
+            return None
+    return None
+
+
+class RateLimitMiddleware:
+    def __init__(self, app, policies=None, store=None):
+        self.app = app
+        self.policies = RATE_POLICIES if policies is None else policies
+        self.store = store or counter_store
+
+    def _decidir(self, policy, scope):
+        """(permitida, retry_after) de la política para esta petición. Bloqueante."""
+        user = _scope_user(scope) if policy.key == "user" else None
+        ident = f"u{user}" if user is not None else f"ip{_scope_ip(scope)}"
+        try:
+            return self.store.throttle(f"gcra:{policy.name}:{ident}", policy.interval, policy.burst)
+        except Exception as exc:
+            # Un almacén caído o bloqueado no debe tumbar la API: se deja pasar.
+            logger.error("Rate limit: falló el almacén de contadores (%r), se permite %s %s", exc, scope["method"], scope["path"])
+            return True, 0.0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method, path = scope["method"], scope["path"]
+        policy = next((p for p in self.policies if p.matches(method, path)), None)
+        if policy is None:
+            await self.app(scope, receive, send)
+            return
+
+        allowed, retry_after = await run_in_threadpool(self._decidir, policy, scope)
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        seconds = max(1, math.ceil(retry_after))
+        body = json.dumps(
+            {"detail": f"Demasiadas solicitudes. Intenta de nuevo en {seconds} segundos."},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(seconds).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
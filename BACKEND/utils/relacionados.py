@@ -0,0 +1,320 @@
+"""
+Motor de "comprados juntos frecuentemente".
+
+Construye una matriz dispersa producto × producto con el número de pedidos en los
+que aparecen juntos dos productos, recorriendo `detalle_pedido` (y su archivo) por
+lotes de pedidos, y guarda para cada producto sus `RELACIONADOS_TOP_K` vecinos en
+arreglos NumPy de tamaño fijo:
+
+    ids      (n,)     ids de producto ordenados (búsqueda con searchsorted)
+    vecinos  (n, K)   ids de los productos relacionados, rellenado con 0
+    pesos    (n, K)   pedidos en común, 0 = hueco
+
+`refrescar` procesa las líneas nuevas y recalcula el top-K de los productos
+afectados. Relee las `RELACIONADOS_VENTANA_DETALLES` ids por debajo de la marca de
+agua y descarta las ya contadas (`_vistos`): una transacción que confirma tarde deja
+líneas con ids menores que otras ya vistas. Las ediciones o bajas de líneas ya
+contadas no se reflejan hasta la siguiente construcción completa
+(`scripts/construir_relacionados.py`), que también guarda una instantánea en disco.
+
+La carga inicial (instantánea o, si no hay, construcción completa) corre en un hilo
+aparte que se lanza al arrancar el servidor (`iniciar_carga`); mientras tanto las
+consultas devuelven listas vacías en lugar de bloquear la petición.
+"""
+
+import heapq
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from itertools import combinations
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from config import (
+    RELACIONADOS_ARCHIVO,
+    RELACIONADOS_REFRESCO_SEGUNDOS,
+    RELACIONADOS_TAMANO_LOTE,
+    RELACIONADOS_TOP_K,
+    RELACIONADOS_VENTANA_DETALLES,
+)
+from db.session import SessionLocal
+from models.detallepedido import DetallePedido
+from models.detallepedido_archivo import DetallePedidoArchivo
+
+logger = logging.getLogger("relacionados")
+
+
+class MotorRelacionados:
+    def __init__(
+        self,
+        top_k: int = RELACIONADOS_TOP_K,
+        ventana: int = RELACIONADOS_VENTANA_DETALLES,
+        session_factory=SessionLocal,
+    ):
+        self.top_k = top_k
+        self.ventana = ventana
+        self.session_factory = session_factory
+        # Conteos dispersos: producto -> {producto relacionado: pedidos en común}
+        self._conteos = defaultdict(lambda: defaultdict(int))
+        self._ultimo_detalle = 0
+        # Ids de detalle ya contados dentro de la ventana bajo la marca de agua
+        self._vistos = set()
+        self._ultimo_refresco = 0.0
+        # (ids, vecinos, pesos); se reemplaza completa para que los lectores no vean
+        # un estado intermedio.
+        self._tabla = self._tabla_vacia()
+        self._cargado = False
+        self._lock = threading.RLock()
+        # Aparte de `_lock`, que la carga retiene mientras construye.
+        self._lock_carga = threading.Lock()
+        self._hilo_carga = None
+
+    def _tabla_vacia(self):
+        return (
+            np.zeros(0, dtype=np.int64),
+            np.zeros((0, self.top_k), dtype=np.int64),
+            np.zeros((0, self.top_k), dtype=np.int32),
+        )
+
+    # --- Consulta ---
+
+    def vecinos(self, producto_id: int, limit: Optional[int] = None) -> list:
+        """[(producto_id, pedidos_en_comun)] ordenado de mayor a menor."""
+        ids, vecinos, pesos = self._tabla
+        fila = np.searchsorted(ids, producto_id)
+        if fila >= len(ids) or ids[fila] != producto_id:
+            return []
+        n = int(np.count_nonzero(pesos[fila]))
+        if limit is not None:
+            n = min(n, limit)
+        return list(zip(vecinos[fila, :n].tolist(), pesos[fila, :n].tolist()))
+
+    # --- Construcción ---
+
+    def _contar_pedido(self, productos, anteriores=frozenset()) -> set:
+        """Suma 1 a cada par de `productos` y a cada par (producto, anterior) con los
+        productos que el pedido ya tenía contados. Devuelve los productos tocados."""
+        productos = set(productos) - set(anteriores)
+        pares = list(combinations(productos, 2)) + [(a, b) for a in productos for b in anteriores]
+        tocados = set()
+        for a, b in pares:
+            self._conteos[a][b] += 1
+            self._conteos[b][a] += 1
+            tocados.update((a, b))
+        return tocados
+
+    def _recorrer(self, db, modelo, tamano_lote: int) -> None:
+        """Recorre las líneas de `modelo` por lotes de pedidos (keyset sobre pedido_id)."""
+        ultimo_pedido = 0
+        while True:
+            pedidos = db.execute(
+                select(modelo.pedido_id)
+                .where(modelo.pedido_id > ultimo_pedido)
+                .group_by(modelo.pedido_id)
+                .order_by(modelo.pedido_id)
+                .limit(tamano_lote)
+            ).scalars().all()
+            if not pedidos:
+                break
+            por_pedido = defaultdict(set)
+            for pedido_id, producto_id, id_detalle in db.execute(
+                select(modelo.pedido_id, modelo.producto_id, modelo.id_detalle)
+                .where(modelo.pedido_id.in_(pedidos))
+            ):
+                if producto_id is not None:
+                    por_pedido[pedido_id].add(producto_id)
+                self._ultimo_detalle = max(self._ultimo_detalle, id_detalle)
+                self._vistos.add(id_detalle)
+            for productos in por_pedido.values():
+                self._contar_pedido(productos)
+            ultimo_pedido = pedidos[-1]
+
+    def construir(self, db, tamano_lote: int = RELACIONADOS_TAMANO_LOTE) -> None:
+        """Construcción completa desde cero."""
+        with self._lock:
+            self._conteos = defaultdict(lambda: defaultdict(int))
+            self._ultimo_detalle = 0
+            self._vistos = set()
+            self._recorrer(db, DetallePedidoArchivo, tamano_lote)
+            self._recorrer(db, DetallePedido, tamano_lote)
+            self._podar_vistos()
+            self._tabla = self._armar_tabla(None)
+            self._cargado = True
+            self._ultimo_refresco = time.monotonic()
+
+    def _podar_vistos(self) -> None:
+        piso = self._ultimo_detalle - self.ventana
+        self._vistos = {i for i in self._vistos if i > piso}
+
+    def refrescar(self, db) -> int:
+        """Cuenta las líneas nuevas desde la última pasada. Devuelve cuántas procesó."""
+        with self._lock:
+            nuevas = [
+                fila
+                for fila in db.execute(
+                    select(DetallePedido.pedido_id, DetallePedido.producto_id, DetallePedido.id_detalle)
+                    .where(DetallePedido.id_detalle > self._ultimo_detalle - self.ventana)
+                )
+                if fila.id_detalle not in self._vistos
+            ]
+            self._ultimo_refresco = time.monotonic()
+            if not nuevas:
+                return 0
+
+            ids_nuevos = {id_detalle for _, _, id_detalle in nuevas}
+            tope = max(ids_nuevos)
+            nuevos_por_pedido = defaultdict(set)
+            for pedido_id, producto_id, _ in nuevas:
+                if producto_id is not None:
+                    nuevos_por_pedido[pedido_id].add(producto_id)
+
+            # Productos que esos pedidos ya tenían en pasadas anteriores (sus demás
+            # líneas hasta el id más alto de esta pasada ya están contadas).
+            anteriores = defaultdict(set)
+            for pedido_id, producto_id, id_detalle in db.execute(
+                select(DetallePedido.pedido_id, DetallePedido.producto_id, DetallePedido.id_detalle)
+                .where(
+                    DetallePedido.pedido_id.in_(list(nuevos_por_pedido)),
+                    DetallePedido.id_detalle <= tope,
+                )
+            ):
+                if producto_id is not None and id_detalle not in ids_nuevos:
+                    anteriores[pedido_id].add(producto_id)
+
+            self._vistos |= ids_nuevos
+            self._ultimo_detalle = max(self._ultimo_detalle, tope)
+            self._podar_vistos()
+
+            tocados = set()
+            for pedido_id, nuevos in nuevos_por_pedido.items():
+                tocados |= self._contar_pedido(nuevos, anteriores[pedido_id])
+            if tocados:
+                self._tabla = self._armar_tabla(tocados)
+            return len(nuevas)
+
+    def _top(self, producto_id: int):
+        return heapq.nlargest(self.top_k, self._conteos[producto_id].items(), key=lambda kv: (kv[1], -kv[0]))
+
+    def _armar_tabla(self, tocados: Optional[set]):
+        """Arma los arreglos top-K. Con `tocados` solo recalcula esas filas y copia
+        el resto de la tabla anterior."""
+        ids = np.array(sorted(self._conteos), dtype=np.int64)
+        vecinos = np.zeros((len(ids), self.top_k), dtype=np.int64)
+        pesos = np.zeros((len(ids), self.top_k), dtype=np.int32)
+
+        if tocados is None:
+            recalcular = ids.tolist()
+        else:
+            viejos_ids, viejos_vecinos, viejos_pesos = self._tabla
+            if len(viejos_ids):
+                destino = np.searchsorted(ids, viejos_ids)
+                vecinos[destino] = viejos_vecinos
+                pesos[destino] = viejos_pesos
+            recalcular = tocados
+
+        for producto_id in recalcular:
+            fila = np.searchsorted(ids, producto_id)
+            top = self._top(producto_id)
+            if top:
+                vecinos[fila, :len(top)] = [p for p, _ in top]
+                pesos[fila, :len(top)] = [c for _, c in top]
+        return ids, vecinos, pesos
+
+    # --- Instantánea en disco ---
+
+    def guardar(self, ruta: str = RELACIONADOS_ARCHIVO) -> None:
+        """Guarda los conteos (formato COO), la marca de agua y los ids vistos de la
+        ventana en un .npz."""
+        filas, columnas, valores = [], [], []
+        with self._lock:
+            for a, relacionados in self._conteos.items():
+                for b, c in relacionados.items():
+                    filas.append(a)
+                    columnas.append(b)
+                    valores.append(c)
+            ultimo = self._ultimo_detalle
+            vistos = sorted(self._vistos)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        temporal = ruta + ".tmp.npz"
+        np.savez_compressed(
+            temporal,
+            filas=np.array(filas, dtype=np.int64),
+            columnas=np.array(columnas, dtype=np.int64),
+            valores=np.array(valores, dtype=np.int32),
+            ultimo_detalle=np.array(ultimo, dtype=np.int64),
+            vistos=np.array(vistos, dtype=np.int64),
+        )
+        os.replace(temporal, ruta)
+
+    def cargar(self, ruta: str = RELACIONADOS_ARCHIVO, db=None) -> bool:
+        """Carga la instantánea. Las anteriores a la ventana no traen `vistos`: con
+        `db` se dan por contadas las líneas de la ventana que ya existen."""
+        if not os.path.exists(ruta):
+            return False
+        datos = np.load(ruta)
+        conteos = defaultdict(lambda: defaultdict(int))
+        for a, b, c in zip(datos["filas"].tolist(), datos["columnas"].tolist(), datos["valores"].tolist()):
+            conteos[a][b] = c
+        ultimo = int(datos["ultimo_detalle"])
+        if "vistos" in datos:
+            vistos = set(datos["vistos"].tolist())
+        elif db is not None:
+            vistos = set(db.execute(
+                select(DetallePedido.id_detalle).where(
+                    DetallePedido.id_detalle > ultimo - self.ventana,
+                    DetallePedido.id_detalle <= ultimo,
+                )
+            ).scalars())
+        else:
+            vistos = set()
+        with self._lock:
+            self._conteos = conteos
+            self._ultimo_detalle = ultimo
+            self._vistos = vistos
+            self._tabla = self._armar_tabla(None)
+            self._cargado = True
+        return True
+
+    def iniciar_carga(self) -> None:
+        """Lanza la carga inicial en segundo plano (una sola a la vez)."""
+        with self._lock_carga:
+            if self._cargado or self._hilo_carga is not None:
+                return
+            self._hilo_carga = threading.Thread(target=self._carga_inicial, name="relacionados", daemon=True)
+            self._hilo_carga.start()
+
+    def _carga_inicial(self) -> None:
+        db = self.session_factory()
+        try:
+            inicio = time.perf_counter()
+            if not self.cargar(db=db):
+                self.construir(db)
+            self.refrescar(db)
+            logger.info("Relacionados: listo en %.2fs", time.perf_counter() - inicio)
+        except Exception:
+            logger.exception("Relacionados: falló la carga inicial")
+        finally:
+            db.close()
+            # Si falló, la siguiente consulta vuelve a intentarlo.
+            with self._lock_carga:
+                self._hilo_carga = None
+
+    def asegurar_vigente(self, db, cada: float = RELACIONADOS_REFRESCO_SEGUNDOS) -> None:
+        """Sin cargar, lanza la carga en segundo plano y vuelve enseguida (las
+        consultas devuelven vacío hasta que termine). Ya cargado, refresca como
+        mucho una vez cada `cada` segundos; si otra petición ya está refrescando no
+        la espera."""
+        if not self._cargado:
+            self.iniciar_carga()
+        elif time.monotonic() - self._ultimo_refresco >= cada and self._lock.acquire(blocking=False):
+            try:
+                self.refrescar(db)
+            finally:
+                self._lock.release()
+
+
+motor_relacionados = MotorRelacionados()
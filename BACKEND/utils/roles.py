@@ -0,0 +1,87 @@
+"""
+Registro en memoria de los roles (tabla `roles`) para autorizar sin consultar la base
+de datos en cada petición.
+
+- El login guarda `rol_id` en el token; `require_role("vendedor", ...)` lee ese claim
+  y resuelve el nombre y el estado del rol en el mapa en memoria.
+- El mapa se carga la primera vez que se usa y se recarga cada
+  `ROLES_RECARGA_SEGUNDOS` (otros workers) o en cuanto `rol_controller` crea, modifica
+  o elimina un rol (`registro_roles.recargar(db)`). Así un rol desactivado o renombrado
+  se aplica sin que los usuarios vuelvan a iniciar sesión.
+"""
+
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from fastapi import Depends, HTTPException
+
+from config import ROLES_RECARGA_SEGUNDOS
+from db.session import SessionLocal
+from models.roles import Rol
+from utils.jwt_utils import get_current_user
+
+
+class RolInfo(NamedTuple):
+    id_rol: int
+    nombre: str
+    activo: bool
+
+
+class RegistroRoles:
+    def __init__(self, recarga_segundos: float = ROLES_RECARGA_SEGUNDOS, session_factory=SessionLocal):
+        self.recarga_segundos = recarga_segundos
+        self.session_factory = session_factory
+        self.roles = None
+        self._cargado_en = 0.0
+        self._lock = threading.Lock()
+
+    def recargar(self, db) -> dict:
+        roles = {
+            id_rol: RolInfo(id_rol, nombre, estado is None or bool(estado))
+            for id_rol, nombre, estado in db.query(Rol.id_rol, Rol.nombre, Rol.estado)
+        }
+        with self._lock:
+            self.roles = roles
+            self._cargado_en = time.monotonic()
+        return roles
+
+    def get(self, db=None) -> dict:
+        roles = self.roles
+        if roles is None or time.monotonic() - self._cargado_en >= self.recarga_segundos:
+            if db is not None:
+                return self.recargar(db)
+            db = self.session_factory()
+            try:
+                roles = self.recargar(db)
+            finally:
+                db.close()
+        return roles
+
+    def rol(self, rol_id, db=None) -> Optional[RolInfo]:
+        return self.get(db).get(rol_id)
+
+    def nombre(self, rol_id, db=None) -> Optional[str]:
+        info = self.rol(rol_id, db)
+        return info.nombre if info else None
+
+
+registro_roles = RegistroRoles()
+
+
+def require_role(*nombres: str):
+    """Dependencia que exige un token válido cuyo rol (activo) esté en `nombres`.
+    Devuelve el payload del token.
+
+        @router.get("/algo")
+        def algo(usuario: dict = Depends(require_role("vendedor"))):
+    """
+    permitidos = {n.strip().lower() for n in nombres}
+
+    def dependencia(usuario: dict = Depends(get_current_user)) -> dict:
+        info = registro_roles.rol(usuario.get("rol_id"))
+        if info is None or not info.activo or (permitidos and (info.nombre or "").strip().lower() not in permitidos):
+            raise HTTPException(status_code=403, detail="No tienes permisos para esta acción")
+        return usuario
+
+    return dependencia
@@ -0,0 +1,110 @@
+"""
+Armado de series de ventas por intervalos (día, semana, mes) con NumPy.
+
+Recibe las filas ya filtradas por rango de fechas (una por día y grupo) y las
+acumula en una matriz grupos × intervalos; los intervalos sin ventas quedan en 0,
+así que no hace falta rellenar huecos en Python. El rango admitido por intervalo
+está acotado por `SERIE_VENTAS_MAX_DIAS` (ver `validar_rango`).
+"""
+
+from datetime import date
+from typing import Optional
+
+import numpy as np
+
+from config import SERIE_VENTAS_MAX_DIAS
+
+BUCKETS = ("day", "week", "month")
+_EPOCA = date(1970, 1, 1).toordinal()
+# Grupo (id 0) de los productos sin categoría en las series por categoría.
+SIN_CATEGORIA = "Sin categoría"
+
+
+def validar_rango(desde: date, hasta: date, bucket: str) -> Optional[str]:
+    """Mensaje de error si el rango no es válido para `bucket`, o None."""
+    if desde > hasta:
+        return "`desde` debe ser anterior o igual a `hasta`"
+    maximo = SERIE_VENTAS_MAX_DIAS[bucket]
+    if (hasta - desde).days + 1 > maximo:
+        return f"El rango máximo con bucket={bucket} es de {maximo} días"
+    return None
+
+
+def inicio_bucket(fechas: np.ndarray, bucket: str) -> np.ndarray:
+    """Fecha de inicio del intervalo de cada fecha (`datetime64[D]`).
+
+    Las semanas empiezan el lunes (el 1970-01-01 fue jueves, de ahí el +3).
+    """
+    if bucket == "day":
+        return fechas
+    if bucket == "week":
+        dias = fechas.astype("int64")
+        return fechas - ((dias + 3) % 7).astype("timedelta64[D]")
+    if bucket == "month":
+        return fechas.astype("datetime64[M]").astype("datetime64[D]")
+    raise ValueError(f"bucket no soportado: {bucket}")
+
+
+def eje_buckets(desde: date, hasta: date, bucket: str) -> np.ndarray:
+    """Todos los inicios de intervalo entre `desde` y `hasta` (inclusive)."""
+    extremos = inicio_bucket(np.array([desde, hasta], dtype="datetime64[D]"), bucket)
+    if bucket == "day":
+        return np.arange(extremos[0], extremos[1] + 1, dtype="datetime64[D]")
+    if bucket == "week":
+        return np.arange(extremos[0], extremos[1] + 7, 7, dtype="datetime64[D]")
+    meses = np.arange(extremos[0].astype("datetime64[M]"), extremos[1].astype("datetime64[M]") + 1)
+    return meses.astype("datetime64[D]")
+
+
+def armar_serie(filas, desde: date, hasta: date, bucket: str) -> dict:
+    """`filas`: secuencia de (fecha, grupo_id, nombre, cantidad, revenue)."""
+    eje = eje_buckets(desde, hasta, bucket)
+    etiquetas = [str(d) for d in eje]
+    if not filas:
+        ceros = [0] * len(eje)
+        return {
+            "buckets": etiquetas,
+            "series": [],
+            "totales": {"cantidad": ceros, "revenue": [0.0] * len(eje)},
+        }
+
+    n = len(filas)
+    fechas, grupos, nombres, cantidades, revenues = zip(*filas)
+    # `np.array(fechas, dtype="datetime64[D]")` convierte objeto por objeto y es lo más
+    # lento del armado; el ordinal de cada fecha da los mismos días desde 1970.
+    fechas = (
+        np.fromiter((f.toordinal() for f in fechas), dtype="int64", count=n) - _EPOCA
+    ).astype("datetime64[D]")
+    grupos = np.fromiter(grupos, dtype="int64", count=n)
+    cantidades = np.fromiter(cantidades, dtype="int64", count=n)
+    revenues = np.fromiter(revenues, dtype="float64", count=n)
+
+    col = np.searchsorted(eje, inicio_bucket(fechas, bucket))
+    ids, fila = np.unique(grupos, return_inverse=True)
+    fila = fila.reshape(-1)
+
+    # Acumulado por celda (grupo, intervalo) sobre el índice plano de la matriz.
+    celdas = len(ids) * len(eje)
+    plano = fila * len(eje) + col
+    matriz_cant = np.bincount(plano, weights=cantidades, minlength=celdas).astype("int64").reshape(len(ids), len(eje))
+    matriz_rev = np.bincount(plano, weights=revenues, minlength=celdas).reshape(len(ids), len(eje))
+
+    # Nombre por grupo: el de la primera fila de cada uno.
+    _, primera = np.unique(fila, return_index=True)
+    series = [
+        {
+            "id": int(ids[i]),
+            "nombre": nombres[primera[i]],
+            "cantidad": matriz_cant[i].tolist(),
+            "revenue": np.round(matriz_rev[i], 2).tolist(),
+        }
+        for i in range(len(ids))
+    ]
+    return {
+        "buckets": etiquetas,
+        "series": series,
+        "totales": {
+            "cantidad": matriz_cant.sum(axis=0).tolist(),
+            "revenue": np.round(matriz_rev.sum(axis=0), 2).tolist(),
+        },
+    }
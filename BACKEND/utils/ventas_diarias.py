@@ -0,0 +1,117 @@
+"""
+Mantenimiento de la tabla acumulada `ventas_diarias` (día, producto).
+
+- `registrar_venta_diaria` suma una línea de pedido al acumulado y
+  `restar_venta_diaria` la descuenta; se llaman dentro de la misma transacción que
+  escribe la línea (ver `api/compra.py` y `utils/acumulados_pedidos.py`).
+- `reconstruir_ventas_diarias` recalcula el acumulado desde `detalle_pedido` y
+  `detalle_pedido_archivo` para reparar desvíos (ediciones manuales, cargas masivas).
+"""
+
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, select, union_all, update
+
+from models.detallepedido import DetallePedido
+from models.detallepedido_archivo import DetallePedidoArchivo
+from models.pedido import Pedido
+from models.pedido_archivo import PedidoArchivo
+from models.venta_diaria import VentaDiaria
+
+
+def registrar_venta_diaria(db, fecha: date, producto_id: int, cantidad: int, subtotal: float) -> None:
+    """Suma `cantidad` y `subtotal` al acumulado de (fecha, producto). No hace commit."""
+    cantidad = cantidad or 0
+    subtotal = subtotal or 0.0
+    if db.get_bind().dialect.name == "mysql":
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+
+        stmt = mysql_insert(VentaDiaria).values(
+            fecha=fecha, producto_id=producto_id, total_cantidad=cantidad, total_revenue=subtotal
+        )
+        db.execute(stmt.on_duplicate_key_update(
+            total_cantidad=VentaDiaria.total_cantidad + stmt.inserted.total_cantidad,
+            total_revenue=VentaDiaria.total_revenue + stmt.inserted.total_revenue,
+        ))
+        return
+
+    # Otros motores (desarrollo/pruebas): UPDATE y, si no existía la fila, INSERT.
+    result = db.execute(
+        update(VentaDiaria)
+        .where(VentaDiaria.fecha == fecha, VentaDiaria.producto_id == producto_id)
+        .values(
+            total_cantidad=VentaDiaria.total_cantidad + cantidad,
+            total_revenue=VentaDiaria.total_revenue + subtotal,
+        )
+    )
+    if result.rowcount == 0:
+        db.execute(insert(VentaDiaria).values(
+            fecha=fecha, producto_id=producto_id, total_cantidad=cantidad, total_revenue=subtotal
+        ))
+
+
+def restar_venta_diaria(db, fecha: date, producto_id: int, cantidad: int, subtotal: float) -> None:
+    """Descuenta una línea del acumulado; la fila se borra si queda sin ventas. No hace commit."""
+    donde = (VentaDiaria.fecha == fecha, VentaDiaria.producto_id == producto_id)
+    db.execute(
+        update(VentaDiaria)
+        .where(*donde)
+        .values(
+            total_cantidad=VentaDiaria.total_cantidad - (cantidad or 0),
+            total_revenue=VentaDiaria.total_revenue - (subtotal or 0.0),
+        )
+    )
+    db.execute(delete(VentaDiaria).where(*donde, VentaDiaria.total_cantidad <= 0))
+
+
+def reconstruir_ventas_diarias(db, desde: Optional[date] = None, hasta: Optional[date] = None) -> int:
+    """Recalcula `ventas_diarias` entre `desde` y `hasta` (inclusive; sin límites = todo).
+    Devuelve el número de filas (día, producto) escritas."""
+    lineas = []
+    for pedido_modelo, detalle_modelo in ((Pedido, DetallePedido), (PedidoArchivo, DetallePedidoArchivo)):
+        q = (
+            select(
+                func.date(pedido_modelo.fecha_pedido).label("fecha"),
+                detalle_modelo.producto_id.label("producto_id"),
+                detalle_modelo.cantidad.label("cantidad"),
+                detalle_modelo.subtotal.label("subtotal"),
+            )
+            .join(pedido_modelo, detalle_modelo.pedido_id == pedido_modelo.id_pedido)
+            .where(pedido_modelo.fecha_pedido.isnot(None), detalle_modelo.producto_id.isnot(None))
+        )
+        # Rango sargable sobre fecha_pedido (usa ix_pedidos_fecha)
+        if desde is not None:
+            q = q.where(pedido_modelo.fecha_pedido >= desde)
+        if hasta is not None:
+            q = q.where(pedido_modelo.fecha_pedido < hasta + timedelta(days=1))
+        lineas.append(q)
+    todas = union_all(*lineas).subquery()
+
+    agregado = (
+        select(
+            todas.c.fecha,
+            todas.c.producto_id,
+            func.coalesce(func.sum(todas.c.cantidad), 0),
+            func.coalesce(func.sum(todas.c.subtotal), 0.0),
+        )
+        .group_by(todas.c.fecha, todas.c.producto_id)
+    )
+
+    try:
+        borrar = delete(VentaDiaria)
+        if desde is not None:
+            borrar = borrar.where(VentaDiaria.fecha >= desde)
+        if hasta is not None:
+            borrar = borrar.where(VentaDiaria.fecha <= hasta)
+        db.execute(borrar)
+        result = db.execute(
+            insert(VentaDiaria).from_select(
+                ["fecha", "producto_id", "total_cantidad", "total_revenue"], agregado
+            )
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result.rowcount
@@ -28,9 +28,7 @@ export default function ChatBot(){
 
     if(!input.trim()) return
     const userMsg = input.trim()
-  // build history including the new user message for context
-  const recent = messages.slice(-5)
-  const history = [...recent, { from: 'user', text: userMsg }]
+  // the backend keeps the conversation history, only the new message is sent
   setMessages(m=>[...m, {from:'user', text: userMsg}])
   setLastUserMessage(userMsg)
     setInput('')
@@ -57,7 +55,7 @@ export default function ChatBot(){
       const res = await fetch(`${API}/bot/respond`, {
         method: 'POST',
         headers,
-        body: JSON.stringify({ usuario_origen: userId, mensaje: userMsg, history })
+        body: JSON.stringify({ usuario_origen: userId, mensaje: userMsg })
       })
       if (!res.ok) {
         // handle unauthorized or other errors gracefully
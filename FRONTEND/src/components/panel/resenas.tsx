@@ -45,7 +45,7 @@ const ResenasPanel: React.FC<Props> = ({ esVendedor, vendedorId, productoId, onR
   // Cargar reseñas según el rol
   useEffect(() => {
     if (esVendedor && vendedorId) {
-      fetch(`${API}/resenas/vendedor/${vendedorId}`)
+      fetch(`${API}/resenas/vendedor/${vendedorId}?sin_limite=true`)
         .then(res => res.json())
         .then(data => {
           setResenas(data);
@@ -126,7 +126,7 @@ const ResenasPanel: React.FC<Props> = ({ esVendedor, vendedorId, productoId, onR
       setRespuesta("");
       setSelectedRespuestaResena(null);
       if (esVendedor && vendedorId) {
-        fetch(`${API}/resenas/vendedor/${vendedorId}`)
+        fetch(`${API}/resenas/vendedor/${vendedorId}?sin_limite=true`)
           .then(res => res.json())
           .then(data => setResenas(data));
       }
@@ -151,7 +151,7 @@ const ResenasPanel: React.FC<Props> = ({ esVendedor, vendedorId, productoId, onR
       }
       showToast("Respuesta eliminada correctamente", "success");
       if (esVendedor && vendedorId) {
-        fetch(`${API}/resenas/vendedor/${vendedorId}`)
+        fetch(`${API}/resenas/vendedor/${vendedorId}?sin_limite=true`)
           .then(res => res.json())
           .then(data => setResenas(data));
       }
@@ -60,6 +60,14 @@ const Panel: React.FC = () => {
   };
 
   const handleLogout = () => {
+    const token = localStorage.getItem("token");
+    if (token) {
+      // Revoca el token en el backend; la sesión local se cierra aunque falle.
+      fetch(`${API}/usuarios/logout`, {
+        method: "POST",
+        headers: { Authorization: `Bearer ${token}` },
+      }).catch(() => {});
+    }
     localStorage.clear();
     navigate("/login");
   };
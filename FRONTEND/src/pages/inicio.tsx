@@ -148,9 +148,7 @@ const Inicio: React.FC = () => {
     if (e) e.preventDefault();
     const text = chatInput.trim();
     if (!text) return;
-  // prepare history for AI context (include the new user message)
-  const recent = chatMessages.slice(-5)
-  const history = [...recent, { from: 'user', text }]
+  // the backend keeps the conversation history, only the new message is sent
   // mostrar mensaje del usuario
   setChatMessages(prev => [...prev, { from: 'user', text }]);
   setLastUserMessage(text);
@@ -178,7 +176,7 @@ const Inicio: React.FC = () => {
       const res = await fetch(`${API}/bot/respond`, {
         method: 'POST',
         headers,
-        body: JSON.stringify({ usuario_origen: userId, mensaje: text, history })
+        body: JSON.stringify({ usuario_origen: userId, mensaje: text })
       });
       if (!res.ok) throw new Error('Network response not ok');
       const data = await res.json();